@@ -1,9 +1,74 @@
 """App Settings"""
 
 # Django
-# from django.conf import settings
+from django.conf import settings
 
-# # put your app settings here
+# Use a native upsert (INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE) when
+# the database supports it, rather than splitting rows into creates and updates.
+ESDE_USE_UPSERT = getattr(settings, "ESDE_USE_UPSERT", True)
 
+# Load the delete-and-reload sections with the database's native bulk load
+# (COPY on PostgreSQL) instead of `bulk_create`.
+ESDE_BULK_LOADERS = getattr(settings, "ESDE_BULK_LOADERS", True)
 
-# EXAMPLE_SETTING_ONE = getattr(settings, "EXAMPLE_SETTING_ONE", None)
+# Load the delete-and-reload sections on MySQL/MariaDB with LOAD DATA LOCAL INFILE.
+# Needs `local_infile` enabled on the server and `"local_infile": 1` in the
+# database `OPTIONS`.
+ESDE_MYSQL_LOAD_DATA = getattr(settings, "ESDE_MYSQL_LOAD_DATA", False)
+
+# How many sections `process_from_sde`, and each level task of
+# `update_models_from_sde`, loads at the same time, sections still wait for the
+# sections they depend on. A level runs on one worker, so this is the only
+# parallelism an import gets. Always 1 on SQLite.
+ESDE_IMPORT_THREADS = getattr(settings, "ESDE_IMPORT_THREADS", 4)
+
+# Extract the SDE zip to disk before loading it. By default each file is read
+# straight out of the zip, so only the compressed archive needs disk space.
+ESDE_EXTRACT_SDE = getattr(settings, "ESDE_EXTRACT_SDE", False)
+
+# Where downloaded SDE archives are cached, by build number, and how many
+# builds to keep. Retries and anything else sharing the folder reuse them.
+ESDE_SDE_CACHE_DIR = getattr(settings, "ESDE_SDE_CACHE_DIR", "eve-sde-cache")
+ESDE_SDE_CACHE_BUILDS = getattr(settings, "ESDE_SDE_CACHE_BUILDS", 2)
+
+# How many times to retry a failed SDE download, resuming where it stopped.
+ESDE_DOWNLOAD_RETRIES = getattr(settings, "ESDE_DOWNLOAD_RETRIES", 3)
+
+# Keep a hash of every row so rows that haven't changed since the last import
+# are skipped rather than written again.
+ESDE_ROW_HASHES = getattr(settings, "ESDE_ROW_HASHES", True)
+
+# Delete rows that are no longer in the SDE. Off by default as anything with a
+# foreign key to them may be deleted too, removed rows are always counted.
+ESDE_DELETE_REMOVED_ROWS = getattr(settings, "ESDE_DELETE_REMOVED_ROWS", False)
+
+# JSON decoder for the SDE lines, "auto" uses orjson or msgspec when they are
+# installed and the standard library otherwise. Or "orjson", "msgspec", "json".
+ESDE_JSON_DECODER = getattr(settings, "ESDE_JSON_DECODER", "auto")
+
+# Load the delete-and-reload sections from plain tuples instead of building a
+# model for every row, with COPY/LOAD DATA or an executemany INSERT.
+ESDE_RAW_ROWS = getattr(settings, "ESDE_RAW_ROWS", True)
+
+# Roughly how much memory the rows built from the SDE can take before they
+# are written, the batch size of each section is worked out from it.
+ESDE_BATCH_MEMORY_MB = getattr(settings, "ESDE_BATCH_MEMORY_MB", 32)
+
+# Load the delete-and-reload sections into a new table that is renamed over the
+# live one once it is complete, so readers never see it empty or half loaded.
+# PostgreSQL and SQLite, MySQL commits on every CREATE and RENAME TABLE.
+ESDE_SHADOW_TABLES = getattr(settings, "ESDE_SHADOW_TABLES", True)
+
+# Drop the secondary indexes of the delete-and-reload sections that are loaded in
+# place and build them again after the load, rather than updating them per row.
+ESDE_REBUILD_INDEXES = getattr(settings, "ESDE_REBUILD_INDEXES", True)
+
+# How often, in seconds, a process checks whether the map has been imported
+# again since it built its stargate graph, spatial index and celestial arrays.
+ESDE_ROUTE_CHECK_SECONDS = getattr(settings, "ESDE_ROUTE_CHECK_SECONDS", 60)
+
+# Routes kept by each process, the same routes tend to be asked for again.
+ESDE_ROUTE_CACHE_SIZE = getattr(settings, "ESDE_ROUTE_CACHE_SIZE", 10000)
+
+# Solar systems whose celestial arrays are kept by each process.
+ESDE_CELESTIAL_CACHE_SIZE = getattr(settings, "ESDE_CELESTIAL_CACHE_SIZE", 1000)
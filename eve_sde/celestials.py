@@ -0,0 +1,158 @@
+"""
+Celestials of a solar system as NumPy arrays.
+
+`SystemCelestials` holds the ids, kinds and positions of the planets, moons,
+NPC stations and stargates of one system in columns, read with
+`values_list` rather than as models. Distances are in metres, the SDE
+positions are relative to the system's star. Systems are loaded the first
+time they are asked for, and the last `ESDE_CELESTIAL_CACHE_SIZE` are kept
+until the map is imported again.
+
+Needs NumPy, `pip install django-eveonline-sde[numpy]`.
+"""
+
+# Standard Library
+from functools import lru_cache
+
+from . import app_settings
+from .routes import ImportedCache
+
+try:
+    # Third Party
+    import numpy as np
+except ImportError:
+    np = None
+
+# metres
+AU = 149_597_870_700
+
+PLANET = "planet"
+MOON = "moon"
+STATION = "station"
+STARGATE = "stargate"
+# the kind of each celestial is its index in here
+KINDS = (PLANET, MOON, STATION, STARGATE)
+
+# the sections the celestials come from
+CELESTIAL_SECTIONS = ("Moon", "NPCStation", "Planet", "Stargate")
+
+
+class SystemCelestials:
+    def __init__(self, solar_system_id: int, celestials):
+        """
+        `celestials` is (kind, id, name, x, y, z), those without a position
+        are left out.
+        """
+        celestials = [c for c in celestials if None not in c[3:6]]
+        self.solar_system_id = solar_system_id
+        self.ids = np.array([c[1] for c in celestials], dtype=np.int64)
+        self.kinds = np.array([KINDS.index(c[0]) for c in celestials], dtype=np.uint8)
+        self.names = [c[2] for c in celestials]
+        self.positions = np.array([c[3:6] for c in celestials], dtype=np.float64).reshape(-1, 3)
+        self.index = {pk: i for i, pk in enumerate(self.ids.tolist())}
+        self.by_kind = {kind: np.flatnonzero(self.kinds == i) for i, kind in enumerate(KINDS)}
+
+    @classmethod
+    def from_db(cls, solar_system_id: int) -> "SystemCelestials":
+        # Late import to avoid circular imports with the models
+        from .models import Moon, NPCStation, Planet, Stargate
+
+        celestials = []
+        for kind, model in ((PLANET, Planet), (MOON, Moon), (STATION, NPCStation), (STARGATE, Stargate)):
+            celestials += [
+                (kind, *row)
+                for row in model.objects.filter(solar_system_id=solar_system_id).order_by("id").values_list(
+                    "id", "name", "x", "y", "z"
+                )
+            ]
+        return cls(solar_system_id, celestials)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, celestial_id: int) -> bool:
+        return celestial_id in self.index
+
+    def kind(self, celestial_id: int) -> str:
+        return KINDS[self.kinds[self.index[celestial_id]]]
+
+    def select(self, celestials=None) -> "np.ndarray":
+        """
+        Indexes of `celestials`, every celestial by default, a kind or
+        kinds from `KINDS`, or celestial ids.
+        """
+        if celestials is None:
+            return np.arange(len(self.ids))
+        if isinstance(celestials, str):
+            return self.by_kind[celestials]
+        celestials = list(celestials)
+        if all(isinstance(_c, str) for _c in celestials):
+            return np.sort(np.concatenate([self.by_kind[_k] for _k in celestials] or [np.arange(0)]))
+        return np.array([self.index[pk] for pk in celestials], dtype=np.intp)
+
+    def point(self, origin) -> "np.ndarray":
+        """
+        The position of a celestial id, or an (x, y, z) in metres.
+        """
+        if isinstance(origin, tuple):
+            return np.array(origin, dtype=np.float64)
+        return self.positions[self.index[origin]]
+
+    def distances(self, origin, celestials=None) -> tuple["np.ndarray", "np.ndarray"]:
+        """
+        (ids, metres) from `origin` to each of `celestials`, as in `select`.
+        """
+        rows = self.select(celestials)
+        diff = self.positions[rows] - self.point(origin)
+        return self.ids[rows], np.sqrt(np.einsum("ij,ij->i", diff, diff))
+
+    def nearest(self, origin, k: int = 1, celestials=None) -> list[tuple[int, float]]:
+        """
+        The `k` celestials nearest `origin` as (id, metres), not counting
+        `origin` itself.
+        """
+        ids, metres = self.distances(origin, celestials)
+        if not isinstance(origin, tuple):
+            keep = ids != origin
+            ids, metres = ids[keep], metres[keep]
+        k = min(k, len(ids))
+        if k < 1:
+            return []
+        if k == 1:
+            closest = metres.argmin()
+            return [(int(ids[closest]), float(metres[closest]))]
+        closest = np.argpartition(metres, k - 1)[:k]
+        closest = closest[np.argsort(metres[closest], kind="stable")]
+        return list(zip(ids[closest].tolist(), metres[closest].tolist()))
+
+    def distance_matrix(self, rows=None, columns=None) -> tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        (row ids, column ids, metres) between every celestial of `rows` and
+        of `columns`, each as in `select`.
+        """
+        _rows = self.select(rows)
+        _columns = self.select(columns)
+        _from = self.positions[_rows]
+        _to = self.positions[_columns]
+        # an axis at a time, a rows x columns x 3 difference is four times slower
+        metres = np.subtract.outer(_from[:, 0], _to[:, 0]) ** 2
+        for axis in (1, 2):
+            metres += np.subtract.outer(_from[:, axis], _to[:, axis]) ** 2
+        return self.ids[_rows], self.ids[_columns], np.sqrt(metres, out=metres)
+
+
+def load_system_celestials(version=None):
+    if np is None:
+        raise ImportError("Celestial arrays need NumPy, pip install django-eveonline-sde[numpy]")
+    return lru_cache(maxsize=app_settings.ESDE_CELESTIAL_CACHE_SIZE)(SystemCelestials.from_db)
+
+
+_celestials = ImportedCache(CELESTIAL_SECTIONS, load_system_celestials)
+
+
+def get_system_celestials(solar_system_id: int) -> SystemCelestials:
+    """
+    The celestials of `solar_system_id`, loaded the first time they are
+    asked for and kept until the map is imported again.
+    """
+    return _celestials.get()(solar_system_id)
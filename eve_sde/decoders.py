@@ -0,0 +1,56 @@
+"""
+JSON decoders for the SDE lines.
+
+orjson or msgspec are used when they are installed, `pip install
+django-eveonline-sde[speedups]`, falling back to the standard library.
+"""
+
+# Standard Library
+import json
+
+# Alliance Auth
+from allianceauth.services.hooks import get_extension_logger
+
+from . import app_settings
+
+try:
+    # Third Party
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Third Party
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = get_extension_logger(__name__)
+
+
+def available_decoders() -> dict:
+    """
+    Every installed decoder by name, fastest first. Each takes a line as
+    bytes and returns the decoded object.
+    """
+    decoders = {}
+    if orjson is not None:
+        decoders["orjson"] = orjson.loads
+    if msgspec is not None:
+        decoders["msgspec"] = msgspec.json.Decoder().decode
+    decoders["json"] = json.loads
+    return decoders
+
+
+def get_decoder(name: str = None) -> tuple[str, callable]:
+    """
+    The decoder set in `ESDE_JSON_DECODER`, or the fastest installed one for "auto".
+    """
+    name = name or app_settings.ESDE_JSON_DECODER
+    decoders = available_decoders()
+    if name == "auto":
+        name = next(iter(decoders))
+    elif name not in decoders:
+        logger.warning(f"JSON decoder {name} is not installed, using json")
+        name = "json"
+    return name, decoders[name]
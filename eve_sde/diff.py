@@ -0,0 +1,306 @@
+"""
+Build to build diff of the SDE.
+
+Lines are matched on `_key` section by section. Fields are named after the
+model's `Import.data_map` and `lang_fields`, anything they don't cover is
+compared as the raw top level key. The result is a stream of JSON records:
+
+    {"_key": "changeset", "from_build": 3142455, "to_build": 3150000, "against": "archive"}
+    {"section": "ItemType", "op": "add", "key": "12", "line": {...}}
+    {"section": "ItemType", "op": "change", "key": "34", "fields": {"name_en": ["Old", "New"]}, "line": {...}}
+    {"section": "ItemType", "op": "remove", "key": "56"}
+    {"section": "ItemType", "op": "summary", "add": 1, "change": 1, "remove": 1}
+
+Records carry the new line so `apply_changeset` can write just those rows.
+"""
+
+# Standard Library
+import json
+import time
+
+# Alliance Auth
+from allianceauth.services.hooks import get_extension_logger
+
+from .decoders import get_decoder
+from .models.admin import EveSDERowHash
+from .models.base import JSONModel
+from .models.importer import (
+    FanOutSection,
+    ImportProgress,
+    ModelSink,
+    read_sde_lines,
+    section_transaction,
+)
+from .models.utils import get_langs_for_field, lang_key, val_from_dict
+from .sources import get_sde_source
+
+logger = get_extension_logger(__name__)
+
+OPS = ("add", "change", "remove")
+
+
+def section_name(section) -> str:
+    if isinstance(section, FanOutSection):
+        return section.name
+    return section.__name__
+
+
+def section_model(section):
+    """
+    The model whose mapping names the fields of a section, the parent of a FanOutSection.
+    """
+    if isinstance(section, FanOutSection):
+        return section.models[0]
+    return section
+
+
+def looks_up_names(section) -> bool:
+    """
+    Does a section build its rows with names from other sections.
+    """
+    return any(
+        _m.name_lookup.__func__ is not JSONModel.name_lookup.__func__
+        for _m in (section.models if isinstance(section, FanOutSection) else (section,))
+    )
+
+
+def extra_fields(model) -> set[str]:
+    """
+    Fields filled from `Import.extra_data` rather than the SDE.
+    """
+    return {
+        _f for _url, _parser, _fields in getattr(model.Import, "extra_data", False) or ()
+        for _f in _fields
+    }
+
+
+def sde_data_map(model) -> list[tuple]:
+    _extra = extra_fields(model)
+    return [(_f, _k) for _f, _k in model.Import.data_map or () if _k not in _extra]
+
+
+def line_values(model, line: dict) -> dict:
+    """
+    The values of a SDE line by model field name.
+    """
+    _values = {}
+    _covered = {"_key"}
+    for _f, _k in sde_data_map(model):
+        _values[_f] = val_from_dict(_k, line)
+        _covered.add((_k[0] if isinstance(_k, tuple) else _k).split(".")[0])
+    for _f in model.Import.lang_fields or ():
+        _fld = _key = _f
+        if isinstance(_f, tuple):
+            _fld, _key = _f
+        _covered.add(_key)
+        for lang, _val in (line.get(_key) or {}).items():
+            _values[f"{_fld}_{lang_key(lang)}"] = _val
+    for _k, _v in line.items():
+        if _k not in _covered:
+            _values[_k] = _v
+    return _values
+
+
+def can_diff_stored(model) -> bool:
+    """
+    Can the stored rows be compared to the SDE, they need to be one row per
+    line built straight from the `data_map`.
+    """
+    return bool(
+        model.Import.data_map
+        and not getattr(model.Import, "delete_and_reload", False)
+        and model.from_jsonl.__func__ is JSONModel.from_jsonl.__func__
+    )
+
+
+def stored_values(model) -> dict[str, dict]:
+    """
+    The stored rows of a model by `_key`, only the fields the SDE sets.
+    """
+    _fields = [_f for _f, _k in sde_data_map(model)]
+    for _f in model.Import.lang_fields or ():
+        _fields += get_langs_for_field(_f[0] if isinstance(_f, tuple) else _f)
+    return {
+        str(_row.pop("pk")): _row
+        for _row in model.objects.values("pk", *_fields).iterator(chunk_size=5000)
+    }
+
+
+def archive_values(model, source) -> dict[str, dict]:
+    progress = ImportProgress()
+    return {
+        str(_line.get("_key")): line_values(model, _line)
+        for _line in read_sde_lines(source, model.Import.filename, progress)
+    }
+
+
+def diff_values(old: dict, new: dict, stored: bool = False) -> dict:
+    # the stored rows only have the fields the SDE sets, so only compare those
+    _keys = old.keys() & new.keys() if stored else old.keys() | new.keys()
+    return {
+        _k: [old.get(_k), new.get(_k)]
+        for _k in sorted(_keys)
+        if old.get(_k) != new.get(_k)
+    }
+
+
+def diff_section(section, new_source, old_source=None):
+    """
+    Yield the changes to one section between `old_source`, or the stored rows
+    if there isn't one, and `new_source`.
+    """
+    name = section_name(section)
+    model = section_model(section)
+    new_source = get_sde_source(new_source)
+    stored = old_source is None
+    if stored:
+        old = stored_values(model)
+    else:
+        old = archive_values(model, get_sde_source(old_source))
+
+    counts = dict.fromkeys(OPS, 0)
+    progress = ImportProgress()
+    for line in read_sde_lines(new_source, model.Import.filename, progress):
+        key = str(line.get("_key"))
+        prev = old.pop(key, None)
+        if prev is None:
+            counts["add"] += 1
+            yield {"section": name, "op": "add", "key": key, "line": line}
+            continue
+        fields = diff_values(prev, line_values(model, line), stored=stored)
+        if fields:
+            counts["change"] += 1
+            yield {"section": name, "op": "change", "key": key, "fields": fields, "line": line}
+    for key in old:
+        counts["remove"] += 1
+        yield {"section": name, "op": "remove", "key": key}
+    yield {"section": name, "op": "summary", **counts}
+
+
+def diff_sde(sections, new_source, old_source=None, from_build=None):
+    """
+    Yield the changeset header and the changes to every section.
+    """
+    new_source = get_sde_source(new_source)
+    if old_source is not None:
+        old_source = get_sde_source(old_source)
+        from_build = old_source.build_info().get("buildNumber")
+    yield {
+        "_key": "changeset",
+        "from_build": from_build,
+        "to_build": new_source.build_info().get("buildNumber"),
+        "against": "stored" if old_source is None else "archive",
+    }
+    for section in sections:
+        if old_source is None and not can_diff_stored(section_model(section)):
+            logger.info(f"Skipping {section_name(section)}, it can only be compared against a previous archive")
+            continue
+        yield from diff_section(section, new_source, old_source)
+
+
+def write_changeset(changes, json_file) -> dict:
+    """
+    Write changes as JSONL, returning the totals of each op.
+    """
+    totals = dict.fromkeys(OPS, 0)
+    for change in changes:
+        json_file.write(json.dumps(change, ensure_ascii=False) + "\n")
+        if change.get("op") == "summary":
+            for op in OPS:
+                totals[op] += change[op]
+    return totals
+
+
+def read_changeset(file_path: str):
+    _name, decode = get_decoder()
+    with open(file_path, "rb") as json_file:
+        for line in json_file:
+            yield decode(line)
+
+
+def apply_changeset(changes, sections, new_source, delete_removed: bool = False):
+    """
+    Write a changeset to the database.
+
+    Sections loaded with `delete_and_reload`, or as a FanOutSection, can't be
+    patched a row at a time, if they have any changes they are reloaded from
+    `new_source`, as are sections that look up names from a changed section.
+    A changeset against the stored rows skips the sections that can't be
+    compared that way, they are all reloaded. Removed rows are only deleted
+    with `delete_removed`. Each section is patched in its own
+    `section_transaction`.
+    """
+    new_source = get_sde_source(new_source)
+    by_name = {section_name(section): section for section in sections}
+    stored = False
+    lines = {}
+    removed = {}
+    summaries = {}
+    for change in changes:
+        if change.get("_key") == "changeset":
+            stored = change.get("against") == "stored"
+            continue
+        if change.get("section") not in by_name:
+            continue
+        name = change["section"]
+        if change["op"] in ("add", "change"):
+            lines.setdefault(name, []).append(change["line"])
+        elif change["op"] == "remove":
+            removed.setdefault(name, []).append(change["key"])
+        elif change["op"] == "summary":
+            summaries[name] = change
+
+    # in load order so foreign keys are in place
+    changed = set()
+    for name, section in by_name.items():
+        _models = section.models if isinstance(section, FanOutSection) else (section,)
+        if stored and not can_diff_stored(section_model(section)):
+            # not in the changeset, it may have changed all the same
+            reload = "it wasn't compared"
+        elif looks_up_names(section) and section.get_dependencies() & changed:
+            # every row may have a name from a changed section, not just the
+            # lines that changed
+            reload = "its names"
+        elif name not in lines and name not in removed:
+            continue
+        elif isinstance(section, FanOutSection) or getattr(section.Import, "delete_and_reload", False):
+            reload = "its changes"
+        else:
+            reload = None
+        changed.update(_models)
+
+        if reload:
+            logger.info(f"Reloading {name} for {reload}")
+            section.load_from_sde(new_source)
+            continue
+
+        start = time.perf_counter()
+
+        # all of it or none, like a load
+        with section_transaction(section):
+            file_path = new_source.file_path(section.Import.filename)
+            progress = ImportProgress()
+            sink = ModelSink(section, file_path)
+            for line in lines.get(name, []):
+                progress.lines += 1
+                sink.add(line)
+                if sink.full:
+                    sink.flush(progress)
+            sink.flush(progress)
+
+            if delete_removed and removed.get(name):
+                section.delete_removed(removed[name])
+                EveSDERowHash.objects.filter(sde_section=name, row_id__in=removed[name]).delete()
+
+            summary = summaries.get(name, {})
+            _complete = section.objects.all().count()
+            section.update_sde_section_state(
+                new_source, name, _complete, _complete,
+                counts={
+                    "new": summary.get("add", 0),
+                    "changed": summary.get("change", 0),
+                    "unchanged": max(_complete - summary.get("add", 0) - summary.get("change", 0), 0),
+                    "removed": summary.get("remove", 0),
+                }
+            )
+        logger.info(f"{name} patched in {time.perf_counter() - start:,.2f}s")
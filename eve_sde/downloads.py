@@ -0,0 +1,254 @@
+"""
+Download manager for the SDE zip.
+
+Downloaded archives are kept in a local cache keyed by their build number so
+retries, and anything else sharing the cache folder, reuse them rather than
+pulling the SDE again. Interrupted downloads are resumed with a Range request.
+
+CCP doesn't publish a checksum of the SDE, a download is checked with the
+CRCs in the zip. The sha256 kept with each cached archive is only of what
+was stored, to notice the file changing in the cache afterwards.
+"""
+
+# Standard Library
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+# Third Party
+import httpx
+
+# Alliance Auth
+from allianceauth.services.hooks import get_extension_logger
+
+from . import app_settings
+from .sources import SDEArchive
+
+logger = get_extension_logger(__name__)
+
+
+class SDEDownloadError(Exception):
+    pass
+
+
+def file_sha256(file_path: str) -> str:
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class SDEArchiveCache:
+    """
+    `{build}.zip` archives with a `{build}.json` holding the sha256 they were
+    stored with and the validators they were downloaded with.
+    """
+    # partial downloads left this long are from a process that is gone
+    stale_part_seconds = 24 * 60 * 60
+
+    def __init__(self, path: str = None, keep: int = None, retries: int = None):
+        self.path = path or app_settings.ESDE_SDE_CACHE_DIR
+        self.keep = app_settings.ESDE_SDE_CACHE_BUILDS if keep is None else keep
+        self.retries = app_settings.ESDE_DOWNLOAD_RETRIES if retries is None else retries
+        os.makedirs(self.path, exist_ok=True)
+
+    def archive_path(self, build) -> str:
+        return f"{self.path}/{build}.zip"
+
+    def meta_path(self, build) -> str:
+        return f"{self.path}/{build}.json"
+
+    @property
+    def part_path(self) -> str:
+        # one per process, two downloading into the cache at once would
+        # write over each other
+        return f"{self.path}/download-{os.getpid()}.zip.part"
+
+    @property
+    def part_meta_path(self) -> str:
+        return f"{self.part_path}.json"
+
+    @staticmethod
+    def read_json(file_path: str) -> dict:
+        try:
+            with open(file_path) as json_file:
+                return json.load(json_file)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def write_json(file_path: str, data: dict):
+        # written next to it and renamed over it, readers never see half a file
+        _path = f"{file_path}.{os.getpid()}.tmp"
+        with open(_path, "w") as json_file:
+            json.dump(data, json_file)
+        os.replace(_path, file_path)
+
+    def remove(self, build):
+        for file_path in (self.archive_path(build), self.meta_path(build)):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def builds(self) -> list[int]:
+        """
+        Cached build numbers, newest first.
+        """
+        return sorted(
+            (int(f[:-5]) for f in os.listdir(self.path) if f.endswith(".json") and f[:-5].isdigit()),
+            reverse=True
+        )
+
+    def get(self, build) -> str | None:
+        """
+        The path to the cached archive for `build` if it is there and unchanged
+        since it was stored.
+        """
+        meta = self.read_json(self.meta_path(build))
+        archive = self.archive_path(build)
+        if not meta or not os.path.exists(archive):
+            return None
+        if file_sha256(archive) != meta.get("sha256"):
+            logger.warning(f"Cached SDE {archive} has changed since it was stored, removing it")
+            self.remove(build)
+            return None
+        return archive
+
+    def prune(self, current: int = None):
+        for build in [b for b in self.builds() if b != current][max(self.keep, 1) - 1:]:
+            logger.info(f"Removing cached SDE build {build}")
+            self.remove(build)
+        stale = time.time() - self.stale_part_seconds
+        for name in os.listdir(self.path):
+            file_path = f"{self.path}/{name}"
+            if name.startswith("download-") and ".part" in name and os.path.getmtime(file_path) < stale:
+                logger.info(f"Removing abandoned SDE download {name}")
+                os.remove(file_path)
+
+    def download(self, url: str, build: int = None) -> str:
+        """
+        Return the path to a complete archive of the SDE at `url`, downloading
+        it only if `build` isn't cached already. Without a build number the
+        newest cached archive is revalidated with its ETag/Last-Modified.
+        """
+        if build and (archive := self.get(build)):
+            logger.info(f"Using cached SDE {archive}")
+            return archive
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                wait = 2 ** attempt
+                logger.warning(f"SDE download failed ({last_error}), retrying in {wait}s")
+                time.sleep(wait)
+            try:
+                return self.fetch(url, conditional=not build)
+            except (httpx.HTTPError, SDEDownloadError) as e:
+                last_error = e
+        raise SDEDownloadError(f"Failed to download {url}: {last_error}")
+
+    def conditional_headers(self) -> tuple[int | None, dict]:
+        for build in self.builds():
+            meta = self.read_json(self.meta_path(build))
+            headers = {}
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+            return build, headers
+        return None, {}
+
+    def fetch(self, url: str, conditional: bool = False) -> str:
+        cached_build, headers = self.conditional_headers() if conditional else (None, {})
+        # the zip as is, so the bytes on disk are the ones Content-Length and
+        # Range count
+        headers["Accept-Encoding"] = "identity"
+
+        # Resume a partial download, If-Range gets us the whole file again if it changed
+        part_meta = self.read_json(self.part_meta_path)
+        offset = os.path.getsize(self.part_path) if os.path.exists(self.part_path) else 0
+        validator = part_meta.get("etag") or part_meta.get("last_modified")
+        if offset and validator and part_meta.get("url") == url:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+        else:
+            offset = 0
+
+        with httpx.stream("GET", url, headers=headers, follow_redirects=True, timeout=60) as response:
+            if response.status_code == 304 and cached_build:
+                if archive := self.get(cached_build):
+                    logger.info(f"SDE not modified, using cached {archive}")
+                    return archive
+                raise SDEDownloadError("Server returned 304 for an archive we no longer have")
+            if response.status_code == 416:
+                # the partial file is no good, start again on the next attempt
+                os.remove(self.part_path)
+                raise SDEDownloadError("Server could not resume the partial download")
+            response.raise_for_status()
+
+            if response.status_code == 206:
+                # bytes {start}-{end}/{total}
+                content_range = response.headers.get("content-range", "")
+                try:
+                    _range, _total = content_range.split(" ")[-1].split("/")
+                    start = int(_range.split("-")[0])
+                    total = int(_total) if _total != "*" else None
+                except ValueError:
+                    raise SDEDownloadError(f"Bad Content-Range: {content_range}")
+                if start != offset:
+                    raise SDEDownloadError(f"Asked for bytes from {offset} and got {_range}")
+                logger.info(f"Resuming SDE download from {offset:,} bytes")
+            else:
+                offset = 0
+                total = int(response.headers["content-length"]) if "content-length" in response.headers else None
+            # encoded anyway, the lengths are of the encoded bytes and it
+            # can't be resumed from what is on disk
+            encoded = response.headers.get("content-encoding", "identity") != "identity"
+            if encoded:
+                total = None
+
+            self.write_json(self.part_meta_path, {
+                "url": url,
+                "etag": None if encoded else response.headers.get("etag"),
+                "last_modified": None if encoded else response.headers.get("last-modified"),
+            })
+            with open(self.part_path, "ab" if offset else "wb") as f:
+                for chunk in response.iter_bytes():
+                    f.write(chunk)
+
+        size = os.path.getsize(self.part_path)
+        if total is not None and size != total:
+            # leave the partial file for the next attempt to resume
+            raise SDEDownloadError(f"Download stopped at {size:,} of {total:,} bytes")
+
+        return self.store(part_meta=self.read_json(self.part_meta_path), size=size)
+
+    def store(self, part_meta: dict, size: int) -> str:
+        """
+        Check the finished download and move it into the cache under its build number.
+        """
+        try:
+            with zipfile.ZipFile(self.part_path) as zf:
+                bad_file = zf.testzip()
+            if bad_file:
+                raise SDEDownloadError(f"CRC check failed for {bad_file}")
+            build = SDEArchive(self.part_path).build_info().get("buildNumber")
+        except (zipfile.BadZipFile, SDEDownloadError, KeyError, FileNotFoundError, ValueError) as e:
+            # not worth resuming
+            os.remove(self.part_path)
+            raise SDEDownloadError(f"Downloaded SDE is not valid: {e}")
+
+        archive = self.archive_path(build)
+        sha256 = file_sha256(self.part_path)
+        os.replace(self.part_path, archive)
+        self.write_json(self.meta_path(build), part_meta | {
+            "build_number": build,
+            "sha256": sha256,
+            "size": size,
+        })
+        os.remove(self.part_meta_path)
+        logger.info(f"SDE build {build} downloaded to {archive} sha256:{sha256}")
+        self.prune(current=build)
+        return archive
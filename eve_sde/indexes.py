@@ -0,0 +1,126 @@
+"""
+Secondary indexes of the sections reloaded in place.
+
+The foreign key indexes of a table that is emptied and loaded again would
+be updated row by row, and on postgres every row queues a foreign key check
+too. They are dropped before the delete and created again from their saved
+definitions once the rows are in, which is one sort per index and one query
+per foreign key instead. Tables loaded into a shadow table already get
+theirs built after the load.
+"""
+
+# Standard Library
+import time
+from contextlib import contextmanager
+
+# Django
+from django.db import connections, router
+
+# Alliance Auth
+from allianceauth.services.hooks import get_extension_logger
+
+from . import app_settings
+from .shadow import get_shadow
+
+logger = get_extension_logger(__name__)
+
+
+def secondary_indexes(connection, table: str) -> list[tuple[str, str]]:
+    """
+    (drop sql, create sql) of the indexes on `table` that don't back a
+    primary key or unique constraint, and on postgres its foreign keys.
+    Empty on backends that aren't supported, mysql won't drop the indexes
+    its foreign keys need.
+    """
+    _table = connection.ops.quote_name(table)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+                "WHERE i.schemaname = current_schema() AND i.tablename = %s "
+                "AND i.indexdef NOT LIKE 'CREATE UNIQUE%%' "
+                "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = "
+                "(quote_ident(i.schemaname) || '.' || quote_ident(i.indexname))::regclass)",
+                [table]
+            )
+            indexes = cursor.fetchall()
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype = 'f'",
+                [_table]
+            )
+            foreign_keys = cursor.fetchall()
+        elif connection.vendor == "sqlite":
+            # the automatic indexes of sqlite have no sql, the foreign keys
+            # are part of the table.
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s "
+                "AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%%'",
+                [table]
+            )
+            indexes = cursor.fetchall()
+            foreign_keys = []
+        else:
+            return []
+
+    _sql = [
+        (f"DROP INDEX {connection.ops.quote_name(name)}", create)
+        for name, create in indexes
+    ]
+    # keys after the indexes, so they're dropped first and checked last
+    _sql += [
+        (
+            f"ALTER TABLE {_table} DROP CONSTRAINT {connection.ops.quote_name(name)}",
+            f"ALTER TABLE {_table} ADD CONSTRAINT {connection.ops.quote_name(name)} {definition}"
+        )
+        for name, definition in foreign_keys
+    ]
+    return _sql
+
+
+def can_rebuild(model) -> bool:
+    return bool(
+        app_settings.ESDE_REBUILD_INDEXES
+        and getattr(model.Import, "delete_and_reload", False)
+        and get_shadow(model) is None
+    )
+
+
+@contextmanager
+def rebuilt_indexes(*models):
+    """
+    Drop the secondary indexes of the models reloaded in place for the block,
+    and create them again after it.
+    """
+    dropped = []
+    for mdl in models:
+        if not can_rebuild(mdl):
+            continue
+        connection = connections[router.db_for_write(mdl)]
+        indexes = secondary_indexes(connection, mdl._meta.db_table)
+        if not indexes:
+            continue
+        with connection.cursor() as cursor:
+            for drop, _create in reversed(indexes):
+                cursor.execute(drop)
+        logger.info(f"{mdl.__name__}: dropped {len(indexes)} indexes and keys for the load")
+        dropped.append((mdl, connection, indexes))
+
+    # nothing to put back if the block fails, the transaction
+    # rolls back the drop with the load
+    yield
+
+    for mdl, connection, indexes in dropped:
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # postgres won't index a table with foreign key checks still
+                # pending, run them now that the rows are all in.
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            for _drop, create in indexes:
+                cursor.execute(create)
+            if connection.vendor == "postgresql":
+                cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+        logger.info(
+            f"{mdl.__name__}: rebuilt {len(indexes)} indexes and keys in {time.perf_counter() - start:,.2f}s"
+        )
@@ -0,0 +1,167 @@
+"""
+Jump drive routes for capitals, black ops and jump freighters.
+
+`JumpPlanner` searches the systems a jump drive of a given range can land
+in with A*, the straight line to the destination is never longer than the
+route left. The systems in range of each system are asked of the spatial
+index the first time the search reaches it and kept for the next route,
+planners are kept per range with the index they search.
+"""
+
+# Standard Library
+import heapq
+import math
+
+from .spatial import SpatialIndex, get_spatial_index
+
+# fewest jumps then fewest light years, or fewest light years
+JUMPS = "jumps"
+DISTANCE = "distance"
+JUMP_ROUTE_FLAGS = (JUMPS, DISTANCE)
+
+# the dogma attribute of a ship's base range in light years, and the range
+# Jump Drive Calibration adds per level as a share of that
+JUMP_DRIVE_RANGE = "jumpDriveRange"
+CALIBRATION_BONUS = 0.2
+
+# planners kept per process, one for each range and security asked for
+PLANNER_CACHE_SIZE = 16
+
+
+class JumpPlanner:
+    def __init__(self, spatial: SpatialIndex, range_ly: float, max_security: float = None):
+        """
+        Routes landing only in the low and null sec systems of `spatial`
+        within `range_ly` of each other, less `max_security` if given.
+        """
+        self.spatial = spatial
+        self.range = range_ly
+        self.max_security = max_security
+        can_jump_to = spatial.can_jump_to
+        security = spatial.security
+        if max_security is None:
+            self.accept = can_jump_to
+        else:
+            def accept(i):
+                return can_jump_to(i) and security[i] <= max_security
+            self.accept = accept
+        # index: ((index, light years), ...)
+        self.in_range = {}
+
+    def neighbours(self, i: int) -> tuple:
+        _in_range = self.in_range.get(i)
+        if _in_range is None:
+            found = self.spatial.near(self.spatial.positions[i], self.range, self.accept)
+            _in_range = self.in_range[i] = tuple((_j, math.sqrt(d2)) for d2, _j in found if _j != i)
+        return _in_range
+
+    def route(self, origin: int, destination: int, minimise: str = JUMPS) -> list[int] | None:
+        """
+        The systems from `origin` to `destination` inclusive, each a jump
+        from the last. None if `destination` can't be jumped to or there is
+        no route in range, `origin` can be anywhere, high sec included.
+        """
+        if minimise not in JUMP_ROUTE_FLAGS:
+            raise ValueError(f"Unknown jump route flag {minimise}, expected one of {', '.join(JUMP_ROUTE_FLAGS)}")
+        start = self.spatial.index.get(origin)
+        goal = self.spatial.index.get(destination)
+        if start is None or goal is None or not self.accept(goal):
+            return None
+        if start == goal:
+            return [origin]
+        path = self.search(start, goal, minimise == JUMPS)
+        return None if path is None else [self.spatial.system_ids[i] for i in path]
+
+    def search(self, start: int, goal: int, by_jumps: bool) -> list[int] | None:
+        """
+        A* on light years, with each jump costing more than any route can be
+        long when `by_jumps`, so the jumps count first. A jump covers at most
+        the range, so the remaining jumps are at least the straight line over it.
+        """
+        positions = self.spatial.positions
+        end = positions[goal]
+        # a little over the range, so rounding doesn't count a jump of exactly it as two
+        _range = self.range * (1 + 1e-9)
+        per_jump = len(positions) * self.range if by_jumps else 0.0
+
+        def estimate(i):
+            _ly = math.dist(positions[i], end)
+            return math.ceil(_ly / _range) * per_jump + _ly
+
+        neighbours = self.neighbours
+        best = {start: 0.0}
+        came_from = {start: -1}
+        queue = [(estimate(start), 0.0, start)]
+        done = set()
+        while queue:
+            _estimate, cost, node = heapq.heappop(queue)
+            if node in done:
+                continue
+            if node == goal:
+                path = []
+                while node != -1:
+                    path.append(node)
+                    node = came_from[node]
+                path.reverse()
+                return path
+            done.add(node)
+            for _n, _ly in neighbours(node):
+                if _n in done:
+                    continue
+                _cost = cost + per_jump + _ly
+                known = best.get(_n)
+                if known is not None and _cost >= known:
+                    continue
+                best[_n] = _cost
+                came_from[_n] = node
+                heapq.heappush(queue, (_cost + estimate(_n), _cost, _n))
+        return None
+
+    def legs(self, route: list[int]) -> list[float]:
+        """
+        The light years of each jump of `route`.
+        """
+        return [self.spatial.distance(_a, _b) for _a, _b in zip(route, route[1:])]
+
+
+def get_jump_planner(range_ly: float, max_security: float = None) -> JumpPlanner:
+    """
+    The planner for `range_ly` over the spatial index of the imported SDE,
+    kept with what it has learnt until the map is imported again.
+    """
+    spatial = get_spatial_index()
+    # kept on the index, so they go with it when the map is imported again
+    planners = spatial.planners
+    key = (float(range_ly), max_security)
+    planner = planners.get(key)
+    if planner is None:
+        while len(planners) >= PLANNER_CACHE_SIZE:
+            planners.pop(next(iter(planners)), None)
+        planner = planners[key] = JumpPlanner(spatial, *key)
+    return planner
+
+
+def ship_jump_range(type_id: int, calibration: int = 5) -> float | None:
+    """
+    The jump range in light years of the ship `type_id` with `calibration`
+    levels of Jump Drive Calibration, or None if it has no jump drive.
+    """
+    # Late import to avoid circular imports with the models
+    from .models import TypeDogma
+
+    base = TypeDogma.objects.filter(
+        item_type_id=type_id, dogma_attribute__name=JUMP_DRIVE_RANGE
+    ).values_list("value", flat=True).first()
+    if not base:
+        return None
+    return base * (1 + CALIBRATION_BONUS * calibration)
+
+
+def get_jump_route(
+    origin: int, destination: int, range_ly: float, minimise: str = JUMPS, max_security: float = None
+) -> list[int] | None:
+    """
+    The solar system ids from `origin` to `destination` inclusive for a jump
+    drive with `range_ly`, landing in low and null sec only.
+    """
+    return get_jump_planner(range_ly, max_security).route(origin, destination, minimise)
@@ -0,0 +1,264 @@
+"""
+Database specific bulk loaders for the delete-and-reload SDE sections.
+
+These skip the ORM and stream rows straight into the table, falling back to
+`bulk_create` on any database without a loader.
+"""
+
+# Standard Library
+import operator
+import os
+import tempfile
+
+# Django
+from django.db import connections, router, transaction
+
+# Alliance Auth
+from allianceauth.services.hooks import get_extension_logger
+
+from . import app_settings
+
+logger = get_extension_logger(__name__)
+
+# Field types whose python values can be written as is.
+PLAIN_FIELD_TYPES = {
+    "AutoField",
+    "BigAutoField",
+    "BigIntegerField",
+    "BooleanField",
+    "CharField",
+    "FloatField",
+    "IntegerField",
+    "TextField",
+}
+
+
+def get_bulk_loader(model, raw: bool = False, table: str = None):
+    """
+    Return a bulk loader for `model` on its database, or None if there isn't one.
+
+    With `raw` the loader takes the rows of a `RowMapper` in raw mode rather
+    than model instances, and falls back to `executemany` instead of None.
+    With `table` the rows go into that table rather than the model's, and
+    there is always a loader as the ORM can't write to it.
+    """
+    connection = connections[router.db_for_write(model)]
+    if app_settings.ESDE_BULK_LOADERS:
+        if connection.vendor == "postgresql":
+            return PostgresCopyLoader(model, connection, raw=raw, table=table)
+        if connection.vendor == "mysql" and app_settings.ESDE_MYSQL_LOAD_DATA:
+            return MySQLLoadDataLoader(model, connection, raw=raw, table=table)
+    if raw or table:
+        return ExecuteManyLoader(model, connection, raw=raw, table=table)
+    return None
+
+
+def text_value(value, true: str = "t", false: str = "f") -> str:
+    """
+    Format a value for a tab separated bulk load, `\\N` is NULL.
+    """
+    if value is None:
+        return "\\N"
+    if value is True:
+        return true
+    if value is False:
+        return false
+    if isinstance(value, float):
+        return repr(value)
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class BulkLoader:
+    """
+    Writes model instances, or raw rows in `concrete_fields` order, into an
+    empty table.
+    """
+    chunk_size = 5000
+    spool_size = 32 * 1024 * 1024
+    # can rows be held back with `spool` until the other sinks are done
+    spools = True
+    true = "t"
+    false = "f"
+
+    def __init__(self, model, connection, raw: bool = False, table: str = None):
+        self.model = model
+        self.connection = connection
+        self.raw = raw
+        self.db_table = table or model._meta.db_table
+        self.count = 0
+        self.spooled = None
+        _concrete = list(model._meta.concrete_fields)
+        # implicit auto pk's are left to the database
+        self.fields = [
+            f for f in _concrete
+            if not (f.primary_key and f.auto_created)
+        ]
+        # (attname, or index in a raw row, needs get_db_prep_save, field)
+        self.prepared = [
+            (
+                _concrete.index(f) if raw else f.attname,
+                (f.target_field if f.is_relation else f).get_internal_type() not in PLAIN_FIELD_TYPES,
+                f
+            )
+            for f in self.fields
+        ]
+
+    @property
+    def table(self) -> str:
+        return self.connection.ops.quote_name(self.db_table)
+
+    @property
+    def columns(self) -> str:
+        return ", ".join(self.connection.ops.quote_name(f.column) for f in self.fields)
+
+    def to_row(self, obj) -> tuple:
+        _get = operator.getitem if self.raw else getattr
+        return tuple(
+            f.get_db_prep_save(_get(obj, key), self.connection) if prep else _get(obj, key)
+            for key, prep, f in self.prepared
+        )
+
+    def to_line(self, obj) -> str:
+        return "\t".join(text_value(v, self.true, self.false) for v in self.to_row(obj)) + "\n"
+
+    def chunks(self, model_iter):
+        """
+        Tab separated lines for the models, joined into chunks of `chunk_size`.
+        """
+        lines = []
+        for obj in model_iter:
+            lines.append(self.to_line(obj))
+            self.count += 1
+            if len(lines) >= self.chunk_size:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
+
+    def spool(self, model_list):
+        """
+        Write models to a temporary file to be loaded later by `load_spool`,
+        for when the connection can't be held open while the file is read.
+        """
+        if self.spooled is None:
+            self.spooled = tempfile.SpooledTemporaryFile(max_size=self.spool_size, mode="w+", encoding="utf-8")
+        for chunk in self.chunks(model_list):
+            self.spooled.write(chunk)
+
+    def load_spool(self) -> int:
+        if self.spooled is None:
+            return 0
+        with self.spooled:
+            self.spooled.seek(0)
+            self.load_text(iter(lambda: self.spooled.read(1024 * 1024), ""))
+        self.spooled = None
+        return self.count
+
+    def load(self, model_iter) -> int:
+        self.load_text(self.chunks(model_iter))
+        return self.count
+
+    def load_text(self, chunks):
+        """
+        Load tab separated text chunks into the table.
+        """
+        raise NotImplementedError
+
+
+class CopyStream:
+    """
+    File like wrapper so psycopg2's `copy_expert` can read from a generator.
+    psycopg2 sends whatever `read` returns, so whole chunks are handed over.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def read(self, size: int = -1) -> str:
+        return next(self.chunks, "")
+
+    readline = read
+
+
+class PostgresCopyLoader(BulkLoader):
+    """
+    `COPY ... FROM STDIN` fed straight from the JSONL generator.
+    """
+
+    def load_text(self, chunks):
+        # Django
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        sql = f"COPY {self.table} ({self.columns}) FROM STDIN"
+        with self.connection.cursor() as cursor:
+            if is_psycopg3:
+                with cursor.copy(sql) as copy:
+                    for chunk in chunks:
+                        copy.write(chunk)
+            else:
+                cursor.copy_expert(sql, CopyStream(chunks))
+
+
+class MySQLLoadDataLoader(BulkLoader):
+    """
+    `LOAD DATA LOCAL INFILE` from a temporary TSV file.
+
+    Needs `local_infile` enabled on the server and in the connection
+    `OPTIONS`, so is only used when `ESDE_MYSQL_LOAD_DATA` is set.
+    """
+    true = "1"
+    false = "0"
+
+    def load_text(self, chunks):
+        tsv = tempfile.NamedTemporaryFile("w", suffix=".tsv", encoding="utf-8", delete=False)
+        try:
+            with tsv:
+                for chunk in chunks:
+                    tsv.write(chunk)
+            # the foreign key checks are left to `section_transaction`, and
+            # the keys to innodb, which ignores DISABLE KEYS
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE {self.table} "
+                    "CHARACTER SET utf8mb4 "
+                    "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+                    f"LINES TERMINATED BY '\\n' ({self.columns})",
+                    [tsv.name]
+                )
+        finally:
+            os.remove(tsv.name)
+
+
+class ExecuteManyLoader(BulkLoader):
+    """
+    `INSERT` with `executemany` a chunk at a time, for raw rows on databases
+    without a native bulk load. Nothing is held open between chunks so there
+    is no need to spool.
+    """
+    spools = False
+
+    def load(self, model_iter) -> int:
+        placeholders = ", ".join(["%s"] * len(self.fields))
+        sql = f"INSERT INTO {self.table} ({self.columns}) VALUES ({placeholders})"
+        rows = []
+        for obj in model_iter:
+            rows.append(self.to_row(obj))
+            if len(rows) >= self.chunk_size:
+                self.insert(sql, rows)
+                rows = []
+        if rows:
+            self.insert(sql, rows)
+        return self.count
+
+    def insert(self, sql: str, rows: list[tuple]):
+        # one transaction a chunk like bulk_create, not one a row
+        with transaction.atomic(using=self.connection.alias, savepoint=False):
+            with self.connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+        self.count += len(rows)
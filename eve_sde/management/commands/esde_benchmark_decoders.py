@@ -0,0 +1,51 @@
+# Standard Library
+import time
+
+# Django
+from django.core.management.base import BaseCommand
+
+from ...decoders import available_decoders
+from ...sde_tasks import delete_sde_folder, download_extract_sde, get_sde_path
+from ...sources import get_sde_source
+
+
+class Command(BaseCommand):
+    help = "Time decoding every SDE file with each installed JSON decoder."
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="*", type=str,
+                            help="SDE files to benchmark, defaults to all of them")
+        parser.add_argument("--skip_download", action="store_true",
+                            help="Use the already downloaded SDE")
+
+    def handle(self, *args, **options):
+        if not options["skip_download"]:
+            download_extract_sde()
+
+        source = get_sde_source(get_sde_path())
+        decoders = available_decoders()
+        totals = dict.fromkeys(decoders, 0.0)
+        for filename in source.filenames():
+            if options["files"] and filename not in options["files"]:
+                continue
+            # read once so only the decoding is timed
+            with source.open(filename) as json_file:
+                lines = json_file.readlines()
+            times = {}
+            for name, decode in decoders.items():
+                start = time.perf_counter()
+                for line in lines:
+                    decode(line)
+                times[name] = time.perf_counter() - start
+                totals[name] += times[name]
+            self.stdout.write(
+                f"{filename} ({len(lines)} lines): " + " - ".join(
+                    f"{name} {took:,.3f}s" for name, took in times.items()
+                )
+            )
+        self.stdout.write(
+            "Total: " + " - ".join(f"{name} {took:,.3f}s" for name, took in totals.items())
+        )
+
+        if not options["skip_download"]:
+            delete_sde_folder()
@@ -0,0 +1,84 @@
+# Standard Library
+import time
+
+# Django
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+
+from ... import app_settings
+from ...models.importer import FanOutSection
+from ...sde_tasks import (
+    SDE_PARTS_TO_UPDATE,
+    delete_sde_folder,
+    download_extract_sde,
+    get_sde_path,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the delete-and-reload sections with bulk_create and the database bulk loaders, "
+        "COPY on PostgreSQL, executemany and LOAD DATA on MySQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sections", nargs="*", type=str,
+                            help="Model names to benchmark, defaults to every delete-and-reload section")
+        parser.add_argument("--skip_download", action="store_true",
+                            help="Use the already downloaded SDE")
+
+    def loaders(self, connection) -> list[tuple[str, tuple[bool, bool, bool]]]:
+        """
+        (label, (ESDE_BULK_LOADERS, ESDE_MYSQL_LOAD_DATA, ESDE_RAW_ROWS)) of
+        each way to load on `connection`, executemany takes the raw rows
+        where there is no native bulk load.
+        """
+        loaders = [("bulk_create", (False, False, False))]
+        if connection.vendor == "postgresql":
+            loaders.append(("COPY", (True, False, True)))
+        else:
+            loaders.append(("executemany", (True, False, True)))
+        if connection.vendor == "mysql":
+            if connection.settings_dict.get("OPTIONS", {}).get("local_infile"):
+                loaders.append(("LOAD DATA", (True, True, True)))
+            else:
+                self.stdout.write("LOAD DATA skipped, \"local_infile\" isn't set in the database OPTIONS")
+        return loaders
+
+    def handle(self, *args, **options):
+        models = [
+            m for part in SDE_PARTS_TO_UPDATE
+            for m in (part.models if isinstance(part, FanOutSection) else [part])
+            if getattr(m.Import, "delete_and_reload", False)
+            and (not options["sections"] or m.__name__ in options["sections"])
+        ]
+        if not options["skip_download"]:
+            download_extract_sde()
+
+        loaders = {}
+        original = (app_settings.ESDE_BULK_LOADERS, app_settings.ESDE_MYSQL_LOAD_DATA, app_settings.ESDE_RAW_ROWS)
+        try:
+            for mdl in models:
+                connection = connections[router.db_for_write(mdl)]
+                if connection.alias not in loaders:
+                    loaders[connection.alias] = self.loaders(connection)
+                times = {}
+                for label, settings in loaders[connection.alias]:
+                    (
+                        app_settings.ESDE_BULK_LOADERS,
+                        app_settings.ESDE_MYSQL_LOAD_DATA,
+                        app_settings.ESDE_RAW_ROWS,
+                    ) = settings
+                    start = time.perf_counter()
+                    mdl.load_from_sde(get_sde_path())
+                    times[label] = time.perf_counter() - start
+                self.stdout.write(
+                    f"{mdl.__name__} ({connection.vendor}): " + " - ".join(
+                        f"{label} {took:,.2f}s" for label, took in times.items()
+                    )
+                )
+        finally:
+            app_settings.ESDE_BULK_LOADERS, app_settings.ESDE_MYSQL_LOAD_DATA, app_settings.ESDE_RAW_ROWS = original
+
+        if not options["skip_download"]:
+            delete_sde_folder()
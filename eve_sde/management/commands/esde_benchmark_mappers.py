@@ -0,0 +1,69 @@
+# Standard Library
+import time
+
+# Django
+from django.core.management.base import BaseCommand
+
+from ...mappers import get_row_mapper
+from ...models.importer import FanOutSection, ImportProgress, read_sde_lines
+from ...schemas import get_line_schema
+from ...sde_tasks import (
+    SDE_PARTS_TO_UPDATE,
+    delete_sde_folder,
+    download_extract_sde,
+    get_sde_path,
+)
+from ...sources import get_sde_source
+
+
+class Command(BaseCommand):
+    help = (
+        "Time building the models from every SDE file, in rows/sec, without "
+        "writing to the database. Names are looked up from the loaded SDE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sections", nargs="*", type=str,
+                            help="Model names to benchmark, defaults to all of them")
+        parser.add_argument("--skip_download", action="store_true",
+                            help="Use the already downloaded SDE")
+        parser.add_argument("--rounds", type=int, default=3,
+                            help="Best of how many passes over each file")
+
+    def handle(self, *args, **options):
+        models = [
+            m for part in SDE_PARTS_TO_UPDATE
+            for m in (part.models if isinstance(part, FanOutSection) else [part])
+            if not options["sections"] or m.__name__ in options["sections"]
+        ]
+        if not options["skip_download"]:
+            download_extract_sde()
+
+        source = get_sde_source(get_sde_path())
+        for mdl in models:
+            # decoded the same way an import would, but only once
+            progress = ImportProgress()
+            lines = list(read_sde_lines(source, mdl.Import.filename, progress, schema=get_line_schema(mdl)))
+            mdl.prepare_import()
+            get_row_mapper(mdl, rebuild=True)
+            name_lookup = mdl.name_lookup()
+
+            best = None
+            rows = 0
+            for _ in range(options["rounds"]):
+                rows = 0
+                start = time.perf_counter()
+                for data in lines:
+                    _new = mdl.from_jsonl(data, name_lookup)
+                    rows += len(_new) if isinstance(_new, list) else 1
+                took = time.perf_counter() - start
+                best = took if best is None else min(best, took)
+
+            self.stdout.write(
+                f"{mdl.__name__}: {len(lines)} lines, {rows} rows in {best:,.3f}s - "
+                f"{rows / best if best else 0:,.0f} rows/s - "
+                f"{progress.decoder} decoded in {progress.decode_time:,.3f}s"
+            )
+
+        if not options["skip_download"]:
+            delete_sde_folder()
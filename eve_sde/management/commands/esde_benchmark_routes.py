@@ -0,0 +1,59 @@
+# Standard Library
+import random
+import time
+
+# Django
+from django.core.management.base import BaseCommand
+
+from ...routes import ROUTE_FLAGS, StargateGraph
+
+
+class Command(BaseCommand):
+    help = "Time routes between random pairs of the imported solar systems, in routes/sec."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--routes", type=int, default=2000,
+                            help="Routes to find for each flag")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed for picking the systems")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        # without the route cache, every route is searched for
+        graph = StargateGraph.from_db(cache_size=0)
+        self.stdout.write(
+            f"Graph of {len(graph)} systems and {graph.gate_count} gates "
+            f"built in {time.perf_counter() - start:,.3f}s"
+        )
+        # only systems with gates, the rest have no routes to time
+        systems = [pk for pk in graph.system_ids if graph.neighbours(pk)]
+        rnd = random.Random(options["seed"])
+        pairs = [(rnd.choice(systems), rnd.choice(systems)) for _ in range(options["routes"])]
+
+        for flag in ROUTE_FLAGS:
+            jumps = 0
+            missing = 0
+            start = time.perf_counter()
+            for origin, destination in pairs:
+                path = graph.route(origin, destination, flag)
+                if path is None:
+                    missing += 1
+                else:
+                    jumps += len(path) - 1
+            took = time.perf_counter() - start
+            found = len(pairs) - missing
+            self.stdout.write(
+                f"{flag}: {len(pairs)} routes in {took:,.3f}s - {len(pairs) / took:,.0f} routes/s - "
+                f"{jumps / found if found else 0:,.1f} jumps on average - {missing} without a route"
+            )
+
+        # the jumps to a batch of systems from one pass, against a route each
+        origins = [origin for origin, _d in pairs[:20]]
+        destinations = [destination for _o, destination in pairs[:200]]
+        start = time.perf_counter()
+        graph.distances(origins, destinations)
+        took = time.perf_counter() - start
+        self.stdout.write(
+            f"distances: {len(origins)} systems to {len(destinations)} systems in {took:,.3f}s - "
+            f"{len(origins) * len(destinations) / took:,.0f} distances/s"
+        )
@@ -0,0 +1,24 @@
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+from ...routes import KSPACE, region_scope, save_jump_matrix
+
+
+class Command(BaseCommand):
+    help = "Save the jumps between every pair of k-space systems, or of each region given, for the loaded SDE build."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--region", type=int, action="append", default=[],
+                            help="Region id to save a matrix of instead of all of k-space, can be repeated")
+
+    def handle(self, *args, **options):
+        scopes = [region_scope(pk) for pk in options["region"]] or [KSPACE]
+        for scope in scopes:
+            try:
+                matrix = save_jump_matrix(scope)
+            except ValueError as e:
+                raise CommandError(e)
+            self.stdout.write(
+                f"{scope}: {len(matrix)} systems, {len(matrix) ** 2 * matrix.data.itemsize / 1024 ** 2:,.1f}MB "
+                f"for build {matrix.build}"
+            )
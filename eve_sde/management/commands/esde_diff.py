@@ -0,0 +1,86 @@
+# Standard Library
+import os
+import tempfile
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+from ...diff import (
+    apply_changeset,
+    diff_sde,
+    read_changeset,
+    section_name,
+    write_changeset,
+)
+from ...downloads import SDEArchiveCache
+from ...models import EveSDE
+from ...sde_tasks import (
+    SDE_PARTS_TO_UPDATE,
+    SDE_URL,
+    get_latest_build,
+    get_section_levels,
+    set_sde_version,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Diff the latest SDE against the loaded build, or two SDE archives, "
+        "and write the changes as JSONL. Optionally apply them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sections", nargs="*", type=str,
+                            help="Sections to compare, defaults to all of them")
+        parser.add_argument("--new", type=str,
+                            help="SDE zip or folder to compare, defaults to downloading the latest")
+        parser.add_argument("--old", type=str,
+                            help="SDE zip or folder to compare against, defaults to the cached archive of "
+                                 "the loaded build, or the stored rows if that isn't cached")
+        parser.add_argument("--output", type=str,
+                            help="File to write the changeset to, defaults to stdout")
+        parser.add_argument("--apply", action="store_true",
+                            help="Write the changes to the database")
+        parser.add_argument("--delete", action="store_true",
+                            help="With --apply, delete the rows that were removed from the SDE")
+
+    def handle(self, *args, **options):
+        # in load order so a changeset can be applied top to bottom
+        sections = [SDE_PARTS_TO_UPDATE[id] for level in get_section_levels() for id in level]
+        if options["sections"]:
+            sections = [s for s in sections if section_name(s) in options["sections"]]
+            if not sections:
+                raise CommandError(f"No sections named {', '.join(options['sections'])}")
+
+        current_build = EveSDE.get_solo().build_number
+        new = options["new"]
+        if not new:
+            new = SDEArchiveCache().download(SDE_URL, get_latest_build())
+        old = options["old"]
+        if not old and current_build:
+            # None compares against the stored rows
+            old = SDEArchiveCache().get(current_build)
+
+        changes = diff_sde(sections, new, old, from_build=current_build)
+
+        output = options["output"]
+        if options["apply"] and not output:
+            _fd, output = tempfile.mkstemp(suffix=".jsonl")
+            os.close(_fd)
+        try:
+            if output:
+                with open(output, "w", encoding="utf-8") as json_file:
+                    totals = write_changeset(changes, json_file)
+            else:
+                totals = write_changeset(changes, self.stdout)
+            self.stderr.write(
+                " - ".join(f"{op.title()}: {count}" for op, count in totals.items())
+            )
+
+            if options["apply"]:
+                apply_changeset(read_changeset(output), sections, new, delete_removed=options["delete"])
+                if not options["sections"]:
+                    set_sde_version(new)
+        finally:
+            if options["apply"] and not options["output"]:
+                os.remove(output)
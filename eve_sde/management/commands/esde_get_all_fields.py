@@ -1,11 +1,9 @@
-# Standard Library
-import json
-import os
-
 # Django
 from django.core.management.base import BaseCommand
 
-from ...sde_tasks import SDE_FOLDER, delete_sde_folder, download_extract_sde
+from ...decoders import get_decoder
+from ...sde_tasks import delete_sde_folder, download_extract_sde, get_sde_path
+from ...sources import get_sde_source
 
 
 class Command(BaseCommand):
@@ -13,13 +11,14 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         download_extract_sde()
-        files = [f for f in os.listdir(SDE_FOLDER) if os.path.isfile(os.path.join(SDE_FOLDER, f))]
-        for fl in files:
+        source = get_sde_source(get_sde_path())
+        _name, decode = get_decoder()
+        for fl in source.filenames():
             self.stdout.write(f"{fl}")
             fields = set()
-            with open(f"{SDE_FOLDER}/{fl}") as json_file:
-                while line := json_file.readline():
-                    rg = json.loads(line)
+            with source.open(fl) as json_file:
+                for line in json_file:
+                    rg = decode(line)
                     if not isinstance(rg, list):
                         for fld, typ in rg.items():
                             if fld not in fields:
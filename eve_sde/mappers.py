@@ -0,0 +1,160 @@
+"""
+Row mappers compiled from a model's `Import`.
+
+A `RowMapper` turns a decoded SDE line into a model instance in one pass.
+Everything that doesn't change between lines, the column of each field, the
+getter for each `data_map` key, the translated columns and the field
+defaults, is worked out once per import. The instance is then built from a
+positional row, which skips the per-field default lookups of `Model()`.
+"""
+
+# Standard Library
+import operator
+from functools import reduce
+
+# Third Party
+from modeltranslation.translator import NotRegistered, translator
+from modeltranslation.utils import build_localized_fieldname, get_language
+
+from .models.utils import get_langs, lang_key
+
+_mappers = {}
+
+
+def dict_getter(key):
+    """
+    `val_from_dict` for one key, with the key split up front.
+    """
+    _k, _d = key if isinstance(key, tuple) else (key, None)
+    if "." not in _k:
+        def getter(line):
+            return line.get(_k, _d)
+        return getter
+
+    parts = _k.split(".")
+
+    def getter(line):
+        try:
+            return reduce(operator.getitem, parts, line)
+        except (KeyError, TypeError):
+            # missing, or a parent that is null
+            return _d
+    return getter
+
+
+class RowMapper:
+    def __init__(self, model):
+        self.model = model
+        # return the row as a tuple in `concrete_fields` order, not a model
+        self.raw = False
+        self.data_map = model.Import.data_map
+        _fields = model._meta.concrete_fields
+        self.columns = {}
+        for i, _f in enumerate(_fields):
+            self.columns[_f.name] = i
+            self.columns[_f.attname] = i
+
+        # fields with a callable default get a new value every row
+        self.defaults = []
+        self.default_factories = []
+        for i, _f in enumerate(_fields):
+            if _f.has_default() and callable(_f.default):
+                self.default_factories.append((i, _f))
+                self.defaults.append(None)
+            else:
+                self.defaults.append(_f.get_default())
+        self.pk_column = self.columns[model._meta.pk.attname]
+
+        try:
+            translated = set(translator.get_options_for_model(model).fields)
+        except NotRegistered:
+            translated = set()
+        lang = get_language()
+
+        # (column, translated column, key), setting a translated field on a
+        # model sets the column of the active language too.
+        self.keys = ["_key"]
+        self.mapped = []
+        # anything that isn't a column is set on the instance afterwards
+        self.attrs = []
+        for _f, _k in self.data_map or ():
+            self.keys.append(_k)
+            if _f not in self.columns:
+                self.attrs.append((_f, _k))
+                continue
+            _loc = None
+            if _f in translated:
+                _loc = self.columns.get(build_localized_fieldname(_f, lang))
+            self.mapped.append((self.columns[_f], _loc, _k))
+        self.dict_getters = {_k: dict_getter(_k) for _k in self.keys}
+        self.line_getters = {dict: self.dict_getters}
+
+        # (key, field name, {SDE language: column}), filled in as they are seen
+        self.lang_fields = []
+        for _f in model.Import.lang_fields or ():
+            _fld, _key = _f if isinstance(_f, tuple) else (_f, _f)
+            self.lang_fields.append((_key, _fld, {}))
+
+        self.custom_names = bool(model.Import.custom_names)
+        if self.custom_names:
+            self.name_column = self.columns["name"]
+            self.name_loc_column = None
+            if "name" in translated:
+                self.name_loc_column = self.columns.get(build_localized_fieldname("name", lang))
+            self.langs = [(lang_key(_l), self.columns.get(f"name_{lang_key(_l)}")) for _l in get_langs()]
+
+    def getters(self, line) -> dict:
+        _type = type(line)
+        _getters = self.line_getters.get(_type)
+        if _getters is None:
+            # a typed line from `schemas`, which brings its own getters
+            _getters = self.line_getters[_type] = {_k: _type.getters[_k] for _k in self.keys}
+        return _getters
+
+    def lang_column(self, columns: dict, field_name: str, lang: str):
+        if lang not in columns:
+            columns[lang] = self.columns.get(f"{field_name}_{lang_key(lang)}")
+        return columns[lang]
+
+    def __call__(self, line, name_lookup=False, pk: bool = True):
+        row = self.defaults.copy()
+        for i, _f in self.default_factories:
+            row[i] = _f.get_default()
+        _getters = self.getters(line)
+        if pk:
+            row[self.pk_column] = _getters["_key"](line)
+        for i, _loc, _k in self.mapped:
+            row[i] = _getters[_k](line)
+            if _loc is not None:
+                row[_loc] = row[i]
+        for _key, _fld, _columns in self.lang_fields:
+            for lang, _val in (line.get(_key) or {}).items():
+                i = self.lang_column(_columns, _fld, lang)
+                if i is not None:
+                    row[i] = _val
+        if self.custom_names:
+            _name = self.model.format_name(line, name_lookup, "en")
+            row[self.name_column] = _name
+            if self.name_loc_column is not None:
+                row[self.name_loc_column] = _name
+            for lang, i in self.langs:
+                _nme = self.model.format_name(line, name_lookup, lang=lang)
+                if i is not None and _nme != _name:
+                    row[i] = _nme
+
+        if self.raw:
+            return tuple(row)
+        _model = self.model(*row)
+        for _f, _k in self.attrs:
+            setattr(_model, _f, _getters[_k](line))
+        return _model
+
+
+def get_row_mapper(model, rebuild: bool = False) -> RowMapper:
+    """
+    The compiled mapper for a model, rebuilt if its `data_map` has changed.
+    """
+    mapper = _mappers.get(model)
+    if rebuild or mapper is None or mapper.data_map is not model.Import.data_map:
+        mapper = _mappers[model] = RowMapper(model)
+    return mapper
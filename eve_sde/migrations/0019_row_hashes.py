@@ -0,0 +1,55 @@
+# Generated by Django 4.2.28 on 2026-10-18 21:34
+
+# Django
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("eve_sde", "0018_blueprintactivity_blueprintactivityproduct_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="evesdesection",
+            name="changed_rows",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="evesdesection",
+            name="new_rows",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="evesdesection",
+            name="removed_rows",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="evesdesection",
+            name="unchanged_rows",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="EveSDERowHash",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sde_section", models.CharField(max_length=250)),
+                ("row_id", models.CharField(max_length=250)),
+                ("row_hash", models.BigIntegerField()),
+                ("rows", models.IntegerField(default=1)),
+            ],
+            options={
+                "default_permissions": (),
+                "unique_together": {("sde_section", "row_id")},
+            },
+        ),
+    ]
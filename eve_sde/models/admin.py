@@ -8,3 +8,24 @@ class EveSDESection(models.Model):
     last_update = models.DateTimeField()
     total_lines = models.IntegerField()
     total_rows = models.IntegerField()
+    new_rows = models.IntegerField(default=0)
+    changed_rows = models.IntegerField(default=0)
+    unchanged_rows = models.IntegerField(default=0)
+    removed_rows = models.IntegerField(default=0)
+
+
+class EveSDERowHash(models.Model):
+    """
+    Content hash of every SDE line loaded into a section, lines that hash the
+    same as last time are skipped on the next import.
+    """
+    sde_section = models.CharField(max_length=250)
+    # The `_key` of the line
+    row_id = models.CharField(max_length=250)
+    row_hash = models.BigIntegerField()
+    # How many models were built from the line
+    rows = models.IntegerField(default=1)
+
+    class Meta:
+        default_permissions = ()
+        unique_together = (("sde_section", "row_id"),)
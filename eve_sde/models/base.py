@@ -1,19 +1,38 @@
 # Standard Library
-import json
 from datetime import datetime, timezone
 
 # Third Party
 import httpx
 
 # Django
-from django.db import models
+from django.db import connections, models, router
 from django.utils.translation import gettext as _
 
 # Alliance Auth
 from allianceauth.services.hooks import get_extension_logger
 
+from .. import app_settings
+from ..indexes import rebuilt_indexes
+from ..mappers import get_row_mapper
+from ..schemas import get_line_schema
+from ..shadow import shadow_tables
+from ..sources import get_sde_source
 from .admin import EveSDESection
-from .utils import get_langs, get_langs_for_field, lang_key, val_from_dict
+from .importer import (
+    MAX_BATCH,
+    MAX_FLUSH,
+    MIN_FLUSH,
+    QUERY_PARAMS,
+    BatchSizes,
+    ImportProgress,
+    ModelSink,
+    clamp,
+    parents_first,
+    read_sde_lines,
+    row_bytes,
+    section_transaction,
+)
+from .utils import get_langs_for_field
 
 logger = get_extension_logger(__name__)
 
@@ -26,30 +45,24 @@ class JSONModel(models.Model):
         custom_names = False
         update_fields = False
         extra_data = False
+        delete_and_reload = False
+        depends_on = ()
+        # decode into a struct generated from data_map when msgspec is installed
+        line_schema = True
+        # with delete_and_reload, load plain tuples from map_to_model instead
+        # of models, turn off if from_jsonl needs the model instances
+        raw_rows = True
+        # rows a statement and rows built before writing them, worked out
+        # from the row width by get_batch_sizes when not set
+        batch_size = None
+        flush_size = None
+        # key of the line a line references in the same file, for a self
+        # referencing model, the lines are sorted so parents load first
+        parent_key = None
 
     @classmethod
     def map_to_model(cls, json_data, name_lookup=False, pk=True):
-        _model = cls()
-        if pk:
-            _model.pk = val_from_dict("_key", json_data)
-        for f, k in cls.Import.data_map:
-            setattr(_model, f, val_from_dict(k, json_data))
-        if cls.Import.lang_fields:
-            for _f in cls.Import.lang_fields:
-                _fld = _f
-                _key = _f
-                if isinstance(_f, tuple):
-                    _fld, _key = _f
-                for lang, _val in json_data.get(_key, {}).items():
-                    setattr(_model, f"{_fld}_{lang_key(lang)}", _val)
-        if cls.Import.custom_names:
-            setattr(_model, "name", cls.format_name(json_data, name_lookup, "en"))
-            for lang in get_langs():
-                _nme = cls.format_name(json_data, name_lookup, lang=lang_key(lang))
-                if _model.name != _nme:
-                    setattr(_model, f"name_{lang_key(lang)}", _nme)
-
-        return _model
+        return get_row_mapper(cls)(json_data, name_lookup=name_lookup, pk=pk)
 
     @classmethod
     def from_jsonl(cls, json_data, name_lookup=False):
@@ -99,20 +112,14 @@ class JSONModel(models.Model):
             return data.get(f"name_{lang}")
 
     @classmethod
-    def create_update(cls, create_model_list: list["JSONModel"], update_model_list: list["JSONModel"]):
-        cls.objects.bulk_create(
-            create_model_list,
-            # ignore_conflicts=True,
-            batch_size=500
-        )
-
+    def get_update_fields(cls) -> list[str]:
+        """
+        Fields to write when a row already exists in the database.
+        """
         if cls.Import.update_fields:
-            cls.objects.bulk_update(
-                update_model_list,
-                cls.Import.update_fields,
-                batch_size=500
-            )
-        elif cls.Import.data_map:
+            return list(cls.Import.update_fields)
+        _fields = []
+        if cls.Import.data_map:
             _fields = [_f[0] for _f in cls.Import.data_map]
             if cls.Import.lang_fields:
                 for _f in cls.Import.lang_fields:
@@ -122,109 +129,181 @@ class JSONModel(models.Model):
                     _fields += get_langs_for_field(_fld)
             if cls.Import.custom_names:
                 _fields += get_langs_for_field("name")
+        return _fields
+
+    @classmethod
+    def can_upsert(cls) -> bool:
+        """
+        Can this model be loaded with a native upsert on the current database.
+        """
+        if not app_settings.ESDE_USE_UPSERT:
+            return False
+        connection = connections[router.db_for_write(cls)]
+        return connection.features.supports_update_conflicts and bool(cls.get_update_fields())
+
+    @classmethod
+    def get_batch_sizes(cls) -> BatchSizes:
+        """
+        How many rows to build before writing them, from `ESDE_BATCH_MEMORY_MB`
+        and how wide the rows are, and how many to write a statement, from the
+        columns each row takes and the database's parameter limit. Either can
+        be set on `Import` with `flush_size` and `batch_size`.
+        """
+        connection = connections[router.db_for_write(cls)]
+        max_params = min(connection.features.max_query_params or QUERY_PARAMS, QUERY_PARAMS)
+        _batch = getattr(cls.Import, "batch_size", None)
+        _columns = len(cls._meta.concrete_fields)
+        create = _batch or clamp(max_params // _columns, 1, MAX_BATCH)
+        # bulk_update sends a WHEN pk THEN value for every field of every row
+        update = _batch or clamp(max_params // (2 * len(cls.get_update_fields()) + 1), 1, MAX_BATCH)
+        flush = getattr(cls.Import, "flush_size", None) or clamp(
+            app_settings.ESDE_BATCH_MEMORY_MB * 1024 * 1024 // row_bytes(cls), MIN_FLUSH, MAX_FLUSH
+        )
+        return BatchSizes(flush=max(flush, create), create=create, update=update)
+
+    @classmethod
+    def upsert(cls, model_list: list["JSONModel"], batch_size: int = None):
+        connection = connections[router.db_for_write(cls)]
+        unique_fields = None
+        if connection.features.supports_update_conflicts_with_target:
+            unique_fields = [cls._meta.pk.name]
+        # else MySQL/MariaDB, which upsert on any unique key and reject a target.
+        cls.objects.bulk_create(
+            model_list,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=cls.get_update_fields(),
+            batch_size=batch_size or cls.get_batch_sizes().create
+        )
+
+    @classmethod
+    def create_update(
+        cls, create_model_list: list["JSONModel"], update_model_list: list["JSONModel"], sizes: BatchSizes = None
+    ):
+        sizes = sizes or cls.get_batch_sizes()
+        cls.objects.bulk_create(
+            create_model_list,
+            # ignore_conflicts=True,
+            batch_size=sizes.create
+        )
+
+        _fields = cls.get_update_fields()
+        if _fields:
             cls.objects.bulk_update(
                 update_model_list,
                 _fields,
-                batch_size=500
+                batch_size=sizes.update
             )
 
+    @classmethod
+    def get_dependencies(cls) -> set[type["JSONModel"]]:
+        """
+        Models that have to be loaded before this one, every SDE model it has
+        a foreign key to plus anything listed in `Import.depends_on`.
+        """
+        _deps = set(getattr(cls.Import, "depends_on", ()))
+        for _f in cls._meta.concrete_fields:
+            _rel = _f.related_model
+            if _f.is_relation and _rel is not cls and issubclass(_rel, JSONModel):
+                _deps.add(_rel)
+        return _deps
+
+    @classmethod
+    def prepare_import(cls):
+        """
+        Hook to set up anything `from_jsonl` needs before a file is read.
+        """
+        pass
+
+    @classmethod
+    def delete_all(cls):
+        gate_qry = cls.objects.all()
+        if gate_qry.exists():
+            # speed and we are not caring about f-keys or signals on these models
+            gate_qry._raw_delete(gate_qry.db)
+
+    @classmethod
+    def delete_removed(cls, keys: list[str]):
+        """
+        Delete the rows built from the SDE lines with these `_key`s.
+        """
+        cls.objects.filter(pk__in=keys).delete()
+
+    @classmethod
+    def loaded_rows(cls) -> dict[str, int]:
+        """
+        The rows in the table for each SDE line `_key`, as `delete_removed`
+        finds them.
+        """
+        return {str(pk): 1 for pk in cls.objects.values_list("pk", flat=True).iterator()}
+
     @classmethod
     def load_from_sde(cls, folder_name):
-        _creates = []
-        _updates = []
-
-        name_lookup = cls.name_lookup()
-        extra_fields = cls.load_extra()
-
-        pks = set(
-            cls.objects.all().values_list("pk", flat=True)
-        )  # if cls.Import.update_fields else False
-
-        file_path = f"{folder_name}/{cls.Import.filename}"
-
-        total_lines = 0
-        with open(file_path) as json_file:
-            while _ := json_file.readline():
-                total_lines += 1
-
-        total_read = 0
-        with open(file_path) as json_file:
-            row = 0
-            while line := json_file.readline():
-                row += 1
-                rg = json.loads(line)
-                if extra_fields:
-                    if rg.get("_key") in extra_fields:
-                        for f, v in extra_fields[rg.get("_key")].items():
-                            rg[f] = v
-                _new = cls.from_jsonl(rg, name_lookup)
-                if isinstance(_new, list):
-                    if pks:
-                        for _i in _new:
-                            if _i.pk in pks:
-                                _updates.append(_i)
-                            else:
-                                _creates.append(_i)
-                            total_read += 1
-                    else:
-                        _creates += _new
-                        total_read += len(_new)
-                else:
-                    if pks:
-                        if _new.pk in pks:
-                            _updates.append(_new)
-                        else:
-                            _creates.append(_new)
-                    else:
-                        _creates.append(_new)
-                    total_read += 1
-
-                if (len(_creates) + len(_updates)) >= 5000:
-                    # lets batch these to reduce memory overhead
-                    logger.info(
-                        f"{file_path} - "
-                        f"{total_read} Models from {row}/{total_lines} Lines - "
-                        f"New: {len(_creates)} - Updates: {len(_updates)}"
-                    )
-                    cls.create_update(_creates, _updates)
-                    _creates = []
-                    _updates = []
-            # create/update any that are left.
-            logger.info(
-                f"{file_path} - "
-                f"{total_read} Models from {row}/{total_lines} Lines - "
-                f"New: {len(_creates)} - Updates: {len(_updates)}"
-            )
-            cls.create_update(_creates, _updates)
+        """
+        Load this model from the SDE, `folder_name` is the extracted SDE
+        folder or the SDE zip.
+        """
+        source = get_sde_source(folder_name)
+        file_path = source.file_path(cls.Import.filename)
+        # Single pass over the file, progress is estimated from the bytes read
+        # rather than counting the lines up front.
+        progress = ImportProgress(total_bytes=source.size(cls.Import.filename))
+        with section_transaction(cls), shadow_tables(cls), rebuilt_indexes(cls):
+            sink = ModelSink(cls, file_path)
 
-        _complete = cls.objects.all().count()
-        if _complete != total_lines and _complete != total_read:
-            logger.warning(
-                f"{file_path} - Found {_complete}/{total_lines if _complete == total_lines else total_read} items after completing import."
-            )
+            lines = read_sde_lines(source, cls.Import.filename, progress, schema=get_line_schema(cls))
+            parent_key = getattr(cls.Import, "parent_key", None)
+            if parent_key:
+                lines = parents_first(lines, parent_key)
+            if sink.loader:
+                sink.stream(lines, progress)
+            else:
+                for data in lines:
+                    sink.add(data)
+                    if sink.full:
+                        # lets batch these to reduce memory overhead
+                        sink.flush(progress)
 
-        cls.update_sde_section_state(
-            folder_name,
-            cls.__name__,
-            total_lines if _complete == total_lines else total_read, _complete
-        )
+            sink.finish(source, progress)
 
     @classmethod
-    def update_sde_section_state(cls, folder_name: str, section: str, total_lines: int, total_rows: int):
-        build = 0
+    def save_batch(
+        cls, create_model_list: list["JSONModel"], update_model_list: list["JSONModel"], upsert: bool,
+        sizes: BatchSizes = None
+    ):
+        sizes = sizes or cls.get_batch_sizes()
+        if upsert:
+            cls.upsert(create_model_list, batch_size=sizes.create)
+        else:
+            cls.create_update(create_model_list, update_model_list, sizes=sizes)
+
+    @staticmethod
+    def batch_summary(create_model_list: list["JSONModel"], update_model_list: list["JSONModel"], upsert: bool) -> str:
+        if upsert:
+            return f"Upserts: {len(create_model_list)}"
+        return f"New: {len(create_model_list)} - Updates: {len(update_model_list)}"
+
+    @classmethod
+    def update_sde_section_state(
+        cls, folder_name: str, section: str, total_lines: int, total_rows: int, counts: dict = None
+    ):
         last_update = datetime.now(tz=timezone.utc)
-        with open(f"{folder_name}/_sde.jsonl") as json_file:
-            sde_data = json.loads(json_file.read())
-            build = sde_data.get("buildNumber", 0)
+        build = get_sde_source(folder_name).build_info().get("buildNumber", 0)
+
+        defaults = {
+            "build_number": build,
+            "last_update": last_update,
+            "total_lines": total_lines,
+            "total_rows": total_rows
+        }
+        # new/changed/unchanged/removed rows, without row hashes every row is new
+        counts = counts or {"new": total_rows}
+        for label in ("new", "changed", "unchanged", "removed"):
+            defaults[f"{label}_rows"] = counts.get(label, 0)
 
         EveSDESection.objects.update_or_create(
             sde_section=section,
-            defaults={
-                "build_number": build,
-                "last_update": last_update,
-                "total_lines": total_lines,
-                "total_rows": total_rows
-            }
+            defaults=defaults
         )
 
     class Meta:
@@ -0,0 +1,571 @@
+"""
+    Import stages shared by the SDE models.
+
+    A `ModelSink` batches the rows for one model, a `FanOutSection` decodes each
+    line of a SDE file once and routes it to the sinks of several models that
+    are built from the same file.
+"""
+# Standard Library
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+# Django
+from django.db import IntegrityError, connections, router, transaction
+
+# Alliance Auth
+from allianceauth.services.hooks import get_extension_logger
+
+from .. import app_settings
+from ..decoders import get_decoder
+from ..indexes import rebuilt_indexes
+from ..loaders import get_bulk_loader
+from ..mappers import get_row_mapper
+from ..schemas import reads_data_map, schema_decoder
+from ..shadow import get_shadow, shadow_tables
+from ..sources import get_sde_source
+from .admin import EveSDERowHash
+from .utils import NameLookup
+
+logger = get_extension_logger(__name__)
+
+
+@dataclass
+class ImportProgress:
+    """
+    Running totals for a single pass over a SDE file.
+    """
+    total_bytes: int = 0
+    bytes_read: int = 0
+    lines: int = 0
+    decoder: str = ""
+    decode_time: float = 0.0
+
+    @property
+    def percent(self) -> str:
+        if not self.total_bytes:
+            return "100%"
+        return f"{self.bytes_read / self.total_bytes:.0%}"
+
+    def __str__(self):
+        return f"{self.lines} Lines ({self.percent})"
+
+
+@dataclass
+class BatchSizes:
+    """
+    Rows built before they are written, and rows written a statement.
+    """
+    flush: int
+    create: int
+    update: int
+
+    def __str__(self):
+        return f"{self.flush} rows a flush, {self.create} a create, {self.update} an update"
+
+
+# Rows a statement are sized from the parameters they'd take. Upserts on
+# PostgreSQL are about flat between 10k and 45k parameters a statement.
+QUERY_PARAMS = 20000
+MAX_BATCH = 5000
+MIN_FLUSH = 500
+MAX_FLUSH = 50000
+
+# Rough size in memory of a built row, text columns are the big ones.
+ROW_BYTES = 400
+COLUMN_BYTES = {
+    "CharField": 100,
+    "TextField": 1000,
+}
+
+
+def row_bytes(model) -> int:
+    return ROW_BYTES + sum(COLUMN_BYTES.get(f.get_internal_type(), 40) for f in model._meta.concrete_fields)
+
+
+def clamp(value: int, low: int, high: int) -> int:
+    return max(low, min(value, high))
+
+
+def import_salt(model, name_lookup) -> bytes:
+    """
+    Everything besides the line itself that goes into the rows built from it,
+    how the model is mapped and the names it looks up.
+    """
+    _import = {k: v for k, v in vars(model.Import).items() if not k.startswith("__")}
+    _fields = [f.attname for f in model._meta.concrete_fields]
+    return hashlib.blake2b(
+        repr((_import, _fields)).encode() + json.dumps(name_lookup, sort_keys=True, default=salt_default).encode()
+    ).digest()
+
+
+def salt_default(value):
+    if isinstance(value, NameLookup):
+        return value.digest()
+    return str(value)
+
+
+def hashed_line(mapper, data) -> dict:
+    """
+    The part of a decoded SDE line a row hash covers, as the same plain dict
+    whether the line was decoded as a dict or with a line schema. Only the
+    keys a line schema keeps for models that can have one, all of it for the
+    rest, they are always decoded as dicts.
+    """
+    if not reads_data_map(mapper.model):
+        return data
+    _getters = mapper.getters(data)
+    _line = {_k if isinstance(_k, str) else _k[0]: _getters[_k](data) for _k in mapper.keys}
+    for _key, _fld, _columns in mapper.lang_fields:
+        _line[_key] = data.get(_key) or {}
+    return _line
+
+
+def line_hash(data: dict, salt: bytes) -> int:
+    """
+    64 bit hash of a line from `hashed_line`, sorted so the key order of the
+    file doesn't matter.
+    """
+    _json = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return int.from_bytes(
+        hashlib.blake2b(_json.encode(), digest_size=8, key=salt).digest(), "big", signed=True
+    )
+
+
+# pg_advisory_xact_lock key of the sections that drop and add foreign keys
+SCHEMA_LOCK = int.from_bytes(b"esde_ddl", "big", signed=True)
+
+
+def alters_tables(model) -> bool:
+    """
+    Does loading `model` add and drop foreign keys, with a shadow table or
+    the indexes rebuilt.
+    """
+    return bool(
+        getattr(model.Import, "delete_and_reload", False)
+        and (app_settings.ESDE_SHADOW_TABLES or app_settings.ESDE_REBUILD_INDEXES)
+    )
+
+
+def check_references(connection, models):
+    """
+    Raise `IntegrityError` if a foreign key from or to any of `models` points
+    at a row that isn't there. For mysql, where the checks are off while a
+    section loads and aren't run again when it commits. One outer join per
+    key, a scan of the referencing table.
+    """
+    fields = {}
+    for mdl in models:
+        _fields = [f for f in mdl._meta.concrete_fields if f.is_relation]
+        _fields += [_r.field for _r in mdl._meta.related_objects if _r.field.concrete]
+        for field in _fields:
+            if field.db_constraint and field.model._meta.managed:
+                fields[(field.model, field.name)] = field
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for field in fields.values():
+            table = quote(field.model._meta.db_table)
+            column = quote(field.column)
+            target = quote(field.target_field.column)
+            cursor.execute(
+                f"SELECT _r.{column} FROM {table} _r "
+                f"LEFT JOIN {quote(field.related_model._meta.db_table)} _t ON _t.{target} = _r.{column} "
+                f"WHERE _r.{column} IS NOT NULL AND _t.{target} IS NULL LIMIT 1"
+            )
+            missing = cursor.fetchone()
+            if missing is not None:
+                raise IntegrityError(
+                    f"{field.model.__name__}.{field.name} references {field.related_model.__name__} "
+                    f"{missing[0]}, which doesn't exist"
+                )
+
+
+@contextmanager
+def section_transaction(model, *models):
+    """
+    Load a section in one transaction, with the foreign key checks left
+    until it commits. Nothing sees a half loaded table, and a failed import
+    leaves the last one in place rather than an emptied table.
+
+    Pass every model of the section, `model` decides the database.
+    """
+    alias = router.db_for_write(model)
+    connection = connections[alias]
+    with transaction.atomic(using=alias):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+                if any(alters_tables(mdl) for mdl in (model, *models)):
+                    # adding or dropping a foreign key locks the table it
+                    # points at until the commit, two sections doing it at
+                    # once can each wait on a table the other holds. Taken
+                    # before any table is, and held until the commit.
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s)", [SCHEMA_LOCK])
+            elif connection.vendor == "sqlite":
+                # reset by sqlite when the transaction ends
+                cursor.execute("PRAGMA defer_foreign_keys = ON")
+            elif connection.vendor == "mysql":
+                # mysql can't defer them, the checks are off for the session
+                # instead and aren't run again on commit, so they are run
+                # here before it
+                cursor.execute("SET foreign_key_checks = 0")
+        try:
+            yield
+            if connection.vendor == "mysql":
+                check_references(connection, (model, *models))
+        finally:
+            if connection.vendor == "mysql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET foreign_key_checks = 1")
+
+
+def read_sde_lines(source, filename: str, progress: ImportProgress, schema=None):
+    """
+    Yield every decoded line of a SDE file in a single pass, recording how far
+    through the file we are on `progress`. Lines are decoded into `schema`
+    if given, see `schemas.get_line_schema`, otherwise as dicts.
+    """
+    if schema is not None:
+        progress.decoder, decode = f"msgspec {schema.__name__}", schema_decoder(schema)
+    else:
+        progress.decoder, decode = get_decoder()
+    clock = time.perf_counter
+    with source.open(filename) as json_file:
+        for line in json_file:
+            progress.lines += 1
+            progress.bytes_read += len(line)
+            start = clock()
+            data = decode(line)
+            progress.decode_time += clock() - start
+            yield data
+
+
+def parents_first(lines, parent_key: str) -> list:
+    """
+    Buffer the lines of a section that references itself and order them so
+    every line comes after the one its `parent_key` points at, keeping the
+    file order otherwise. Meant for small files, the whole file is held.
+    """
+    lines = list(lines)
+    keys = {data.get("_key") for data in lines}
+    ordered = []
+    children = {}
+    for data in lines:
+        parent = data.get(parent_key)
+        if parent is None or parent not in keys or parent == data.get("_key"):
+            ordered.append(data)
+        else:
+            children.setdefault(parent, []).append(data)
+    # breadth first, each line's children are queued once it is placed
+    i = 0
+    while i < len(ordered):
+        ordered.extend(children.pop(ordered[i].get("_key"), ()))
+        i += 1
+    if children:
+        # a loop, these are left to the deferred foreign key checks
+        leftover = [data for group in children.values() for data in group]
+        logger.warning(f"{len(leftover)} lines are in a {parent_key} loop, loading them last")
+        ordered.extend(leftover)
+    return ordered
+
+
+class ModelSink:
+    """
+    Builds and saves the rows for one model from decoded SDE lines.
+
+    All the lookups are done up front so no queries run while the lines are
+    being consumed, a COPY holds the connection until it is exhausted.
+    """
+
+    def __init__(self, model, file_path: str, batch_size: int = None, spool: bool = False):
+        self.model = model
+        self.file_path = file_path
+        self.sizes = model.get_batch_sizes()
+        self.batch_size = batch_size or self.sizes.flush
+        self.start = time.perf_counter()
+        logger.info(f"{file_path} - {model.__name__}: {self.sizes}")
+
+        model.prepare_import()
+        self.mapper = get_row_mapper(model, rebuild=True)
+        self.name_lookup = model.name_lookup()
+        self.extra_fields = model.load_extra()
+
+        self.loader = None
+        self.upsert = False
+        self.pks = set()
+        self.delete_and_reload = getattr(model.Import, "delete_and_reload", False)
+        # build plain tuples rather than models for the tables that are reloaded
+        self.raw = bool(
+            self.delete_and_reload
+            and app_settings.ESDE_RAW_ROWS
+            and getattr(model.Import, "raw_rows", True)
+            and model.Import.data_map
+            and not self.mapper.attrs
+        )
+        # the table being loaded when it isn't the model's own
+        self.shadow = get_shadow(model)
+        if self.delete_and_reload:
+            if self.shadow is None:
+                model.delete_all()
+            self.loader = get_bulk_loader(model, raw=self.raw, table=self.shadow and self.shadow.name)
+        else:
+            self.upsert = model.can_upsert()
+            if not self.upsert:
+                self.pks = set(
+                    model.objects.all().values_list("pk", flat=True)
+                )
+
+        # rows for the bulk loader are written to a temporary file and loaded
+        # once the whole file has been read.
+        self.spool = spool and self.loader is not None and self.loader.spools
+
+        self.total = 0
+        self.creates = []
+        self.updates = []
+
+        # Hashes of the lines loaded last time, unchanged lines are skipped
+        # before any models are built from them.
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+        self.hashes = None
+        if app_settings.ESDE_ROW_HASHES and not self.delete_and_reload:
+            self.salt = import_salt(model, self.name_lookup)
+            self.hashes = {
+                row_id: (row_hash, rows) for row_id, row_hash, rows in
+                EveSDERowHash.objects.filter(sde_section=model.__name__).values_list("row_id", "row_hash", "rows")
+            }
+            if self.hashes and not model.objects.exists():
+                # the table has been emptied since, load everything again
+                EveSDERowHash.objects.filter(sde_section=model.__name__).delete()
+                self.hashes = {}
+            # what is really in the table, an unchanged line whose rows have
+            # been deleted since is loaded again
+            self.loaded = model.loaded_rows() if self.hashes else {}
+            self.restored = 0
+            self.seen = set()
+            self.new_hashes = {}
+
+    def from_jsonl(self, data) -> list:
+        if self.extra_fields and data.get("_key") in self.extra_fields:
+            data = data | self.extra_fields[data.get("_key")]
+        if self.raw:
+            # only while this sink is building rows, map_to_model returns
+            # models everywhere else
+            self.mapper.raw = True
+            try:
+                _new = self.model.from_jsonl(data, self.name_lookup)
+            finally:
+                self.mapper.raw = False
+        else:
+            _new = self.model.from_jsonl(data, self.name_lookup)
+        if not isinstance(_new, list):
+            _new = [_new]
+        self.total += len(_new)
+        return _new
+
+    def add(self, data):
+        if self.spool:
+            self.loader.spool(self.from_jsonl(data))
+            return
+        changed = None
+        if self.hashes is not None:
+            changed = self.changed(data)
+            if not changed:
+                return
+        _models = self.from_jsonl(data)
+        if changed:
+            row_id, _hash = changed
+            self.new_hashes[row_id] = (_hash, len(_models))
+        for _new in _models:
+            if self.pks and _new.pk in self.pks:
+                self.updates.append(_new)
+            else:
+                self.creates.append(_new)
+
+    def changed(self, data) -> tuple[str, int] | None:
+        """
+        Count the line, returning its key and hash if it changed since last time.
+        """
+        if self.extra_fields and data.get("_key") in self.extra_fields:
+            data = data | self.extra_fields[data.get("_key")]
+        row_id = str(data.get("_key"))
+        _hash = line_hash(hashed_line(self.mapper, data), self.salt)
+        self.seen.add(row_id)
+        _last = self.hashes.get(row_id)
+        if _last is None:
+            self.counts["new"] += 1
+        elif _last[0] != _hash:
+            self.counts["changed"] += 1
+        elif self.loaded.get(row_id, 0) != _last[1]:
+            self.counts["changed"] += 1
+            self.restored += 1
+        else:
+            self.counts["unchanged"] += 1
+            # still counted towards the models in the file
+            self.total += _last[1]
+            return None
+        return row_id, _hash
+
+    def save_hashes(self):
+        section = self.model.__name__
+        replaced = [row_id for row_id in self.new_hashes if row_id in self.hashes]
+        if replaced:
+            EveSDERowHash.objects.filter(sde_section=section, row_id__in=replaced).delete()
+        EveSDERowHash.objects.bulk_create(
+            [
+                EveSDERowHash(sde_section=section, row_id=row_id, row_hash=_hash, rows=rows)
+                for row_id, (_hash, rows) in self.new_hashes.items()
+            ],
+            batch_size=500
+        )
+        self.hashes.update(self.new_hashes)
+        self.new_hashes = {}
+
+    def remove_missing(self):
+        """
+        Count the lines that are no longer in the SDE, and delete their rows if
+        `ESDE_DELETE_REMOVED_ROWS` is set.
+        """
+        removed = [row_id for row_id in self.hashes if row_id not in self.seen]
+        self.counts["removed"] = len(removed)
+        if not removed or not app_settings.ESDE_DELETE_REMOVED_ROWS:
+            return
+        logger.info(f"{self.file_path} - {self.model.__name__}: Removing {len(removed)} lines no longer in the SDE")
+        for i in range(0, len(removed), self.batch_size):
+            _ids = removed[i:i + self.batch_size]
+            self.model.delete_removed(_ids)
+            EveSDERowHash.objects.filter(sde_section=self.model.__name__, row_id__in=_ids).delete()
+
+    @property
+    def full(self) -> bool:
+        return (len(self.creates) + len(self.updates)) >= self.batch_size
+
+    def log(self, progress: ImportProgress, summary: str = ""):
+        logger.info(
+            f"{self.file_path} - {self.model.__name__}: {self.total} Models from {progress}"
+            + (f" - {summary}" if summary else "")
+        )
+
+    def flush(self, progress: ImportProgress):
+        self.log(progress, self.model.batch_summary(self.creates, self.updates, self.upsert))
+        if self.loader:
+            if self.creates:
+                self.loader.load(iter(self.creates))
+        else:
+            self.model.save_batch(self.creates, self.updates, self.upsert, sizes=self.sizes)
+        if self.hashes is not None and self.new_hashes:
+            self.save_hashes()
+        self.creates = []
+        self.updates = []
+
+    def stream(self, lines, progress: ImportProgress, every: int = 5000):
+        """
+        Feed every model straight into the bulk loader.
+        """
+        logger.info(f"{self.file_path} - Loading {self.model.__name__} with {self.loader.__class__.__name__}")
+
+        def models():
+            next_log = every
+            for data in lines:
+                yield from self.from_jsonl(data)
+                if self.total >= next_log:
+                    self.log(progress)
+                    next_log += every
+            self.log(progress)
+
+        self.loader.load(models())
+
+    def finish(self, folder_name: str, progress: ImportProgress):
+        if self.spool:
+            self.log(progress, f"Loading with {self.loader.__class__.__name__}")
+            self.loader.load_spool()
+        elif self.creates or self.updates or not self.loader:
+            self.flush(progress)
+
+        if self.hashes is not None:
+            self.remove_missing()
+            if self.restored:
+                logger.warning(
+                    f"{self.file_path} - {self.model.__name__}: {self.restored} unchanged lines "
+                    "loaded again, their rows were missing from the table"
+                )
+            logger.info(
+                f"{self.file_path} - {self.model.__name__}: " + " - ".join(
+                    f"{label.title()}: {count}" for label, count in self.counts.items()
+                )
+            )
+
+        total_lines = progress.lines
+        total_read = self.total
+        _complete = self.shadow.count() if self.shadow else self.model.objects.all().count()
+        if _complete != total_lines and _complete != total_read:
+            logger.warning(
+                f"{self.file_path} - Found {_complete}/{total_lines if _complete == total_lines else total_read} items after completing import."
+            )
+
+        self.model.update_sde_section_state(
+            folder_name,
+            self.model.__name__,
+            total_lines if _complete == total_lines else total_read, _complete,
+            counts=self.counts if self.hashes is not None else None
+        )
+        logger.info(
+            f"{self.file_path} - {self.model.__name__} imported in {time.perf_counter() - self.start:,.2f}s"
+            f" - {progress.decoder} decoded {progress.lines} lines in {progress.decode_time:,.2f}s"
+        )
+
+
+class FanOutSection:
+    """
+    Import several models built from the same SDE file in one pass.
+
+    Each line is decoded once and handed to every model's sink. Models are
+    given parents first, when a sink fills up the sinks before it are flushed
+    too so foreign keys to them are always satisfied. Sinks with a bulk loader
+    spool their rows and load them after every other sink is done.
+    """
+
+    def __init__(self, *models):
+        self.models = models
+        self.filename = models[0].Import.filename
+        for mdl in models:
+            if mdl.Import.filename != self.filename:
+                raise ValueError(f"{mdl.__name__} is not loaded from {self.filename}")
+
+    @property
+    def name(self) -> str:
+        return "+".join(mdl.__name__ for mdl in self.models)
+
+    def __str__(self):
+        return f"<FanOutSection: {self.name}>"
+
+    def get_dependencies(self) -> set:
+        _deps = set()
+        for mdl in self.models:
+            _deps |= mdl.get_dependencies()
+        # the order within the section is handled by the sinks
+        return _deps - set(self.models)
+
+    def load_from_sde(self, folder_name):
+        source = get_sde_source(folder_name)
+        file_path = source.file_path(self.filename)
+        progress = ImportProgress(total_bytes=source.size(self.filename))
+        with (
+            section_transaction(*self.models),
+            shadow_tables(*self.models),
+            rebuilt_indexes(*self.models),
+        ):
+            sinks = [ModelSink(mdl, file_path, spool=True) for mdl in self.models]
+
+            for data in read_sde_lines(source, self.filename, progress):
+                for i, sink in enumerate(sinks):
+                    sink.add(data)
+                    if sink.full:
+                        for _sink in sinks[:i + 1]:
+                            if _sink.creates or _sink.updates:
+                                _sink.flush(progress)
+
+            # loaders last, so what they reference is already saved.
+            for sink in sorted(sinks, key=lambda _sink: _sink.spool):
+                sink.finish(source, progress)
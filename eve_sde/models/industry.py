@@ -77,6 +77,17 @@ class BlueprintActivity(JSONModel):
 
         return _out
 
+    @classmethod
+    def delete_removed(cls, keys: list[str]):
+        cls.objects.filter(blueprint_item_type_id__in=keys).delete()
+
+    @classmethod
+    def loaded_rows(cls) -> dict[str, int]:
+        return {
+            str(pk): rows for pk, rows in
+            cls.objects.values_list("blueprint_item_type_id").annotate(rows=models.Count("pk")).order_by()
+        }
+
 
 class BlueprintActivityProduct(JSONModel):
     """
@@ -102,6 +113,7 @@ class BlueprintActivityProduct(JSONModel):
         )
         update_fields = False
         custom_names = False
+        delete_and_reload = True
 
     blueprint_activity = models.ForeignKey(
         BlueprintActivity,
@@ -130,25 +142,22 @@ class BlueprintActivityProduct(JSONModel):
                     "blueprint_activity_id": BlueprintActivity.build_pk(json_data.get("_key"), activity_name),
                 }
                 for product in activity_data.get("products", []):
-                    if product.get("typeID") not in cls.pks:
-                        product["typeID"] = None
-                    _out.append(cls.map_to_model(product | _activity, pk=False))
+                    # the line is shared with the other blueprint models, don't edit it
+                    _product = product | _activity
+                    if _product.get("typeID") not in cls.pks:
+                        _product["typeID"] = None
+                    _out.append(cls.map_to_model(_product, pk=False))
 
         return _out
 
     @classmethod
-    def load_from_sde(cls, folder_name):
-        gate_qry = cls.objects.all()
-        if gate_qry.exists():
-            gate_qry._raw_delete(gate_qry.db)
-
+    def prepare_import(cls):
         # there is a bad typeID in the product list.
         # we will just ignore them
 
         cls.pks = set(
             ItemType.objects.all().values_list("pk", flat=True)
         )
-        super().load_from_sde(folder_name)
 
     def __str__(self):
         return (
@@ -180,6 +189,7 @@ class BlueprintActivityMaterial(JSONModel):
         )
         update_fields = False
         custom_names = False
+        delete_and_reload = True
 
     blueprint_activity = models.ForeignKey(
         BlueprintActivity,
@@ -207,25 +217,22 @@ class BlueprintActivityMaterial(JSONModel):
                     "blueprint_activity_id": BlueprintActivity.build_pk(json_data.get("_key"), activity_name),
                 }
                 for material in activity_data.get("materials", []):
-                    if material.get("typeID") not in cls.pks:
-                        material["typeID"] = None
-                    _out.append(cls.map_to_model(material | _activity, pk=False))
+                    # the line is shared with the other blueprint models, don't edit it
+                    _material = material | _activity
+                    if _material.get("typeID") not in cls.pks:
+                        _material["typeID"] = None
+                    _out.append(cls.map_to_model(_material, pk=False))
 
         return _out
 
     @classmethod
-    def load_from_sde(cls, folder_name):
-        gate_qry = cls.objects.all()
-        if gate_qry.exists():
-            gate_qry._raw_delete(gate_qry.db)
-
+    def prepare_import(cls):
         # there is a bad typeID in the materials list.
         # we will just ignore them
         # 3927 - Clones  (met: 3924)
         cls.pks = set(
             ItemType.objects.all().values_list("pk", flat=True)
         )
-        super().load_from_sde(folder_name)
 
     def __str__(self):
         return (
@@ -8,7 +8,7 @@ from django.utils.translation import gettext_lazy as _
 from ..managers.map import MoonManager, PlanetManager
 from .base import JSONModel
 from .types import ItemType
-from .utils import get_langs_for_field, to_roman_numeral
+from .utils import NameLookup, to_roman_numeral
 
 
 class UniverseBase(JSONModel):
@@ -225,6 +225,7 @@ class Stargate(UniverseBase):
         lang_fields = False
         update_fields = False
         custom_names = False
+        delete_and_reload = True
         data_map = False
 
     destination = models.ForeignKey(
@@ -266,22 +267,18 @@ class Stargate(UniverseBase):
     def from_jsonl(cls, json_data, system_names):
         src_id = json_data.get("solarSystemID")
         dst_id = json_data.get("destination", {}).get("solarSystemID")
+        position = json_data.get("position", {})
         return cls(
             id=json_data.get("_key"),
             destination_id=dst_id,
             item_type_id=json_data.get("typeID"),
             name=f"{system_names[src_id]} ≫ {system_names[dst_id]}",
             solar_system_id=src_id,
+            x=position.get("x"),
+            y=position.get("y"),
+            z=position.get("z"),
         )
 
-    @classmethod
-    def load_from_sde(cls, folder_name):
-        gate_qry = cls.objects.all()
-        if gate_qry.exists():
-            # speed and we are not caring about f-keys or signals on these models
-            gate_qry._raw_delete(gate_qry.db)
-        super().load_from_sde(folder_name)
-
 
 class NPCStation(UniverseBase):
     """
@@ -427,17 +424,11 @@ class Planet(UniverseBase):
 
     @classmethod
     def name_lookup(cls):
-        _langs = get_langs_for_field("name")
-        return {
-            s.get("id"): s for s in
-            SolarSystem.objects.all().values("id", "name", *_langs)
-        }
+        return NameLookup(SolarSystem.objects.all())
 
     @classmethod
     def format_name(cls, json_data, system_names, lang: str = None):
-        system = system_names[json_data.get('solarSystemID')][f"name_{lang}"]
-        if not system:
-            system = system_names[json_data.get('solarSystemID')][f"name"]
+        system = system_names.name(json_data.get('solarSystemID'), lang)
         return f"{system} {to_roman_numeral(json_data.get('celestialIndex'))}"
 
 
@@ -523,29 +514,15 @@ class Moon(UniverseBase):
 
     @classmethod
     def name_lookup(cls):
-        _langs = get_langs_for_field("name")
-        planets = {
-            s.get("id"): s for s in
-            Planet.objects.all().values("id", "name", *_langs)
-        }
-        item_types = {
-            s.get("id"): s for s in
-            ItemType.objects.filter(id=14).values("id", "name", *_langs)
-        }
         return {
-            "planet": planets,
-            "item_type": item_types
+            "planet": NameLookup(Planet.objects.all()),
+            "item_type": NameLookup(ItemType.objects.filter(id=14)),
         }
 
     @classmethod
     def format_name(cls, json_data, name_lookup, lang):
-        planet = name_lookup["planet"][json_data.get('orbitID')][f"name_{lang}"]
-        if not planet:
-            planet = name_lookup["planet"][json_data.get('orbitID')][f"name"]
-
-        moon = name_lookup["item_type"].get(json_data.get("typeID"), {}).get(f"name_{lang}", "Moon")
-        if not moon:
-            moon = name_lookup["item_type"].get(json_data.get("typeID"), {}).get(f"name", "Moon")
+        planet = name_lookup["planet"].name(json_data.get('orbitID'), lang)
+        moon = name_lookup["item_type"].name(json_data.get("typeID"), lang, default="Moon")
 
         return (
             f"{planet} - {moon} {json_data.get('orbitIndex')}"
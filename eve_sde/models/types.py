@@ -130,6 +130,7 @@ class ItemMarketGroup(TypeBase):
         )
         update_fields = False
         custom_names = False
+        parent_key = "parentGroupID"
 
     # Model Fields
     description = models.TextField(null=True, blank=True, default=None)  # _en
@@ -144,26 +145,6 @@ class ItemMarketGroup(TypeBase):
         blank=True
     )
 
-    @classmethod
-    def load_from_sde(cls, folder_name) -> None:
-        # This is slower than a single pass but works.
-        # Parent group is a self ref so we need to do a full load first
-        original_data_map = cls.Import.data_map
-        first_pass_data_map = tuple(
-            (field_name, field_key)
-            for field_name, field_key in original_data_map
-            if field_name != "parent_group_id"
-        )
-
-        try:
-            setattr(cls.Import, "data_map", first_pass_data_map)
-            # First pass without parent_group_id to avoid fkey issues
-            super().load_from_sde(folder_name)
-        finally:
-            setattr(cls.Import, "data_map", original_data_map)
-        # Second pass to update parent_group_id
-        super().load_from_sde(folder_name)
-
 
 class ItemType(TypeBase):
     """
@@ -273,6 +254,7 @@ class ItemTypeMaterials(JSONModel):
         )
         update_fields = False
         custom_names = False
+        delete_and_reload = True
 
     item_type = models.ForeignKey(
         ItemType,
@@ -307,14 +289,6 @@ class ItemTypeMaterials(JSONModel):
 
         return _out
 
-    @classmethod
-    def load_from_sde(cls, folder_name):
-        gate_qry = cls.objects.all()
-        if gate_qry.exists():
-            # speed and we are not caring about f-keys or signals on these models
-            gate_qry._raw_delete(gate_qry.db)
-        super().load_from_sde(folder_name)
-
     class Meta:
         default_permissions = ()
 
@@ -555,6 +529,7 @@ class TypeEffect(JSONModel):
         )
         update_fields = False
         custom_names = False
+        delete_and_reload = True
 
     item_type = models.ForeignKey(
         ItemType,
@@ -586,14 +561,6 @@ class TypeEffect(JSONModel):
 
         return _out
 
-    @classmethod
-    def load_from_sde(cls, folder_name):
-        gate_qry = cls.objects.all()
-        if gate_qry.exists():
-            # speed and we are not caring about f-keys or signals on these models
-            gate_qry._raw_delete(gate_qry.db)
-        super().load_from_sde(folder_name)
-
     class Meta:
         default_permissions = ()
 
@@ -623,6 +590,7 @@ class TypeDogma(JSONModel):
         )
         update_fields = False
         custom_names = False
+        delete_and_reload = True
 
     item_type = models.ForeignKey(
         ItemType,
@@ -654,14 +622,6 @@ class TypeDogma(JSONModel):
 
         return _out
 
-    @classmethod
-    def load_from_sde(cls, folder_name):
-        gate_qry = cls.objects.all()
-        if gate_qry.exists():
-            # speed and we are not caring about f-keys or signals on these models
-            gate_qry._raw_delete(gate_qry.db)
-        super().load_from_sde(folder_name)
-
     class Meta:
         default_permissions = ()
 
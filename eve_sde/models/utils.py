@@ -1,4 +1,5 @@
 # Standard Library
+import hashlib
 import operator
 from functools import reduce
 
@@ -63,5 +64,58 @@ def val_from_dict(key, dict):
         _d = key[1]
     try:
         return reduce(operator.getitem, _k.split("."), dict)
-    except KeyError:
+    except (KeyError, TypeError):
         return _d
+
+
+_missing = object()
+
+
+class NameLookup:
+    """
+    Names of another model by id, for building custom names.
+
+    Only the `name` column is kept for every row, each language keeps just
+    the names that differ from it, most systems and planets are named the
+    same in every language.
+    """
+
+    def __init__(self, queryset, field_name: str = "name"):
+        self.names = {}
+        self.langs = {}
+        columns = get_langs_for_field(field_name)
+        for pk, name, *translated in queryset.values_list("pk", field_name, *columns).iterator(chunk_size=5000):
+            self.names[pk] = name
+            for column, _name in zip(columns, translated):
+                if _name and _name != name:
+                    self.langs.setdefault(column[len(field_name) + 1:], {})[pk] = _name
+
+    def __contains__(self, pk) -> bool:
+        return pk in self.names
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def name(self, pk, lang: str = None, default=_missing):
+        """
+        The name in `lang`, or the `name` column if it has none. Raises
+        KeyError for an unknown id unless there is a `default`.
+        """
+        _name = self.langs.get(lang, {}).get(pk)
+        if _name is None:
+            if default is _missing:
+                return self.names[pk]
+            return self.names.get(pk, default)
+        return _name
+
+    def digest(self) -> str:
+        """
+        Stands in for the names in `import_salt`.
+        """
+        _hash = hashlib.blake2b()
+        for pk in sorted(self.names):
+            _hash.update(repr((pk, self.names[pk])).encode())
+        for lang in sorted(self.langs):
+            for pk in sorted(self.langs[lang]):
+                _hash.update(repr((lang, pk, self.langs[lang][pk])).encode())
+        return _hash.hexdigest()
@@ -0,0 +1,592 @@
+"""
+Routes through the stargate network.
+
+`StargateGraph` holds every gate as CSR arrays over a dense index of the
+solar systems, the gates out of system `i` are
+`targets[offsets[i]:offsets[i + 1]]`. The searches walk a tuple of those per
+system instead, slicing the arrays costs more than the search itself in
+python. It is built from `Stargate` once and shared by every request in the
+process, `get_stargate_graph` builds it again when the map sections have
+been imported since.
+
+Routes follow the in game autopilot flags:
+    shortest: fewest jumps
+    secure: fewest jumps into low and null sec, then fewest jumps
+    insecure: fewest jumps into high sec, then fewest jumps
+
+Jumps from a system to many others come from one breadth first pass over the
+graph. `JumpMatrix` holds them for every pair of a set of systems, saved by
+build number with `esde_build_jump_matrix` and read back from disk.
+"""
+
+# Standard Library
+import heapq
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from functools import lru_cache
+
+# Alliance Auth
+from allianceauth.services.hooks import get_extension_logger
+
+from . import app_settings
+
+logger = get_extension_logger(__name__)
+
+SHORTEST = "shortest"
+SECURE = "secure"
+INSECURE = "insecure"
+ROUTE_FLAGS = (SHORTEST, SECURE, INSECURE)
+
+# security status is shown rounded to one place, 0.45 and up shows as high sec
+HIGH_SEC = 0.45
+
+# the sections the graph is built from
+GRAPH_SECTIONS = ("SolarSystem", "Stargate")
+
+# known space solar system ids, wormhole and abyssal systems have no gates
+KSPACE = "kspace"
+KSPACE_IDS = (30000000, 31000000)
+
+# saved jump matrices kept mapped per process, k-space and a few regions
+MATRIX_CACHE_SIZE = 16
+
+
+class StargateGraph:
+    def __init__(self, systems, gates, version=None, cache_size: int = None):
+        """
+        `systems` is (system id, security status) pairs, `gates` is
+        (from system id, to system id) pairs. The last `cache_size` routes
+        asked for are kept, `ESDE_ROUTE_CACHE_SIZE` by default.
+        """
+        self.version = version
+        self.cached_route = lru_cache(
+            maxsize=app_settings.ESDE_ROUTE_CACHE_SIZE if cache_size is None else cache_size
+        )(self.find_route)
+        systems = sorted(systems)
+        self.system_ids = array("q", [pk for pk, _sec in systems])
+        self.index = {pk: i for i, pk in enumerate(self.system_ids)}
+        self.high_sec = bytes(
+            _sec is not None and _sec >= HIGH_SEC for _pk, _sec in systems
+        )
+
+        out_gates = [set() for _s in systems]
+        in_gates = [set() for _s in systems]
+        for src, dst in gates:
+            _src = self.index.get(src)
+            _dst = self.index.get(dst)
+            if _src is None or _dst is None or _src == _dst:
+                continue
+            out_gates[_src].add(_dst)
+            in_gates[_dst].add(_src)
+        self.offsets, self.targets = self.csr(out_gates)
+        # gates come in pairs, but the search back from the destination
+        # doesn't count on it
+        self.in_offsets, self.in_targets = self.csr(in_gates)
+        self.gates = self.adjacency(self.offsets, self.targets)
+        self.in_gates = self.adjacency(self.in_offsets, self.in_targets)
+
+        # the cost of a jump into each system, a jump into an avoided system
+        # costs more than any route can have jumps, so the count of those
+        # comes first and then the jumps.
+        avoided = len(systems)
+        self.weights = {
+            SECURE: [1 if _h else avoided for _h in self.high_sec],
+            INSECURE: [avoided if _h else 1 for _h in self.high_sec],
+        }
+
+    @staticmethod
+    def csr(neighbours: list[set]) -> tuple[array, array]:
+        offsets = array("l", [0])
+        targets = array("l")
+        for _n in neighbours:
+            targets.extend(sorted(_n))
+            offsets.append(len(targets))
+        return offsets, targets
+
+    @staticmethod
+    def adjacency(offsets: array, targets: array) -> list[tuple]:
+        return [tuple(targets[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+
+    @classmethod
+    def from_db(cls, version=None, cache_size: int = None) -> "StargateGraph":
+        # Late import to avoid circular imports with the models
+        from .models import SolarSystem, Stargate
+
+        return cls(
+            SolarSystem.objects.values_list("id", "security_status").iterator(),
+            Stargate.objects.values_list("solar_system_id", "destination_id").iterator(),
+            version=version,
+            cache_size=cache_size,
+        )
+
+    def __len__(self) -> int:
+        return len(self.system_ids)
+
+    @property
+    def gate_count(self) -> int:
+        return len(self.targets)
+
+    def neighbours(self, system_id: int) -> list[int]:
+        return [self.system_ids[_n] for _n in self.gates[self.index[system_id]]]
+
+    def route(self, origin: int, destination: int, flag: str = SHORTEST) -> list[int] | None:
+        """
+        The systems from `origin` to `destination` inclusive, or None if
+        there is no route or either isn't a known system.
+        """
+        path = self.cached_route(origin, destination, flag)
+        return None if path is None else list(path)
+
+    def find_route(self, origin: int, destination: int, flag: str = SHORTEST) -> tuple[int] | None:
+        if flag not in ROUTE_FLAGS:
+            raise ValueError(f"Unknown route flag {flag}, expected one of {', '.join(ROUTE_FLAGS)}")
+        start = self.index.get(origin)
+        goal = self.index.get(destination)
+        if start is None or goal is None:
+            return None
+        if start == goal:
+            return (origin,)
+        if flag == SHORTEST:
+            path = self.shortest(start, goal)
+        else:
+            path = self.weighted(start, goal, self.weights[flag])
+        if path is None:
+            return None
+        return tuple(self.system_ids[i] for i in path)
+
+    def jumps(self, origin: int, destination: int, flag: str = SHORTEST) -> int | None:
+        path = self.route(origin, destination, flag)
+        return None if path is None else len(path) - 1
+
+    def shortest(self, start: int, goal: int) -> list[int] | None:
+        """
+        Breadth first from both ends, a level of the smaller side at a time.
+        """
+        gates, in_gates = self.gates, self.in_gates
+        # the system each was reached from, -1 for the ends, -2 not yet
+        ahead = [-2] * len(gates)
+        behind = [-2] * len(gates)
+        ahead[start] = behind[goal] = -1
+        front = [start]
+        back = [goal]
+        while front and back:
+            meets = []
+            if len(front) <= len(back):
+                _next = []
+                for node in front:
+                    for _n in gates[node]:
+                        if ahead[_n] == -2:
+                            ahead[_n] = node
+                            _next.append(_n)
+                            if behind[_n] != -2:
+                                meets.append(_n)
+                front = _next
+            else:
+                _next = []
+                for node in back:
+                    for _n in in_gates[node]:
+                        if behind[_n] == -2:
+                            behind[_n] = node
+                            _next.append(_n)
+                            if ahead[_n] != -2:
+                                meets.append(_n)
+                back = _next
+            if meets:
+                # every meeting point of the level, they aren't all as close
+                # to the end the level didn't come from
+                paths = [self.join(ahead, behind, _n) for _n in meets]
+                return min(paths, key=len)
+        return None
+
+    @staticmethod
+    def join(ahead: list, behind: list, meet: int) -> list[int]:
+        path = []
+        node = meet
+        while node != -1:
+            path.append(node)
+            node = ahead[node]
+        path.reverse()
+        node = behind[meet]
+        while node != -1:
+            path.append(node)
+            node = behind[node]
+        return path
+
+    def distance_row(self, start: int, goals: set = None) -> list[int]:
+        """
+        Jumps from `start` to every system by index, -1 where there is no
+        route. Stops once every index in `goals` has been reached.
+        """
+        gates = self.gates
+        dist = [-1] * len(gates)
+        dist[start] = 0
+        left = set(goals) - {start} if goals else None
+        front = [start]
+        jumps = 0
+        while front:
+            jumps += 1
+            _next = []
+            for node in front:
+                for _n in gates[node]:
+                    if dist[_n] == -1:
+                        dist[_n] = jumps
+                        _next.append(_n)
+                        if left is not None:
+                            left.discard(_n)
+            if left is not None and not left:
+                break
+            front = _next
+        return dist
+
+    def distances(self, origins, destinations=None) -> dict[int, dict[int, int | None]]:
+        """
+        Jumps from each of `origins` to each of `destinations`, every system
+        by default, None where there is no route or the system isn't known.
+        One breadth first pass per origin rather than a search per pair.
+        """
+        if destinations is None:
+            destinations = self.system_ids
+        columns = [(pk, self.index.get(pk)) for pk in destinations]
+        goals = None if destinations is self.system_ids else {i for _pk, i in columns if i is not None}
+        _distances = {}
+        for origin in origins:
+            start = self.index.get(origin)
+            if start is None:
+                _distances[origin] = {pk: None for pk, _i in columns}
+                continue
+            row = self.distance_row(start, goals)
+            _distances[origin] = {
+                pk: None if i is None or row[i] == -1 else row[i] for pk, i in columns
+            }
+        return _distances
+
+    def weighted(self, start: int, goal: int, weights: list[int]) -> list[int] | None:
+        """
+        Dijkstra, `weights` is the cost of a jump into each system. Systems
+        are queued in a bucket per cost, the heap only holds the costs.
+        """
+        gates = self.gates
+        best = [-1] * len(gates)
+        came_from = [-1] * len(gates)
+        best[start] = 0
+        buckets = {0: [start]}
+        costs = [0]
+        while costs:
+            cost = heapq.heappop(costs)
+            for node in buckets.pop(cost):
+                if best[node] != cost:
+                    # queued again since at a lower cost
+                    continue
+                if node == goal:
+                    path = []
+                    while node != -1:
+                        path.append(node)
+                        node = came_from[node]
+                    path.reverse()
+                    return path
+                for _n in gates[node]:
+                    _cost = cost + weights[_n]
+                    if best[_n] != -1 and _cost >= best[_n]:
+                        continue
+                    best[_n] = _cost
+                    came_from[_n] = node
+                    bucket = buckets.get(_cost)
+                    if bucket is None:
+                        buckets[_cost] = [_n]
+                        heapq.heappush(costs, _cost)
+                    else:
+                        bucket.append(_n)
+        return None
+
+
+class JumpMatrix:
+    """
+    Jumps between every pair of a set of systems, a byte each or two bytes
+    if any route is 255 jumps or more, the largest value for no route.
+
+    Saved as a header, the system ids and the rows in native byte order.
+    `load` maps the file rather than reading it, so the processes on a
+    host share one copy.
+    """
+    header = struct.Struct("=8sII")
+    magic = b"ESDEJMP1"
+
+    def __init__(self, system_ids: array, data, build: int = None, scope: str = KSPACE):
+        self.system_ids = system_ids
+        self.index = {pk: i for i, pk in enumerate(system_ids)}
+        self.data = data
+        self.missing = (1 << (8 * data.itemsize)) - 1
+        self.build = build
+        self.scope = scope
+
+    @classmethod
+    def from_graph(
+        cls, graph: StargateGraph, system_ids=None, build: int = None, scope: str = KSPACE
+    ) -> "JumpMatrix":
+        """
+        The matrix of `system_ids`, every system with a gate by default,
+        routes may leave the set.
+        """
+        if system_ids is None:
+            system_ids = [pk for i, pk in enumerate(graph.system_ids) if graph.gates[i]]
+        ids = array("q", sorted({pk for pk in system_ids if pk in graph.index}))
+        columns = [graph.index[pk] for pk in ids]
+        data = array("H")
+        top = 0
+        for pk in ids:
+            row = graph.distance_row(graph.index[pk])
+            _row = [row[i] for i in columns]
+            top = max(top, max(_row, default=0))
+            data.extend([0xFFFF if d == -1 else d for d in _row])
+        if top < 0xFF:
+            # every value fits the low byte, 0xFFFF becomes 0xFF
+            data = array("B", data.tobytes()[0 if sys.byteorder == "little" else 1::2])
+        return cls(ids, data, build=build, scope=scope)
+
+    @classmethod
+    def load(cls, path: str, build: int = None, scope: str = KSPACE) -> "JumpMatrix":
+        with open(path, "rb") as f:
+            _map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, itemsize, count = cls.header.unpack_from(_map) if len(_map) >= cls.header.size else (b"", 0, 0)
+        start = cls.header.size + 8 * count
+        if magic != cls.magic or itemsize not in (1, 2) or len(_map) != start + count * count * itemsize:
+            _map.close()
+            raise ValueError(f"{path} is not a jump matrix")
+        ids = array("q")
+        ids.frombytes(_map[cls.header.size:start])
+        data = memoryview(_map)[start:].cast("B" if itemsize == 1 else "H")
+        return cls(ids, data, build=build, scope=scope)
+
+    def save(self, path: str):
+        """
+        Written next to `path` and renamed over it, readers never see half a file.
+        """
+        _path = f"{path}.part"
+        with open(_path, "wb") as f:
+            f.write(self.header.pack(self.magic, self.data.itemsize, len(self.system_ids)))
+            f.write(self.system_ids.tobytes())
+            f.write(bytes(self.data))
+        os.replace(_path, path)
+
+    def __len__(self) -> int:
+        return len(self.system_ids)
+
+    def covers(self, system_ids) -> bool:
+        return all(pk in self.index for pk in system_ids)
+
+    def jumps(self, origin: int, destination: int) -> int | None:
+        i = self.index.get(origin)
+        j = self.index.get(destination)
+        if i is None or j is None:
+            return None
+        jumps = self.data[i * len(self.system_ids) + j]
+        return None if jumps == self.missing else jumps
+
+    def distances(self, origins, destinations=None) -> dict[int, dict[int, int | None]]:
+        """
+        As `StargateGraph.distances`, for the systems in the matrix.
+        """
+        count = len(self.system_ids)
+        if destinations is None:
+            destinations = self.system_ids
+        columns = [(pk, self.index.get(pk)) for pk in destinations]
+        missing = self.missing
+        _distances = {}
+        for origin in origins:
+            i = self.index.get(origin)
+            if i is None:
+                _distances[origin] = {pk: None for pk, _j in columns}
+                continue
+            row = self.data[i * count:(i + 1) * count]
+            _distances[origin] = {
+                pk: None if j is None or row[j] == missing else row[j] for pk, j in columns
+            }
+        return _distances
+
+
+def matrix_path(build: int, scope: str = KSPACE) -> str:
+    return f"{app_settings.ESDE_SDE_CACHE_DIR}/jumps-{build}-{scope}.bin"
+
+
+def region_scope(region_id: int) -> str:
+    return f"region-{region_id}"
+
+
+def save_jump_matrix(scope: str = KSPACE, build: int = None, graph: StargateGraph = None) -> JumpMatrix:
+    """
+    Build and save the matrix of k-space or a `region_scope`, for the loaded
+    SDE build by default. The matrices of other builds for it are removed.
+    """
+    # Late import to avoid circular imports with the models
+    from .models import EveSDE, SolarSystem
+
+    if build is None:
+        build = EveSDE.get_solo().build_number
+    if build is None:
+        raise ValueError("No SDE build has been loaded")
+    if graph is None:
+        graph = get_stargate_graph()
+    systems = SolarSystem.objects.all()
+    if scope == KSPACE:
+        systems = systems.filter(id__gte=KSPACE_IDS[0], id__lt=KSPACE_IDS[1])
+    elif scope.startswith("region-"):
+        systems = systems.filter(constellation__region_id=int(scope.removeprefix("region-")))
+    else:
+        raise ValueError(f"Unknown jump matrix {scope}")
+    # only systems with gates, the rest would be rows of nothing
+    system_ids = [
+        pk for pk in systems.values_list("id", flat=True)
+        if pk in graph.index and graph.gates[graph.index[pk]]
+    ]
+
+    start = time.perf_counter()
+    matrix = JumpMatrix.from_graph(graph, system_ids, build=build, scope=scope)
+    os.makedirs(app_settings.ESDE_SDE_CACHE_DIR, exist_ok=True)
+    path = matrix_path(build, scope)
+    matrix.save(path)
+    logger.info(
+        f"Jump matrix of {len(matrix)} systems saved to {path} in {time.perf_counter() - start:,.2f}s"
+    )
+
+    suffix = f"-{scope}.bin"
+    for name in os.listdir(app_settings.ESDE_SDE_CACHE_DIR):
+        if name.startswith("jumps-") and name.endswith(suffix) and name != os.path.basename(path):
+            os.remove(f"{app_settings.ESDE_SDE_CACHE_DIR}/{name}")
+    return matrix
+
+
+def sections_version(sections) -> tuple:
+    """
+    When `sections` were last imported.
+    """
+    # Late import to avoid circular imports with the models
+    from .models import EveSDESection
+
+    return tuple(
+        EveSDESection.objects.filter(sde_section__in=sections)
+        .order_by("sde_section")
+        .values_list("sde_section", "build_number", "last_update")
+    )
+
+
+class ImportedCache:
+    """
+    One `build(version)` per process from the imported `sections`. The import
+    state is checked at most every `ESDE_ROUTE_CHECK_SECONDS`, and it is
+    built again if it has changed.
+    """
+
+    def __init__(self, sections, build):
+        self.sections = sections
+        self.build = build
+        self.value = None
+        self.version = None
+        self.checked = 0.0
+        self.lock = threading.Lock()
+
+    def expired(self) -> bool:
+        return self.value is None or time.monotonic() - self.checked >= app_settings.ESDE_ROUTE_CHECK_SECONDS
+
+    def get(self):
+        if not self.expired():
+            return self.value
+        with self.lock:
+            if self.expired():
+                version = sections_version(self.sections)
+                if self.value is None or self.version != version:
+                    self.value = self.build(version)
+                    self.version = version
+                self.checked = time.monotonic()
+        return self.value
+
+
+def build_stargate_graph(version=None) -> StargateGraph:
+    start = time.perf_counter()
+    graph = StargateGraph.from_db(version=version)
+    logger.info(
+        f"Stargate graph of {len(graph)} systems and {graph.gate_count} gates "
+        f"built in {time.perf_counter() - start:,.2f}s"
+    )
+    return graph
+
+
+def matrix_cache(version=None) -> dict:
+    # scope: (checked, JumpMatrix or None), emptied when the map is imported again
+    return {}
+
+
+_graph = ImportedCache(GRAPH_SECTIONS, build_stargate_graph)
+_matrices = ImportedCache(GRAPH_SECTIONS, matrix_cache)
+
+
+def get_stargate_graph() -> StargateGraph:
+    """
+    The graph of the imported SDE, built again after the map is imported.
+    """
+    return _graph.get()
+
+
+def get_route(origin: int, destination: int, flag: str = SHORTEST) -> list[int] | None:
+    """
+    The solar system ids from `origin` to `destination` inclusive, or None
+    if there is no route by stargate.
+    """
+    return get_stargate_graph().route(origin, destination, flag)
+
+
+def get_jumps(origin: int, destination: int, flag: str = SHORTEST) -> int | None:
+    return get_stargate_graph().jumps(origin, destination, flag)
+
+
+def get_jump_matrix(scope: str = KSPACE) -> JumpMatrix | None:
+    """
+    The saved matrix of `scope` for the loaded SDE build, or None if there
+    isn't one. Looked for again at most every `ESDE_ROUTE_CHECK_SECONDS`,
+    and up to `MATRIX_CACHE_SIZE` scopes are kept until the map is imported
+    again.
+    """
+    # Late import to avoid circular imports with the models
+    from .models import EveSDE
+
+    matrices = _matrices.get()
+    checked, matrix = matrices.get(scope, (None, None))
+    if checked is not None and time.monotonic() - checked < app_settings.ESDE_ROUTE_CHECK_SECONDS:
+        return matrix
+    build = EveSDE.get_solo().build_number
+    if matrix is None or matrix.build != build:
+        matrix = None
+        path = matrix_path(build, scope)
+        if build and os.path.exists(path):
+            try:
+                matrix = JumpMatrix.load(path, build=build, scope=scope)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Couldn't load jump matrix {path}: {e}")
+    # the scope checked longest ago makes way, its map is closed once unused
+    matrices.pop(scope, None)
+    while len(matrices) >= MATRIX_CACHE_SIZE:
+        matrices.pop(next(iter(matrices)), None)
+    matrices[scope] = (time.monotonic(), matrix)
+    return matrix
+
+
+def get_jump_distances(origins, destinations) -> dict[int, dict[int, int | None]]:
+    """
+    Shortest jumps from each of `origins` to each of `destinations`, None
+    where there is no route. From the saved k-space matrix when it has
+    them all, otherwise one pass over the stargate graph per origin.
+    """
+    origins = list(origins)
+    destinations = list(destinations)
+    matrix = get_jump_matrix()
+    if matrix is not None and matrix.covers(origins) and matrix.covers(destinations):
+        return matrix.distances(origins, destinations)
+    return get_stargate_graph().distances(origins, destinations)
+
+
+def get_jumps_to(origin: int, destinations) -> dict[int, int | None]:
+    return get_jump_distances([origin], destinations)[origin]
@@ -0,0 +1,179 @@
+"""
+Typed line schemas for the SDE files.
+
+With msgspec installed each model that is built straight from its
+`Import.data_map` gets a `Struct` generated from it. Lines are decoded into
+that instead of a dict, keys the model doesn't use are skipped by the
+decoder and dotted keys like `position.x` become nested structs, read with
+a getter built once per field rather than splitting the key on every row.
+
+The structs keep the parts of the dict interface the import uses, `get`,
+`value` and `|` to merge in `Import.extra_data`.
+"""
+
+# Standard Library
+import operator
+from typing import Any, ClassVar
+
+# Alliance Auth
+from allianceauth.services.hooks import get_extension_logger
+
+from . import app_settings
+
+try:
+    # Third Party
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = get_extension_logger(__name__)
+
+# SDELine methods, keys with these names can't be schema fields
+RESERVED = ("get", "value", "getters")
+
+
+if msgspec is not None:
+    class SDELine(msgspec.Struct, gc=False):
+        """
+        Base of the generated line schemas.
+        """
+        getters: ClassVar[dict] = {}
+
+        def get(self, key: str, default=None):
+            return getattr(self, key, default)
+
+        def value(self, key):
+            """
+            `val_from_dict` for a `data_map` key.
+            """
+            return self.getters[key](self)
+
+        def __or__(self, other: dict):
+            return msgspec.structs.replace(
+                self, **{_k: _v for _k, _v in other.items() if _k in self.__struct_fields__}
+            )
+
+
+def key_path(key) -> tuple[list[str], Any]:
+    if isinstance(key, tuple):
+        return key[0].split("."), key[1]
+    return key.split("."), None
+
+
+def make_getter(path: list[str], attrs: int, default):
+    """
+    Read `path` from a line, the first `attrs` parts are struct attributes
+    and the rest are keys of a plain dict.
+    """
+    if attrs == len(path):
+        # missing keys are already the struct defaults
+        _get = operator.attrgetter(".".join(path))
+        if attrs == 1:
+            return _get
+
+        def getter(line):
+            try:
+                return _get(line)
+            except AttributeError:
+                # a parent that is null in the line
+                return default
+        return getter
+    _attrs = path[:attrs]
+    _keys = path[attrs:]
+
+    def getter(line):
+        try:
+            for _a in _attrs:
+                line = getattr(line, _a)
+            for _k in _keys:
+                line = line[_k]
+        except (AttributeError, KeyError, TypeError):
+            return default
+        return line
+
+    return getter
+
+
+def build_schema(model):
+    """
+    Generate the line schema of a model from its `Import`.
+    """
+    _import = model.Import
+    # top level keys read as a whole dict, the lang fields
+    dicts = dict.fromkeys(_f[1] if isinstance(_f, tuple) else _f for _f in _import.lang_fields or ())
+    tree = {"_key": None} | {_k: {} for _k in dicts}
+
+    getters = {"_key": make_getter(["_key"], 1, None)}
+    for _f, _k in _import.data_map:
+        path, default = key_path(_k)
+        if path[0] in RESERVED:
+            raise ValueError(f"{path[0]} clashes with a SDELine method")
+        node = tree
+        depth = 0
+        for part in path[:-1]:
+            if node is tree and part in dicts:
+                # the lang field itself is an attribute, what's under it keys
+                depth += 1
+                break
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                raise ValueError(f"{part} is read as both a value and an object")
+            depth += 1
+        else:
+            if isinstance(node.setdefault(path[-1], default), dict):
+                raise ValueError(f"{path[-1]} is read as both a value and an object")
+            depth += 1
+        getters[_k] = make_getter(path, depth, default)
+
+    def struct(name: str, node: dict, bases: tuple | None):
+        fields = []
+        for _k, _v in node.items():
+            # either can be null in a line, like a missing key on the dict path
+            if node is tree and _k in dicts:
+                fields.append((_k, dict | None, msgspec.field(default_factory=dict)))
+            elif isinstance(_v, dict):
+                _sub = struct(f"{name}_{_k}", _v, None)
+                fields.append((_k, _sub | None, msgspec.field(default_factory=_sub)))
+            else:
+                fields.append((_k, Any, _v))
+        return msgspec.defstruct(name, fields, bases=bases, gc=False)
+
+    schema = struct(f"{model.__name__}Line", tree, (SDELine,))
+    schema.getters = getters
+    return schema
+
+
+def schema_decoder(schema):
+    return msgspec.json.Decoder(schema).decode
+
+
+def reads_data_map(model) -> bool:
+    """
+    Is a model built from just the keys of its `data_map` and lang fields, so
+    it can have a line schema, whether or not msgspec is installed.
+    """
+    # Late import to avoid circular imports with the models
+    from .models.base import JSONModel
+
+    return bool(
+        model.Import.data_map
+        and getattr(model.Import, "line_schema", True)
+        and model.from_jsonl.__func__ is JSONModel.from_jsonl.__func__
+    )
+
+
+def get_line_schema(model):
+    """
+    The line schema for a model, or None if its lines are decoded as dicts,
+    when msgspec isn't installed or isn't the decoder set, or the model builds
+    its rows from more of the line than its `data_map`.
+    """
+    if msgspec is None or app_settings.ESDE_JSON_DECODER not in ("auto", "msgspec"):
+        return None
+    if not reads_data_map(model):
+        return None
+    try:
+        return build_schema(model)
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Decoding {model.__name__} as dicts, no line schema: {e}")
+        return None
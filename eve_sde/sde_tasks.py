@@ -1,17 +1,23 @@
 # Standard Library
-import json
 import os
 import shutil
 import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 
 # Third Party
 import httpx
 
+# Django
+from django.db import connection, connections
+
 # Alliance Auth
 from allianceauth.services.hooks import get_extension_logger
 
+from . import app_settings
+from .downloads import SDEArchiveCache
 from .models import EveSDE
+from .models.importer import FanOutSection
 from .models.industry import (
     BlueprintActivity,
     BlueprintActivityMaterial,
@@ -39,81 +45,81 @@ from .models.types import (
     TypeDogma,
     TypeEffect,
 )
+from .sources import get_sde_source
 
 logger = get_extension_logger(__name__)
 
-# What models and the order to load them
+# What models to load, sections only wait on the sections they have foreign keys
+# to (see `get_section_dependencies`) so the order here is only a tie breaker.
+# A FanOutSection loads several models from the same file in one pass
 SDE_PARTS_TO_UPDATE = [
     # Types
     ItemCategory,
     ItemGroup,
     ItemMarketGroup,
-    ItemType,  # Requires: ItemGroup and ItemMarketGroup
+    ItemType,
     ItemTypeMaterials,
-    BlueprintActivity,
-    BlueprintActivityProduct,
-    BlueprintActivityMaterial,
+    # blueprints.jsonl is read once for all three
+    FanOutSection(BlueprintActivity, BlueprintActivityProduct, BlueprintActivityMaterial),
     DogmaUnit,
     DogmaAttributeCategory,
     DogmaAttribute,
     DogmaEffect,
-    TypeDogma,
-    TypeEffect,
+    # typeDogma.jsonl is read once for both
+    FanOutSection(TypeDogma, TypeEffect),
     # Map
     Region,
     Constellation,
     SolarSystem,
     #  System stuffs
-    NPCStation,  # Requires: SolarSystem, ItemType
+    NPCStation,
     Stargate,
     Planet,
     Moon,
 ]
 
 SDE_URL = "https://developers.eveonline.com/static-data/eve-online-static-data-latest-jsonl.zip"
+SDE_LATEST_URL = "https://developers.eveonline.com/static-data/tranquility/latest.jsonl"
 SDE_FILE_NAME = "eve-online-static-data-latest-jsonl.zip"
 SDE_FOLDER = "eve-sde"
 
 
-def download_file(url, local_filename):
-    """
-    Downloads a file from a given URL using httpx and saves it locally.
+def delete_sde_zip():
+    os.remove(SDE_FILE_NAME)
 
-    Args:
-        url (str): The URL of the file to download.
-        local_filename (str): The path and name to save the downloaded file.
+
+def delete_sde_folder():
     """
-    try:
-        with httpx.stream("GET", url, follow_redirects=True) as response:
-            response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-            with open(local_filename, "wb") as f:
-                for chunk in response.iter_bytes():
-                    f.write(chunk)
-        logger.info(f"File downloaded successfully to: {local_filename}")
-    except httpx.HTTPStatusError as e:
-        logger.error(f"HTTP error during download: {e}")
-    except httpx.RequestError as e:
-        logger.error(f"Network error during download: {e}")
-    except Exception as e:
-        logger.exception(f"An unexpected error occurred: {e}")
+    Remove the downloaded SDE, whether it was extracted or not.
+    """
+    if os.path.isdir(SDE_FOLDER):
+        shutil.rmtree(SDE_FOLDER)
+    if os.path.exists(SDE_FILE_NAME):
+        delete_sde_zip()
 
 
-def delete_sde_zip():
-    os.remove(SDE_FILE_NAME)
+def get_sde_path() -> str:
+    """
+    Where the sections are loaded from, the extracted folder or the zip itself.
+    """
+    if app_settings.ESDE_EXTRACT_SDE:
+        return SDE_FOLDER
+    return SDE_FILE_NAME
 
 
-def delete_sde_folder():
-    shutil.rmtree(SDE_FOLDER)
+def get_latest_build() -> int | None:
+    """
+    {"_key": "sde", "buildNumber": 3142455, "releaseDate": "2025-12-15T11:14:02Z"}
+    """
+    data = httpx.get(SDE_LATEST_URL).json()
+    return data.get("buildNumber")
 
 
 def check_sde_version():
     """
     {"_key": "sde", "buildNumber": 3142455, "releaseDate": "2025-12-15T11:14:02Z"}
     """
-    url = "https://developers.eveonline.com/static-data/tranquility/latest.jsonl"
-    data = httpx.get(url).json()
-
-    build_number = data.get("buildNumber")
+    build_number = get_latest_build()
 
     current = EveSDE.get_solo()
 
@@ -124,57 +130,153 @@ def check_sde_version():
 
 
 def download_extract_sde():
-    download_file(
-        SDE_URL,
-        SDE_FILE_NAME
-    )
-    with zipfile.ZipFile(SDE_FILE_NAME, mode="r") as zf:
+    try:
+        build = get_latest_build()
+    except (httpx.HTTPError, ValueError) as e:
+        # the cache will revalidate the newest archive it has instead
+        logger.warning(f"Unable to check the latest SDE build: {e}")
+        build = None
+    archive = SDEArchiveCache().download(SDE_URL, build)
+
+    if not app_settings.ESDE_EXTRACT_SDE:
+        # read straight out of the zip by the importers, the cached archive is
+        # linked so cleaning up leaves the cache alone.
+        if os.path.exists(SDE_FILE_NAME):
+            delete_sde_zip()
+        try:
+            os.link(archive, SDE_FILE_NAME)
+        except OSError:
+            shutil.copyfile(archive, SDE_FILE_NAME)
+        return
+    with zipfile.ZipFile(archive, mode="r") as zf:
         zf.extractall(path=SDE_FOLDER)
-    # delete the zip
-    delete_sde_zip()
 
 
 def process_section_of_sde(id: int = 0):
     """
         Update a SDE model.
     """
-    SDE_PARTS_TO_UPDATE[id].load_from_sde(SDE_FOLDER)
+    SDE_PARTS_TO_UPDATE[id].load_from_sde(get_sde_path())
+
+
+def get_section_dependencies() -> dict[int, set[int]]:
+    """
+    The ids of the sections each section in `SDE_PARTS_TO_UPDATE` has to wait for.
+    """
+    section_ids = {}
+    for id, section in enumerate(SDE_PARTS_TO_UPDATE):
+        for mdl in getattr(section, "models", (section,)):
+            section_ids[mdl] = id
+
+    dependencies = {}
+    for id, section in enumerate(SDE_PARTS_TO_UPDATE):
+        dependencies[id] = set()
+        for mdl in section.get_dependencies():
+            if mdl in section_ids:
+                dependencies[id].add(section_ids[mdl])
+            else:
+                logger.warning(f"{section} depends on {mdl.__name__} which is not loaded from the SDE")
+    return dependencies
+
+
+def get_section_levels(start_from: int = 0) -> list[list[int]]:
+    """
+    Group the section ids into levels, every section only depends on sections
+    in an earlier level so each level can be loaded in parallel.
+    Sections before `start_from` are treated as already loaded.
+    """
+    dependencies = get_section_dependencies()
+    done = set(range(start_from))
+    pending = [id for id in dependencies if id not in done]
+    levels = []
+    while pending:
+        level = [id for id in pending if dependencies[id] <= done]
+        if not level:
+            raise ValueError(
+                "Circular dependency between " + ", ".join(str(SDE_PARTS_TO_UPDATE[id]) for id in pending)
+            )
+        levels.append(level)
+        done.update(level)
+        pending = [id for id in pending if id not in done]
+    return levels
+
+
+def get_import_threads() -> int:
+    # SQLite only has the one writer, threads just wait on the lock.
+    if connection.vendor == "sqlite":
+        return 1
+    return max(1, app_settings.ESDE_IMPORT_THREADS)
+
+
+def process_section_in_thread(id: int):
+    try:
+        logger.info(f"Starting {SDE_PARTS_TO_UPDATE[id]}")
+        process_section_of_sde(id)
+    finally:
+        # each thread gets its own connections
+        connections.close_all()
+
+
+def process_level(ids: list[int], threads: int = 0):
+    """
+        Update the sections of one level from `get_section_levels`, none of
+        them depend on each other so they are all started at once.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(len(ids), threads or get_import_threads()))) as pool:
+        for future in [pool.submit(process_section_in_thread, id) for id in ids]:
+            future.result()
+
+
+def process_sections(start_from: int = 0, threads: int = 0):
+    """
+        Update the SDE sections, starting each one as soon as everything it
+        depends on is loaded.
+    """
+    # raises on a circular dependency before anything is started
+    get_section_levels(start_from)
+
+    dependencies = get_section_dependencies()
+    done = set(range(start_from))
+    for id in done:
+        logger.info(f"Skipping {SDE_PARTS_TO_UPDATE[id]}")
+    pending = [id for id in dependencies if id not in done]
+
+    with ThreadPoolExecutor(max_workers=threads or get_import_threads()) as pool:
+        running = {}
+        while pending or running:
+            for id in [id for id in pending if dependencies[id] <= done]:
+                pending.remove(id)
+                running[pool.submit(process_section_in_thread, id)] = id
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result()
+                done.add(running.pop(future))
 
 
 def process_from_sde(start_from: int = 0):
     """
-        Update the SDE models in order.
+        Update the SDE models, independent sections are loaded in parallel.
+        The sections before `start_from` in `SDE_PARTS_TO_UPDATE` are skipped.
     """
     download_extract_sde()
 
-    count = 0
-    for mdl in SDE_PARTS_TO_UPDATE:
-        if count >= start_from:
-            logger.info(f"Starting {mdl}")
-            process_section_of_sde(count)
-        else:
-            logger.info(f"Skipping {mdl}")
-        count += 1
+    process_sections(start_from)
 
     set_sde_version()
     delete_sde_folder()
 
 
-def set_sde_version():
+def set_sde_version(folder_name: str = None):
     """
     {"_key": "sde", "buildNumber": 3142455, "releaseDate": "2025-12-15T11:14:02Z"}
     """
-    build = 0
-    release = datetime.now(tz=timezone.utc)
-
-    with open(f"{SDE_FOLDER}/_sde.jsonl") as json_file:
-        sde_data = json.loads(json_file.read())
-        build = sde_data.get("buildNumber", 0)
-        release_date = sde_data.get("releaseDate")
-        if release_date.endswith("Z"):
-            release_date = release_date[:-1] + "+00:00"
+    sde_data = get_sde_source(folder_name or get_sde_path()).build_info()
+    build = sde_data.get("buildNumber", 0)
+    release_date = sde_data.get("releaseDate")
+    if release_date.endswith("Z"):
+        release_date = release_date[:-1] + "+00:00"
 
-        release = datetime.fromisoformat(release_date)
+    release = datetime.fromisoformat(release_date)
 
     _o = EveSDE.get_solo()
     _o.build_number = build
@@ -0,0 +1,206 @@
+"""
+Shadow tables for the sections that are deleted and reloaded.
+
+Rather than emptying the live table, the rows are loaded into a new table
+with the same columns, its indexes are built once it is full, and it is
+renamed over the live table. Readers see the old rows until the rename,
+which is the only step that locks the live table.
+
+The model is left alone, the sink hands the shadow's name to its loader so
+the rows go there while anything else using the model in the process still
+reads the live table.
+"""
+
+# Standard Library
+import time
+from contextlib import contextmanager
+
+# Django
+from django.db import connections, router
+
+# Alliance Auth
+from allianceauth.services.hooks import get_extension_logger
+
+from . import app_settings
+
+logger = get_extension_logger(__name__)
+
+SHADOW_MARK = "__esde"
+
+# model: ShadowTable, for the models being loaded right now
+_active = {}
+
+
+def can_shadow(model) -> bool:
+    """
+    Only tables nothing else has a foreign key to can be swapped, the keys
+    would follow the old table when it is renamed away.
+
+    Not on mysql, every CREATE and RENAME TABLE commits the transaction the
+    section is loaded in, so it is reloaded in place instead.
+    """
+    if not app_settings.ESDE_SHADOW_TABLES or not getattr(model.Import, "delete_and_reload", False):
+        return False
+    if connections[router.db_for_write(model)].vendor not in ("postgresql", "sqlite"):
+        return False
+    _refs = [_r for _r in model._meta.related_objects if _r.related_model is not model]
+    if _refs:
+        logger.warning(
+            f"{model.__name__}: reloading in place, referenced by "
+            + ", ".join(_r.related_model.__name__ for _r in _refs)
+        )
+        return False
+    return True
+
+
+def get_shadow(model) -> "ShadowTable | None":
+    return _active.get(model)
+
+
+class ShadowTable:
+    def __init__(self, model):
+        self.model = model
+        self.alias = router.db_for_write(model)
+        self.connection = connections[self.alias]
+        self.live = model._meta.db_table
+        # a new name every load, the index and constraint names are made
+        # from it and the live table still has the last ones.
+        self.name = f"{self.live}{SHADOW_MARK}{int(time.time() * 1000):x}"
+        self.deferred_sql = []
+
+    def quote(self, name: str) -> str:
+        return self.connection.ops.quote_name(name)
+
+    def execute(self, *statements: str):
+        with self.connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def count(self) -> int:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {self.quote(self.name)}")
+            return cursor.fetchone()[0]
+
+    def create(self):
+        """
+        Create the table, everything but the columns is held back for `build`.
+        """
+        # collected rather than entered, sqlite won't open a schema editor
+        # inside a transaction. The sql is written for the live table and
+        # pointed at the shadow, the deferred sql is run once the rows are in.
+        editor = self.connection.schema_editor(collect_sql=True)
+        editor.collected_sql = []
+        editor.deferred_sql = []
+        editor.create_model(self.model)
+        live, shadow = self.quote(self.live), self.quote(self.name)
+        self.execute(*(sql.replace(live, shadow) for sql in editor.collected_sql))
+        for sql in editor.deferred_sql:
+            sql.rename_table_references(self.live, self.name)
+        self.deferred_sql = editor.deferred_sql
+
+    def build(self):
+        """
+        The indexes and constraints of the full table. On sqlite the indexes
+        of the live table are made again after the swap instead, it can't
+        rename them.
+        """
+        if self.connection.vendor == "sqlite":
+            return
+        start = time.perf_counter()
+        self.execute(*(str(sql) for sql in self.deferred_sql if str(sql)))
+        logger.info(
+            f"{self.model.__name__}: indexes built on {self.name} in {time.perf_counter() - start:,.2f}s"
+        )
+
+    def object_names(self, table: str) -> dict[tuple, list[str]]:
+        """
+        Names of the constraints, indexes and sequences of `table` on
+        postgres, by kind and definition.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 'CONSTRAINT', c.contype::text || pg_get_constraintdef(c.oid), c.conname "
+                "FROM pg_constraint c WHERE c.conrelid = %s::regclass "
+                "UNION ALL "
+                "SELECT 'INDEX', i.indisunique::text || split_part(pg_get_indexdef(i.indexrelid), ' USING ', 2), "
+                "ic.relname FROM pg_index i JOIN pg_class ic ON ic.oid = i.indexrelid "
+                "WHERE i.indrelid = %s::regclass AND NOT EXISTS ("
+                "SELECT 1 FROM pg_constraint k WHERE k.conrelid = i.indrelid AND k.conindid = i.indexrelid) "
+                "UNION ALL "
+                "SELECT 'SEQUENCE', a.attname, s.relname FROM pg_depend d "
+                "JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S' "
+                "JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid "
+                "WHERE d.classid = 'pg_class'::regclass AND d.refobjid = %s::regclass",
+                [self.quote(table)] * 3
+            )
+            names = {}
+            for kind, definition, name in cursor.fetchall():
+                names.setdefault((kind, definition), []).append(name)
+        return {key: sorted(_names) for key, _names in names.items()}
+
+    def rename_objects(self, live_names: dict[tuple, list[str]]):
+        """
+        Give the constraints, indexes and sequences the swapped in table was
+        built with the names the live table had, the ones its migrations made.
+        """
+        table = self.quote(self.live)
+        _sql = []
+        for (kind, definition), names in self.object_names(self.live).items():
+            for name, live_name in zip(names, live_names.get((kind, definition), ())):
+                if name == live_name:
+                    continue
+                if kind == "CONSTRAINT":
+                    _sql.append(f"ALTER TABLE {table} RENAME CONSTRAINT {self.quote(name)} TO {self.quote(live_name)}")
+                else:
+                    _sql.append(f"ALTER {kind} {self.quote(name)} RENAME TO {self.quote(live_name)}")
+        self.execute(*_sql)
+
+    def swap(self):
+        old = f"{self.live}{SHADOW_MARK}old"
+        if self.connection.vendor == "postgresql":
+            live_names = self.object_names(self.live)
+        else:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                    [self.live]
+                )
+                indexes = [sql for sql, in cursor.fetchall()]
+        self.execute(
+            f"ALTER TABLE {self.quote(self.live)} RENAME TO {self.quote(old)}",
+            f"ALTER TABLE {self.quote(self.name)} RENAME TO {self.quote(self.live)}",
+            f"DROP TABLE {self.quote(old)}",
+        )
+        # the names of the old table are free again
+        if self.connection.vendor == "postgresql":
+            self.rename_objects(live_names)
+        else:
+            start = time.perf_counter()
+            self.execute(*indexes)
+            logger.info(
+                f"{self.model.__name__}: {len(indexes)} indexes built on {self.live} "
+                f"in {time.perf_counter() - start:,.2f}s"
+            )
+        logger.info(f"{self.model.__name__}: swapped {self.name} in for {self.live}")
+
+
+@contextmanager
+def shadow_tables(*models):
+    """
+    Load `models` into shadow tables, swapped in when the block completes.
+    Models that can't be shadowed are loaded in place. Meant to be run in
+    the section's transaction, a failed load rolls the shadows back with it.
+    """
+    shadows = [ShadowTable(mdl) for mdl in models if can_shadow(mdl)]
+    try:
+        for shadow in shadows:
+            shadow.create()
+            _active[shadow.model] = shadow
+        yield
+        for shadow in shadows:
+            shadow.build()
+        for shadow in shadows:
+            shadow.swap()
+    finally:
+        for shadow in shadows:
+            _active.pop(shadow.model, None)
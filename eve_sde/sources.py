@@ -0,0 +1,97 @@
+"""
+Where the SDE JSONL files are read from.
+
+The SDE can be read from the extracted folder or straight out of the
+downloaded zip, `get_sde_source` picks the right one for a path.
+"""
+
+# Standard Library
+import json
+import os
+import zipfile
+from contextlib import contextmanager
+
+
+def get_sde_source(path):
+    """
+    Return a source for an extracted SDE folder or a SDE zip, sources are passed through.
+    """
+    if isinstance(path, (SDEFolder, SDEArchive)):
+        return path
+    if os.path.isdir(path):
+        return SDEFolder(path)
+    if zipfile.is_zipfile(path):
+        return SDEArchive(path)
+    raise FileNotFoundError(f"No SDE folder or archive at {path}")
+
+
+class SDEFolder:
+    """
+    An extracted SDE.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __str__(self):
+        return self.path
+
+    def file_path(self, filename: str) -> str:
+        return f"{self.path}/{filename}"
+
+    def filenames(self) -> list[str]:
+        return sorted(
+            f for f in os.listdir(self.path) if os.path.isfile(self.file_path(f))
+        )
+
+    def size(self, filename: str) -> int:
+        return os.path.getsize(self.file_path(filename))
+
+    @contextmanager
+    def open(self, filename: str):
+        with open(self.file_path(filename), "rb") as json_file:
+            yield json_file
+
+    def build_info(self) -> dict:
+        """
+        {"_key": "sde", "buildNumber": 3142455, "releaseDate": "2025-12-15T11:14:02Z"}
+        """
+        with self.open("_sde.jsonl") as json_file:
+            return json.loads(json_file.read())
+
+
+class SDEArchive(SDEFolder):
+    """
+    The SDE zip, members are decompressed as they are read so nothing is
+    extracted to disk.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        with zipfile.ZipFile(self.path) as zf:
+            # members are looked up by file name wherever they are in the zip
+            self.members = {
+                os.path.basename(info.filename): info
+                for info in zf.infolist() if not info.is_dir()
+            }
+
+    def file_path(self, filename: str) -> str:
+        return f"{self.path}/{self.member(filename).filename}"
+
+    def member(self, filename: str) -> zipfile.ZipInfo:
+        try:
+            return self.members[filename]
+        except KeyError:
+            raise FileNotFoundError(f"{filename} is not in {self.path}")
+
+    def filenames(self) -> list[str]:
+        return sorted(self.members)
+
+    def size(self, filename: str) -> int:
+        return self.member(filename).file_size
+
+    @contextmanager
+    def open(self, filename: str):
+        # a ZipFile per reader so sections can be loaded from threads
+        with zipfile.ZipFile(self.path) as zf, zf.open(self.member(filename)) as json_file:
+            yield json_file
@@ -0,0 +1,257 @@
+"""
+Where the solar systems are, for range queries.
+
+`SpatialIndex` buckets every solar system with a position into a grid of
+`CELL_LY` light year cubes, a query only measures the systems in the cubes
+its sphere touches. Positions are kept in light years, the SDE has them in
+metres. It is built from `SolarSystem` once and shared by every request in
+the process, `get_spatial_index` builds it again when the map has been
+imported since.
+"""
+
+# Standard Library
+import math
+import time
+
+# Alliance Auth
+from allianceauth.services.hooks import get_extension_logger
+
+from .routes import HIGH_SEC, KSPACE_IDS, ImportedCache
+
+logger = get_extension_logger(__name__)
+
+# metres
+LIGHT_YEAR = 9_460_730_472_580_800
+
+# about the range of a jump drive, most queries touch 27 to 64 cells
+CELL_LY = 8.0
+
+# the sections the index is built from, the regions come from the constellations
+SPATIAL_SECTIONS = ("Constellation", "SolarSystem")
+
+# no cynosural fields, Pochven and Zarzakh
+NO_JUMP_REGIONS = (10000070,)
+NO_JUMP_SYSTEMS = (30100000,)
+
+
+class SpatialIndex:
+    def __init__(self, systems, version=None, cell_ly: float = CELL_LY):
+        """
+        `systems` is (system id, x, y, z, security status, region id) with
+        the position in metres, systems without one are left out.
+        """
+        self.version = version
+        self.cell = cell_ly
+        # (range, max security): JumpPlanner, see `jump_routes.get_jump_planner`
+        self.planners = {}
+        self.system_ids = []
+        self.positions = []
+        self.security = []
+        self.regions = []
+        cells = {}
+        for pk, x, y, z, security, region in sorted(s for s in systems if None not in s[1:4]):
+            i = len(self.system_ids)
+            x, y, z = x / LIGHT_YEAR, y / LIGHT_YEAR, z / LIGHT_YEAR
+            self.system_ids.append(pk)
+            self.positions.append((x, y, z))
+            self.security.append(security)
+            self.regions.append(region)
+            cells.setdefault(self.cell_of(x, y, z), []).append((x, y, z, i))
+        self.index = {pk: i for i, pk in enumerate(self.system_ids)}
+        self.cells = {key: tuple(members) for key, members in cells.items()}
+        self.bounds = (
+            tuple(map(min, zip(*self.positions))) or (0.0, 0.0, 0.0),
+            tuple(map(max, zip(*self.positions))) or (0.0, 0.0, 0.0),
+        )
+
+    @classmethod
+    def from_db(cls, version=None, cell_ly: float = CELL_LY) -> "SpatialIndex":
+        # Late import to avoid circular imports with the models
+        from .models import SolarSystem
+
+        return cls(
+            SolarSystem.objects.values_list(
+                "id", "x", "y", "z", "security_status", "constellation__region_id"
+            ).iterator(),
+            version=version,
+            cell_ly=cell_ly,
+        )
+
+    def __len__(self) -> int:
+        return len(self.system_ids)
+
+    def __contains__(self, system_id: int) -> bool:
+        return system_id in self.index
+
+    def cell_of(self, x: float, y: float, z: float) -> tuple[int, int, int]:
+        return math.floor(x / self.cell), math.floor(y / self.cell), math.floor(z / self.cell)
+
+    def position(self, origin) -> tuple[float, float, float] | None:
+        """
+        The position in light years of a system id, or of an (x, y, z) in metres.
+        """
+        if isinstance(origin, tuple):
+            return tuple(_c / LIGHT_YEAR for _c in origin)
+        i = self.index.get(origin)
+        return None if i is None else self.positions[i]
+
+    def distance(self, origin, destination) -> float | None:
+        """
+        Light years between two systems, or (x, y, z) in metres.
+        """
+        _from = self.position(origin)
+        _to = self.position(destination)
+        if _from is None or _to is None:
+            return None
+        return math.dist(_from, _to)
+
+    def near(self, point: tuple, radius: float, accept=None) -> list[tuple[float, int]]:
+        """
+        (squared distance, index) of the systems within `radius` light years
+        of `point`, that `accept(index)` if given.
+        """
+        px, py, pz = point
+        r2 = radius * radius
+        x0, y0, z0 = self.cell_of(px - radius, py - radius, pz - radius)
+        x1, y1, z1 = self.cell_of(px + radius, py + radius, pz + radius)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) * (z1 - z0 + 1) > len(self.cells):
+            # more cubes than there are cells with systems, look at them all
+            _cells = self.cells.values()
+        else:
+            cells = self.cells
+            _cells = (
+                cells.get((cx, cy, cz), ())
+                for cx in range(x0, x1 + 1)
+                for cy in range(y0, y1 + 1)
+                for cz in range(z0, z1 + 1)
+            )
+        found = []
+        for members in _cells:
+            for x, y, z, i in members:
+                x -= px
+                y -= py
+                z -= pz
+                d2 = x * x + y * y + z * z
+                if d2 <= r2 and (accept is None or accept(i)):
+                    found.append((d2, i))
+        return found
+
+    def reach(self, point: tuple) -> float:
+        """
+        Light years from `point` to the furthest corner of the bounds.
+        """
+        return math.hypot(*(max(abs(_p - _lo), abs(_p - _hi)) for _p, _lo, _hi in zip(point, *self.bounds)))
+
+    def security_filter(self, min_security: float = None, max_security: float = None):
+        if min_security is None and max_security is None:
+            return None
+        low = -math.inf if min_security is None else min_security
+        high = math.inf if max_security is None else max_security
+        security = self.security
+
+        def accept(i):
+            return security[i] is not None and low <= security[i] <= high
+        return accept
+
+    def results(self, found: list, exclude: int = None, limit: int = None) -> list[tuple[int, float]]:
+        found.sort()
+        ids = self.system_ids
+        _results = [(ids[i], math.sqrt(d2)) for d2, i in found if i != exclude]
+        return _results if limit is None else _results[:limit]
+
+    def within(
+        self, origin, radius: float, min_security: float = None, max_security: float = None
+    ) -> list[tuple[int, float]]:
+        """
+        (system id, light years) of the systems within `radius` light years
+        of `origin`, nearest first. `origin` is a system id, included in the
+        results, or an (x, y, z) in metres. Systems without a security
+        status are left out when filtering by it.
+        """
+        point = self.position(origin)
+        if point is None:
+            return []
+        return self.results(self.near(point, radius, self.security_filter(min_security, max_security)))
+
+    def nearest(
+        self, origin, k: int = 1, min_security: float = None, max_security: float = None
+    ) -> list[tuple[int, float]]:
+        """
+        The `k` systems nearest `origin` as (system id, light years), not
+        counting `origin` itself.
+        """
+        point = self.position(origin)
+        if point is None or k < 1:
+            return []
+        exclude = self.index.get(origin) if not isinstance(origin, tuple) else None
+        accept = self.security_filter(min_security, max_security)
+        reach = self.reach(point)
+        radius = min(self.cell, reach)
+        while True:
+            # every system closer than `radius` is found, so the k nearest
+            # are final once there are k of them, or there is nothing further
+            _results = self.results(self.near(point, radius, accept), exclude, k)
+            if len(_results) == k or radius >= reach:
+                return _results
+            radius = min(radius * 2, reach)
+
+    def can_jump_to(self, i: int) -> bool:
+        security = self.security[i]
+        return (
+            security is not None
+            and security < HIGH_SEC
+            and KSPACE_IDS[0] <= self.system_ids[i] < KSPACE_IDS[1]
+            and self.regions[i] not in NO_JUMP_REGIONS
+            and self.system_ids[i] not in NO_JUMP_SYSTEMS
+        )
+
+    def jump_range(self, origin: int, range_ly: float, max_security: float = None) -> list[tuple[int, float]]:
+        """
+        (system id, light years) of the systems a jump drive with `range_ly`
+        can reach from `origin`, nearest first. Low and null sec k-space only,
+        less `max_security` if given.
+        """
+        point = self.position(origin)
+        if point is None:
+            return []
+        can_jump_to = self.can_jump_to
+        if max_security is None:
+            accept = can_jump_to
+        else:
+            security = self.security
+
+            def accept(i):
+                return can_jump_to(i) and security[i] <= max_security
+        return self.results(self.near(point, range_ly, accept), exclude=self.index.get(origin))
+
+
+def build_spatial_index(version=None) -> SpatialIndex:
+    start = time.perf_counter()
+    spatial = SpatialIndex.from_db(version=version)
+    logger.info(
+        f"Spatial index of {len(spatial)} systems in {len(spatial.cells)} cells "
+        f"built in {time.perf_counter() - start:,.2f}s"
+    )
+    return spatial
+
+
+_spatial = ImportedCache(SPATIAL_SECTIONS, build_spatial_index)
+
+
+def get_spatial_index() -> SpatialIndex:
+    """
+    The index of the imported SDE, built again after the map is imported.
+    """
+    return _spatial.get()
+
+
+def systems_within(origin, radius: float, min_security: float = None, max_security: float = None) -> list[tuple[int, float]]:
+    return get_spatial_index().within(origin, radius, min_security, max_security)
+
+
+def nearest_systems(origin, k: int = 1, min_security: float = None, max_security: float = None) -> list[tuple[int, float]]:
+    return get_spatial_index().nearest(origin, k, min_security, max_security)
+
+
+def systems_in_jump_range(origin: int, range_ly: float, max_security: float = None) -> list[tuple[int, float]]:
+    return get_spatial_index().jump_range(origin, range_ly, max_security)
@@ -17,6 +17,8 @@ from eve_sde.sde_tasks import (
     check_sde_version,
     delete_sde_folder,
     download_extract_sde,
+    get_section_levels,
+    process_level,
     process_section_of_sde,
     set_sde_version,
 )
@@ -44,17 +46,28 @@ def check_for_sde_updates(self):
     base=QueueOnce,
 )
 def update_models_from_sde(self, start_id: int = 0):
+    """
+    Load the SDE, skipping the sections before `start_id` in
+    `SDE_PARTS_TO_UPDATE`. Blueprints and type dogma are a single section each,
+    an id from before they were combined can be up to three higher than the
+    same section's id now.
+    """
+    for id in range(start_id):
+        logger.info(f"Skipping {SDE_PARTS_TO_UPDATE[id]}")
     queue = [
         fetch_sde.si(),
     ]
-    for id in range(start_id, len(SDE_PARTS_TO_UPDATE)):
+    # one task a level, run one after the other. The sections of a level are
+    # loaded in parallel inside the task, so the chain has no groups and no
+    # chords, and doesn't need a result backend. The price is a level only
+    # ever uses one worker.
+    for level in get_section_levels(start_id):
         queue.append(
-            process_sde_section.si(id)
+            process_sde_level.si(level)
         )
     queue.append(
         cleanup_sde.si()
     )
-    queue
     chain(queue).apply_async()
 
 
@@ -66,6 +79,14 @@ def process_sde_section(self, id: int = 0):
     process_section_of_sde(id)
 
 
+@shared_task(
+    bind=True,
+    base=QueueOnce,
+)
+def process_sde_level(self, ids: list):
+    process_level(ids)
+
+
 @shared_task(
     bind=True,
     base=QueueOnce,
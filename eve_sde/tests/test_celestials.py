@@ -0,0 +1,94 @@
+"""
+Celestials of a solar system
+"""
+
+# Standard Library
+import math
+import unittest
+from unittest import mock
+
+# Django
+from django.test import TestCase
+
+from .. import app_settings
+from ..celestials import (
+    MOON,
+    PLANET,
+    STARGATE,
+    STATION,
+    SystemCelestials,
+    get_system_celestials,
+    np,
+)
+from ..models import EveSDESection, Stargate
+from .utils import load_sections
+
+JITA = 30000142
+
+
+@unittest.skipUnless(np, "needs NumPy")
+class TestSystemCelestials(TestCase):
+    def setUp(self):
+        self.celestials = SystemCelestials(1, [
+            (PLANET, 11, "I", 0.0, 0.0, 0.0),
+            (MOON, 12, "I - Moon 1", 3.0, 4.0, 0.0),
+            (PLANET, 13, "II", 10.0, 0.0, 0.0),
+            (STATION, 14, "I - Moon 1 - Station", 3.0, 4.0, 1.0),
+            (STARGATE, 15, "No position", None, None, None),
+        ])
+
+    def test_columns(self):
+        self.assertEqual(len(self.celestials), 4)
+        self.assertNotIn(15, self.celestials)
+        self.assertEqual(self.celestials.kind(14), STATION)
+        self.assertEqual(self.celestials.select(PLANET).tolist(), [0, 2])
+        self.assertEqual(self.celestials.select([MOON, STATION]).tolist(), [1, 3])
+        self.assertEqual(self.celestials.select([13, 11]).tolist(), [2, 0])
+
+    def test_distances(self):
+        ids, metres = self.celestials.distances(11)
+        self.assertEqual(ids.tolist(), [11, 12, 13, 14])
+        self.assertEqual(metres.tolist(), [0.0, 5.0, 10.0, math.sqrt(26)])
+        ids, metres = self.celestials.distances((10.0, 0.0, 0.0), PLANET)
+        self.assertEqual(metres.tolist(), [10.0, 0.0])
+
+    def test_nearest(self):
+        self.assertEqual(self.celestials.nearest(12), [(14, 1.0)])
+        self.assertEqual(self.celestials.nearest(12, 2, PLANET), [(11, 5.0), (13, math.sqrt(65))])
+        self.assertEqual(len(self.celestials.nearest(12, 10)), 3)
+        self.assertEqual(self.celestials.nearest(12, 1, STARGATE), [])
+
+    def test_distance_matrix(self):
+        rows, columns, metres = self.celestials.distance_matrix(PLANET, [MOON, STATION])
+        self.assertEqual(rows.tolist(), [11, 13])
+        self.assertEqual(columns.tolist(), [12, 14])
+        self.assertTrue(np.allclose(metres, [[5.0, math.sqrt(26)], [math.sqrt(65), math.sqrt(66)]]))
+
+
+@unittest.skipUnless(np, "needs NumPy")
+class TestImportedCelestials(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_sections()
+
+    def test_stargate_positions(self):
+        gate = Stargate.objects.get(id=50001248)
+        self.assertEqual((gate.x, gate.y, gate.z), (1e12, 2e11, -3e11))
+        self.assertFalse(Stargate.objects.filter(x__isnull=True).exists())
+
+    def test_from_db(self):
+        celestials = SystemCelestials.from_db(JITA)
+        # 2 planets, 2 moons, a station and a gate
+        self.assertEqual(len(celestials), 6)
+        self.assertEqual(celestials.kind(50001248), STARGATE)
+        self.assertEqual(celestials.point(50001248).tolist(), [1e12, 2e11, -3e11])
+        self.assertEqual(celestials.nearest(60003760, 2, PLANET)[0][0], 40009077)
+        self.assertEqual(celestials.nearest((0.0, 0.0, 0.0), 1, STARGATE)[0][0], 50001248)
+
+    @mock.patch.object(app_settings, "ESDE_ROUTE_CHECK_SECONDS", 0)
+    def test_kept_until_imported(self):
+        celestials = get_system_celestials(JITA)
+        self.assertIs(celestials, get_system_celestials(JITA))
+        # the map imported again
+        EveSDESection.objects.filter(sde_section="Stargate").update(build_number=3000001)
+        self.assertIsNot(celestials, get_system_celestials(JITA))
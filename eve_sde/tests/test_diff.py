@@ -0,0 +1,174 @@
+"""
+Build to build diffs of the SDE
+"""
+
+# Standard Library
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+# Django
+from django.test import TestCase
+
+from ..diff import apply_changeset, diff_sde
+from ..models import (
+    EveSDESection,
+    ItemType,
+    Moon,
+    Planet,
+    SolarSystem,
+    Stargate,
+    TypeDogma,
+)
+from ..sde_tasks import SDE_PARTS_TO_UPDATE, get_section_levels
+from .utils import SDE_FOLDER, load_sections
+
+
+def edit_lines(folder: str, filename: str, edit):
+    """
+    Rewrite every line of a SDE file with `edit(line)`, a line for None.
+    """
+    file_path = os.path.join(folder, filename)
+    with open(file_path) as f:
+        lines = [json.loads(_l) for _l in f]
+    with open(file_path, "w") as f:
+        for line in lines:
+            line = edit(line)
+            if line is not None:
+                f.write(json.dumps(line) + "\n")
+
+
+def new_build(folder: str):
+    """
+    The test SDE with Tritanium changed, Mexallon added and Tama renamed.
+    """
+    shutil.copytree(SDE_FOLDER, folder, dirs_exist_ok=True)
+    edit_lines(folder, "_sde.jsonl", lambda _l: _l | {"buildNumber": _l["buildNumber"] + 1})
+
+    def types(line):
+        if line["_key"] == 34:
+            return line | {"volume": 0.02}
+        return line
+    edit_lines(folder, "types.jsonl", types)
+    with open(os.path.join(folder, "types.jsonl"), "a") as f:
+        f.write(json.dumps({
+            "_key": 36, "groupID": 18, "mass": 0.0, "name": {"en": "Mexallon"},
+            "portionSize": 1, "published": True, "volume": 0.01,
+        }) + "\n")
+
+    def systems(line):
+        if line["_key"] == 30002813:
+            return line | {"name": line["name"] | {"en": "Tama II"}}
+        return line
+    edit_lines(folder, "mapSolarSystems.jsonl", systems)
+
+
+class TestDiff(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_sections()
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.new = folder.name
+        new_build(self.new)
+        self.sections = [SDE_PARTS_TO_UPDATE[id] for level in get_section_levels() for id in level]
+        # the extra ItemType data isn't downloaded
+        patch = mock.patch.object(ItemType, "load_extra", return_value=False)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def changes(self, old=None) -> dict:
+        return {
+            (_c["section"], _c["op"], _c.get("key")): _c
+            for _c in diff_sde(self.sections, self.new, old)
+            if _c.get("op") != "summary" and "section" in _c
+        }
+
+    def test_against_archive(self):
+        changes = self.changes(SDE_FOLDER)
+        self.assertEqual(
+            sorted(changes),
+            [("ItemType", "add", "36"), ("ItemType", "change", "34"), ("SolarSystem", "change", "30002813")]
+        )
+        self.assertEqual(changes[("ItemType", "change", "34")]["fields"], {"volume": [0.01, 0.02]})
+
+    def test_against_stored(self):
+        changes = self.changes()
+        self.assertIn(("ItemType", "add", "36"), changes)
+        self.assertEqual(changes[("ItemType", "change", "34")]["fields"], {"volume": [0.01, 0.02]})
+        self.assertEqual(changes[("SolarSystem", "change", "30002813")]["fields"]["name_en"], ["Tama", "Tama II"])
+
+    def test_apply(self):
+        apply_changeset(diff_sde(self.sections, self.new, SDE_FOLDER), self.sections, self.new)
+
+        self.assertEqual(ItemType.objects.get(id=34).volume, 0.02)
+        self.assertTrue(ItemType.objects.filter(id=36).exists())
+        self.assertEqual(SolarSystem.objects.get(id=30002813).name_en, "Tama II")
+        # built with the system names, so reloaded
+        self.assertTrue(Stargate.objects.filter(name__endswith="Tama II").exists())
+        self.assertEqual(
+            EveSDESection.objects.filter(sde_section="ItemType").values_list("new_rows", "changed_rows").get(),
+            (1, 1)
+        )
+
+    def test_apply_stored(self):
+        # only in the sections compared as a whole
+        def gates(line):
+            if line["_key"] == 50001248:
+                return line | {"position": {"x": 1.0, "y": 2.0, "z": 3.0}}
+            return line
+        edit_lines(self.new, "mapStargates.jsonl", gates)
+
+        def dogma(line):
+            if line["_key"] == 34:
+                return line | {"dogmaAttributes": [{"attributeID": 4, "value": 2.0}]}
+            return line
+        edit_lines(self.new, "typeDogma.jsonl", dogma)
+        changes = list(diff_sde(self.sections, self.new))
+        self.assertFalse([_c for _c in changes if _c.get("section") in ("Stargate", "TypeDogma")])
+
+        apply_changeset(changes, self.sections, self.new)
+
+        self.assertEqual(Stargate.objects.values_list("x", "y", "z").get(id=50001248), (1.0, 2.0, 3.0))
+        self.assertTrue(Stargate.objects.filter(name__endswith="Tama II").exists())
+        self.assertEqual(TypeDogma.objects.get(item_type_id=34, dogma_attribute_id=4).value, 2.0)
+        self.assertEqual(ItemType.objects.get(id=34).volume, 0.02)
+
+    def test_apply_renamed_with_changes(self):
+        def systems(line):
+            if line["_key"] == 30000142:
+                return line | {"name": line["name"] | {"en": "New Jita"}}
+            return line
+        edit_lines(self.new, "mapSolarSystems.jsonl", systems)
+
+        def planets(line):
+            if line["_key"] == 40009077:
+                return line | {"radius": 6500000}
+            return line
+        edit_lines(self.new, "mapPlanets.jsonl", planets)
+        changes = list(diff_sde(self.sections, self.new, SDE_FOLDER))
+        self.assertIn(("Planet", "change", "40009077"), [(_c.get("section"), _c.get("op"), _c.get("key")) for _c in changes])
+
+        apply_changeset(changes, self.sections, self.new)
+
+        self.assertEqual(Planet.objects.get(id=40009077).radius, 6500000)
+        # the planet that didn't change is renamed with it
+        self.assertEqual(
+            dict(Planet.objects.values_list("id", "name")),
+            {40009077: "New Jita IV", 40009081: "New Jita V"}
+        )
+        self.assertEqual(Moon.objects.get(id=40009082).name, "New Jita V - Moon 1")
+
+    def test_failed_apply_rolled_back(self):
+        changes = list(diff_sde(self.sections, self.new, SDE_FOLDER))
+        with mock.patch.object(ItemType, "update_sde_section_state", side_effect=RuntimeError("failed")):
+            with self.assertRaises(RuntimeError):
+                apply_changeset(changes, self.sections, self.new)
+
+        # the rows written before it failed are gone with it
+        self.assertEqual(ItemType.objects.get(id=34).volume, 0.01)
+        self.assertFalse(ItemType.objects.filter(id=36).exists())
@@ -0,0 +1,137 @@
+"""
+SDE archive downloads
+"""
+
+# Standard Library
+import io
+import os
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from unittest import mock
+
+# Third Party
+import httpx
+
+# Django
+from django.test import SimpleTestCase
+
+from ..downloads import SDEArchiveCache, SDEDownloadError
+from .utils import SDE_FOLDER
+
+URL = "https://example.com/sde.zip"
+BUILD = 3142455
+
+
+def sde_zip() -> bytes:
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as zf:
+        for name in ("_sde.jsonl", "types.jsonl"):
+            zf.write(os.path.join(SDE_FOLDER, name), name)
+    return data.getvalue()
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, status_code: int = 200, headers: dict = None, stop: int = None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = httpx.Headers(headers or {})
+        self.stop = stop
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise httpx.HTTPStatusError(str(self.status_code), request=None, response=None)
+
+    def iter_bytes(self):
+        if self.stop is None:
+            yield self.body
+        else:
+            yield self.body[:self.stop]
+            raise httpx.ReadError("connection lost")
+
+
+class TestSDEArchiveCache(SimpleTestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.cache = SDEArchiveCache(path=folder.name, keep=2, retries=1)
+        self.zip = sde_zip()
+        self.requests = []
+        sleep = mock.patch("eve_sde.downloads.time.sleep")
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def serve(self, *responses):
+        responses = list(responses)
+
+        @contextmanager
+        def stream(method, url, headers=None, **kwargs):
+            self.requests.append(dict(headers))
+            yield responses.pop(0)
+        return mock.patch("eve_sde.downloads.httpx.stream", stream)
+
+    def headers(self, **headers) -> dict:
+        return {"content-length": str(len(self.zip)), "etag": '"abc"'} | headers
+
+    def test_download(self):
+        with self.serve(FakeResponse(self.zip, headers=self.headers())):
+            archive = self.cache.download(URL, BUILD)
+
+        self.assertEqual(archive, self.cache.archive_path(BUILD))
+        self.assertEqual(self.requests[0]["Accept-Encoding"], "identity")
+        self.assertEqual(sorted(os.listdir(self.cache.path)), [f"{BUILD}.json", f"{BUILD}.zip"])
+        # cached
+        self.assertEqual(self.cache.download(URL, BUILD), archive)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_resumed(self):
+        with self.serve(
+            FakeResponse(self.zip, headers=self.headers(), stop=100),
+            FakeResponse(self.zip[100:], 206, self.headers(**{"content-range": f"bytes 100-/{len(self.zip)}"})),
+        ):
+            archive = self.cache.download(URL, BUILD)
+
+        self.assertEqual(self.requests[1]["Range"], "bytes=100-")
+        self.assertEqual(self.requests[1]["If-Range"], '"abc"')
+        with open(archive, "rb") as f:
+            self.assertEqual(f.read(), self.zip)
+
+    def test_part_per_process(self):
+        part_path = self.cache.part_path
+        with mock.patch("eve_sde.downloads.os.getpid", return_value=os.getpid() + 1):
+            self.assertNotEqual(part_path, self.cache.part_path)
+
+    def test_encoded_not_resumed(self):
+        with self.serve(
+            FakeResponse(self.zip, headers=self.headers(**{"content-encoding": "gzip"}), stop=100),
+            FakeResponse(self.zip, headers=self.headers(**{"content-encoding": "gzip"})),
+        ):
+            self.cache.download(URL, BUILD)
+
+        self.assertNotIn("Range", self.requests[1])
+
+    def test_not_a_zip(self):
+        with self.serve(*[FakeResponse(b"not a zip", headers={"content-length": "9"})] * 2):
+            with self.assertRaises(SDEDownloadError):
+                self.cache.download(URL, BUILD)
+
+        self.assertEqual(os.listdir(self.cache.path), [self.cache.part_meta_path.rsplit("/", 1)[1]])
+
+    def test_changed_in_cache(self):
+        with self.serve(FakeResponse(self.zip, headers=self.headers())):
+            archive = self.cache.download(URL, BUILD)
+        with open(archive, "ab") as f:
+            f.write(b"more")
+
+        self.assertIsNone(self.cache.get(BUILD))
+        self.assertEqual(os.listdir(self.cache.path), [])
+
+    def test_abandoned_parts_pruned(self):
+        abandoned = f"{self.cache.path}/download-1.zip.part"
+        with open(abandoned, "wb") as f:
+            f.write(b"half")
+        os.utime(abandoned, (0, 0))
+        with self.serve(FakeResponse(self.zip, headers=self.headers())):
+            self.cache.download(URL, BUILD)
+
+        self.assertFalse(os.path.exists(abandoned))
@@ -0,0 +1,69 @@
+"""
+Secondary indexes rebuilt around in place reloads
+"""
+
+# Standard Library
+from unittest import mock
+
+# Django
+from django.db import connection
+from django.test import TransactionTestCase
+
+from .. import app_settings
+from ..indexes import can_rebuild, secondary_indexes
+from ..models import (
+    BlueprintActivity,
+    BlueprintActivityMaterial,
+    BlueprintActivityProduct,
+)
+from ..models.importer import ModelSink
+from .utils import load_sections
+
+
+def constraints(model) -> dict:
+    with connection.cursor() as cursor:
+        return connection.introspection.get_constraints(cursor, model._meta.db_table)
+
+
+@mock.patch.object(app_settings, "ESDE_REBUILD_INDEXES", True)
+@mock.patch.object(app_settings, "ESDE_SHADOW_TABLES", False)
+class TestRebuiltIndexes(TransactionTestCase):
+    # committed like an import, postgres won't alter a table with foreign
+    # key checks still pending in the transaction
+    def setUp(self):
+        load_sections()
+
+    def test_can_rebuild(self):
+        self.assertTrue(can_rebuild(BlueprintActivityMaterial))
+        # not delete and reload
+        self.assertFalse(can_rebuild(BlueprintActivity))
+        with mock.patch.object(app_settings, "ESDE_REBUILD_INDEXES", False):
+            self.assertFalse(can_rebuild(BlueprintActivityMaterial))
+
+    def test_secondary_indexes(self):
+        indexes = secondary_indexes(connection, BlueprintActivityMaterial._meta.db_table)
+        if connection.vendor in ("postgresql", "sqlite"):
+            self.assertTrue(indexes)
+        for drop, create in indexes:
+            self.assertTrue(drop.startswith(("DROP INDEX", "ALTER TABLE")))
+            self.assertTrue(create.startswith(("CREATE INDEX", "ALTER TABLE")))
+
+    def test_reload_rebuilds(self):
+        before = {mdl: constraints(mdl) for mdl in (BlueprintActivity, BlueprintActivityMaterial)}
+        BlueprintActivityProduct.objects.all().delete()
+        load_sections("BlueprintActivity")
+
+        self.assertEqual(BlueprintActivity.objects.count(), 2)
+        self.assertEqual(BlueprintActivityMaterial.objects.count(), 2)
+        self.assertEqual(BlueprintActivityProduct.objects.count(), 1)
+        for mdl, _constraints in before.items():
+            self.assertEqual(_constraints, constraints(mdl))
+
+    def test_failed_load_keeps_indexes(self):
+        before = constraints(BlueprintActivityMaterial)
+        with mock.patch.object(ModelSink, "finish", side_effect=RuntimeError("failed")):
+            with self.assertRaises(RuntimeError):
+                load_sections("BlueprintActivity")
+
+        self.assertEqual(before, constraints(BlueprintActivityMaterial))
+        self.assertEqual(BlueprintActivityMaterial.objects.count(), 2)
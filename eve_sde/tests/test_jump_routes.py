@@ -0,0 +1,113 @@
+"""
+Jump drive routes
+"""
+
+# Standard Library
+from unittest import mock
+
+# Django
+from django.test import TestCase
+
+from ..jump_routes import (
+    DISTANCE,
+    JUMPS,
+    PLANNER_CACHE_SIZE,
+    JumpPlanner,
+    get_jump_planner,
+    ship_jump_range,
+)
+from ..spatial import LIGHT_YEAR, SpatialIndex
+from .utils import load_sections
+
+REGION = 10000002
+
+
+def system(pk: int, x: float, y: float = 0.0, security: float = -0.5) -> tuple:
+    return pk, x * LIGHT_YEAR, y * LIGHT_YEAR, 0.0, security, REGION
+
+
+def spatial_index() -> SpatialIndex:
+    """
+    High sec at 0 and 10 light years, low and null sec between, and two
+    ways to 10 light years: two long jumps through 1 off the line or three
+    short ones along it.
+    """
+    return SpatialIndex([
+        system(30000001, 0, security=0.9),
+        system(30000002, 5, 3, security=0.3),
+        system(30000003, 10 / 3),
+        system(30000004, 20 / 3),
+        system(30000005, 10),
+        system(30000006, 10, 3, security=0.6),
+        system(30000007, 30),
+    ])
+
+
+class TestJumpPlanner(TestCase):
+    def setUp(self):
+        self.planner = JumpPlanner(spatial_index(), 6.0)
+
+    def test_fewest_jumps(self):
+        self.assertEqual(self.planner.route(30000003, 30000005, JUMPS), [30000003, 30000004, 30000005])
+        self.assertEqual(self.planner.route(30000002, 30000005), [30000002, 30000005])
+
+    def test_fewest_light_years(self):
+        route = self.planner.route(30000001, 30000005, DISTANCE)
+        self.assertEqual(route, [30000001, 30000003, 30000004, 30000005])
+        self.assertAlmostEqual(sum(self.planner.legs(route)), 10.0)
+
+    def test_from_high_sec(self):
+        # a jump freighter leaves high sec, it just can't land there
+        self.assertEqual(self.planner.route(30000001, 30000005), [30000001, 30000002, 30000005])
+        self.assertIsNone(self.planner.route(30000005, 30000006))
+        self.assertIsNone(self.planner.route(30000005, 30000001))
+
+    def test_max_security(self):
+        planner = JumpPlanner(spatial_index(), 6.0, max_security=0.0)
+        self.assertEqual(planner.route(30000001, 30000005), [30000001, 30000003, 30000004, 30000005])
+        self.assertIsNone(planner.route(30000001, 30000002))
+
+    def test_out_of_range(self):
+        self.assertIsNone(self.planner.route(30000001, 30000007))
+        self.assertIsNone(self.planner.route(30000001, 1))
+        self.assertEqual(self.planner.route(30000003, 30000003), [30000003])
+
+    def test_unknown_flag(self):
+        with self.assertRaises(ValueError):
+            self.planner.route(30000001, 30000005, "gates")
+
+
+class TestJumpPlanners(TestCase):
+    def test_kept_with_the_index(self):
+        spatial = spatial_index()
+        with mock.patch("eve_sde.jump_routes.get_spatial_index", return_value=spatial):
+            planner = get_jump_planner(6)
+            self.assertIs(planner, get_jump_planner(6.0))
+            self.assertIsNot(planner, get_jump_planner(6.0, max_security=0.0))
+            for range_ly in range(PLANNER_CACHE_SIZE * 2):
+                get_jump_planner(range_ly)
+        self.assertEqual(len(spatial.planners), PLANNER_CACHE_SIZE)
+
+        # the map imported again
+        with mock.patch("eve_sde.jump_routes.get_spatial_index", return_value=spatial_index()):
+            self.assertIsNot(planner, get_jump_planner(6.0))
+
+
+class TestShipJumpRange(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_sections()
+
+    def test_jump_drive(self):
+        self.assertEqual(ship_jump_range(28844), 10.0)
+        self.assertEqual(ship_jump_range(28844, calibration=4), 9.0)
+
+    def test_no_jump_drive(self):
+        self.assertIsNone(ship_jump_range(34))
+        self.assertIsNone(ship_jump_range(1))
+
+    def test_jump_freighter_from_high_sec(self):
+        planner = JumpPlanner(SpatialIndex.from_db(), ship_jump_range(28844))
+        # Jita to Tama
+        self.assertEqual(planner.route(30000142, 30002813), [30000142, 30002813])
+        self.assertIsNone(planner.route(30002813, 30000142))
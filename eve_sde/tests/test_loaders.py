@@ -0,0 +1,133 @@
+"""
+The ways rows are written, upserts, bulk loaders and raw rows
+"""
+
+# Standard Library
+import unittest
+from unittest import mock
+
+# Django
+from django.db import connection
+from django.test import TestCase
+
+from .. import app_settings
+from ..loaders import (
+    ExecuteManyLoader,
+    PostgresCopyLoader,
+    get_bulk_loader,
+    text_value,
+)
+from ..models import (
+    BlueprintActivityMaterial,
+    BlueprintActivityProduct,
+    DogmaAttribute,
+    ItemType,
+    ItemTypeMaterials,
+    SolarSystem,
+    Stargate,
+    TypeDogma,
+    TypeEffect,
+)
+from .utils import load_sections, table_rows
+
+RELOADED = (
+    ItemTypeMaterials, TypeDogma, TypeEffect, BlueprintActivityMaterial, BlueprintActivityProduct, Stargate
+)
+UPSERTED = (ItemType, DogmaAttribute, SolarSystem)
+
+
+@mock.patch.object(app_settings, "ESDE_SHADOW_TABLES", False)
+@mock.patch.object(app_settings, "ESDE_REBUILD_INDEXES", False)
+@mock.patch.object(app_settings, "ESDE_ROW_HASHES", False)
+class TestLoaders(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with mock.patch.object(app_settings, "ESDE_BULK_LOADERS", False):
+            load_sections()
+        cls.loaded = {mdl: table_rows(mdl) for mdl in RELOADED + UPSERTED}
+
+    def assertLoaded(self, models):
+        for mdl in models:
+            self.assertEqual(table_rows(mdl), self.loaded[mdl], mdl.__name__)
+
+    def test_upsert(self):
+        for upsert in (True, False):
+            with self.subTest(upsert=upsert), mock.patch.object(app_settings, "ESDE_USE_UPSERT", upsert):
+                self.assertEqual(ItemType.can_upsert(), upsert and connection.features.supports_update_conflicts)
+                ItemType.objects.filter(id=34).update(volume=5.0, published=False)
+                SolarSystem.objects.filter(id=30000142).update(security_status=-1.0)
+                load_sections(*(mdl.__name__ for mdl in UPSERTED))
+                self.assertLoaded(UPSERTED)
+
+    def test_reloaded(self):
+        loaders = []
+
+        def _get_bulk_loader(model, raw=False, table=None):
+            loader = get_bulk_loader(model, raw=raw, table=table)
+            loaders.append((model, raw, loader.__class__))
+            return loader
+
+        for bulk, raw in ((True, True), (True, False), (False, True), (False, False)):
+            loaders.clear()
+            with (
+                self.subTest(bulk=bulk, raw=raw),
+                mock.patch.object(app_settings, "ESDE_BULK_LOADERS", bulk),
+                mock.patch.object(app_settings, "ESDE_RAW_ROWS", raw),
+                mock.patch("eve_sde.models.importer.get_bulk_loader", _get_bulk_loader),
+            ):
+                load_sections(*(mdl.__name__ for mdl in RELOADED))
+                self.assertLoaded(RELOADED)
+                # the types aren't touched by a reload of their materials
+                self.assertLoaded(UPSERTED)
+                if raw:
+                    # built as tuples where the mapping allows
+                    copy = bulk and connection.vendor == "postgresql"
+                    self.assertIn((TypeDogma, True, PostgresCopyLoader if copy else ExecuteManyLoader), loaders)
+                else:
+                    self.assertFalse([_l for _l in loaders if _l[1]])
+
+
+class TestTextValue(unittest.TestCase):
+    def test_text_value(self):
+        self.assertEqual(text_value(None), "\\N")
+        self.assertEqual(text_value(True), "t")
+        self.assertEqual(text_value(False, "1", "0"), "0")
+        self.assertEqual(text_value(0.1), "0.1")
+        self.assertEqual(text_value(12), "12")
+        self.assertEqual(text_value("a\tb\nc\rd\\e"), "a\\tb\\nc\\rd\\\\e")
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "PostgreSQL only")
+@mock.patch.object(app_settings, "ESDE_BULK_LOADERS", True)
+class TestPostgresCopyLoader(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_sections()
+
+    def test_loader(self):
+        self.assertIsInstance(get_bulk_loader(Stargate), PostgresCopyLoader)
+        self.assertIsInstance(get_bulk_loader(Stargate, raw=True), PostgresCopyLoader)
+
+    def test_copy_text(self):
+        # everything COPY treats specially, through the escaping
+        names = {1: "tab\there", 2: "line\nbreak", 3: "back\\slash \\N", 4: "≫ unicode", 5: "\r"}
+        Stargate.objects.all().delete()
+        loader = get_bulk_loader(Stargate)
+        count = loader.load(
+            Stargate(id=pk, name=name, solar_system_id=30000142, destination_id=30000144, x=0.5, y=None, z=-1e12)
+            for pk, name in names.items()
+        )
+
+        self.assertEqual(count, 5)
+        self.assertEqual(dict(Stargate.objects.values_list("id", "name")), names)
+        self.assertEqual(Stargate.objects.values_list("x", "y", "z").get(id=1), (0.5, None, -1e12))
+
+    def test_spooled(self):
+        Stargate.objects.all().delete()
+        loader = get_bulk_loader(Stargate)
+        loader.chunk_size = 2
+        loader.spool([Stargate(id=pk, name=str(pk), solar_system_id=30000142) for pk in range(1, 6)])
+        self.assertEqual(Stargate.objects.count(), 0)
+
+        self.assertEqual(loader.load_spool(), 5)
+        self.assertEqual(Stargate.objects.count(), 5)
@@ -0,0 +1,110 @@
+"""
+Rows built from SDE lines by the compiled mappers
+"""
+
+# Standard Library
+import json
+import os
+from unittest import mock
+
+# Django
+from django.test import TestCase
+
+from ..mappers import RowMapper, get_row_mapper
+from ..models import Moon, Planet, SolarSystem
+from .utils import SDE_FOLDER, load_sections
+
+
+def sde_line(filename: str, key: int) -> dict:
+    with open(os.path.join(SDE_FOLDER, filename)) as f:
+        for line in f:
+            data = json.loads(line)
+            if data["_key"] == key:
+                return data
+
+
+class TestRowMapper(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_sections()
+
+    def assertRow(self, model, line, expected: dict, name_lookup=False):
+        _model = RowMapper(model)(line, name_lookup=name_lookup)
+        self.assertIsInstance(_model, model)
+        self.assertEqual({_f: getattr(_model, _f) for _f in expected}, expected)
+
+        # the same values as a tuple in column order
+        mapper = RowMapper(model)
+        mapper.raw = True
+        row = mapper(line, name_lookup=name_lookup)
+        self.assertEqual(row, tuple(getattr(_model, _f.attname) for _f in model._meta.concrete_fields))
+        return _model
+
+    def test_lang_fields(self):
+        self.assertRow(SolarSystem, sde_line("mapSolarSystems.jsonl", 30000142), {
+            "id": 30000142,
+            "name": "Jita",
+            "name_en": "Jita",
+            "name_de": "Jita de",
+            "name_fr_fr": "Jita fr",
+            "name_zh_hans": "Jita zh",
+            # not in the SDE
+            "name_it_it": None,
+            "constellation_id": 20000020,
+            "security_status": 0.946,
+            "security_class": "B",
+            "x": 0.0,
+            "x_2d": 0.0,
+            # missing from the line
+            "wormhole_class_id_raw": None,
+        })
+
+    def test_custom_names(self):
+        self.assertRow(Planet, sde_line("mapPlanets.jsonl", 40009077), {
+            "id": 40009077,
+            "name": "Jita IV",
+            "name_en": "Jita IV",
+            "name_de": "Jita de IV",
+            "name_ko_kr": "Jita ko IV",
+            # the same as the name
+            "name_it_it": None,
+            "solar_system_id": 30000142,
+            "celestial_index": 4,
+            "radius": 6000000,
+            "x": 150000000000.0,
+        }, name_lookup=Planet.name_lookup())
+
+        self.assertRow(Moon, sde_line("mapMoons.jsonl", 40009078), {
+            "id": 40009078,
+            "name": "Jita IV - Moon 1",
+            "name_de": "Jita de IV - Moon de 1",
+            "name_it_it": None,
+            "planet_id": 40009077,
+            "orbit_id_raw": 40009077,
+            "orbit_index": 1,
+            "item_type_id": 14,
+        }, name_lookup=Moon.name_lookup())
+
+    def test_map_to_model(self):
+        line = sde_line("mapPlanets.jsonl", 40009081)
+        name_lookup = Planet.name_lookup()
+        # the cached mapper, without the pk
+        _planet = Planet.map_to_model(line, name_lookup=name_lookup, pk=False)
+        self.assertIsNone(_planet.id)
+        self.assertEqual(_planet.name, "Jita V")
+
+    def test_rebuild(self):
+        line = sde_line("mapSolarSystems.jsonl", 30000142)
+        mapper = get_row_mapper(SolarSystem)
+        self.assertIs(get_row_mapper(SolarSystem), mapper)
+        self.addCleanup(get_row_mapper, SolarSystem, rebuild=True)
+
+        data_map = SolarSystem.Import.data_map + (("star_id_raw", "regionID"),)
+        with mock.patch.object(SolarSystem.Import, "data_map", data_map):
+            # a new data_map is seen on its own
+            self.assertEqual(get_row_mapper(SolarSystem)(line).star_id_raw, 10000002)
+        self.assertEqual(get_row_mapper(SolarSystem)(line).star_id_raw, 40000000)
+
+        with mock.patch.object(SolarSystem.Import, "lang_fields", False):
+            self.assertEqual(get_row_mapper(SolarSystem)(line).name_de, "Jita de")
+            self.assertIsNone(get_row_mapper(SolarSystem, rebuild=True)(line).name_de)
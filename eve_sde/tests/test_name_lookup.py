@@ -0,0 +1,72 @@
+"""
+Names of other sections for the custom names
+"""
+
+# Django
+from django.test import TestCase
+
+from ..models import ItemType, Moon, Planet, SolarSystem
+from ..models.importer import import_salt
+from ..models.utils import NameLookup, get_langs, get_langs_for_field
+from .utils import load_sections
+
+
+def values_lookup(queryset) -> dict:
+    """
+    The lookup NameLookup replaced, every name column of every row.
+    """
+    return {_row["id"]: _row for _row in queryset.values("id", "name", *get_langs_for_field("name"))}
+
+
+class TestNameLookup(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_sections()
+
+    def test_same_names(self):
+        for queryset in (SolarSystem.objects.all(), Planet.objects.all(), ItemType.objects.filter(id=14)):
+            lookup = NameLookup(queryset)
+            rows = values_lookup(queryset)
+            self.assertEqual(len(lookup), len(rows))
+            for pk, row in rows.items():
+                self.assertIn(pk, lookup)
+                for lang in get_langs():
+                    self.assertEqual(lookup.name(pk, lang), row[f"name_{lang}"] or row["name"], (pk, lang))
+
+    def test_only_differences_kept(self):
+        lookup = NameLookup(SolarSystem.objects.all())
+        self.assertEqual(lookup.names[30000142], "Jita")
+        self.assertNotIn("en", lookup.langs)
+        self.assertNotIn("it_it", lookup.langs)
+        self.assertEqual(lookup.langs["de"][30000142], "Jita de")
+
+    def test_missing(self):
+        lookup = NameLookup(ItemType.objects.filter(id=14))
+        with self.assertRaises(KeyError):
+            lookup.name(15, "de")
+        self.assertEqual(lookup.name(15, "de", default="Moon"), "Moon")
+        self.assertIsNone(lookup.name(15, default=None))
+
+    def test_digest(self):
+        digest = NameLookup(SolarSystem.objects.all()).digest()
+        self.assertEqual(NameLookup(SolarSystem.objects.all()).digest(), digest)
+        # nothing that goes into a name
+        SolarSystem.objects.filter(id=30000142).update(security_status=0.1)
+        self.assertEqual(NameLookup(SolarSystem.objects.all()).digest(), digest)
+
+        SolarSystem.objects.filter(id=30000142).update(name_de="Jita neu")
+        translated = NameLookup(SolarSystem.objects.all()).digest()
+        self.assertNotEqual(translated, digest)
+        SolarSystem.objects.filter(id=30000142).update(name="New Jita")
+        self.assertNotIn(NameLookup(SolarSystem.objects.all()).digest(), (digest, translated))
+
+    def test_salt(self):
+        # the planets are hashed again once a system is renamed
+        salt = import_salt(Planet, Planet.name_lookup())
+        moon_salt = import_salt(Moon, Moon.name_lookup())
+        self.assertEqual(import_salt(Planet, Planet.name_lookup()), salt)
+        SolarSystem.objects.filter(id=30000144).update(name="New Perimeter")
+
+        self.assertNotEqual(import_salt(Planet, Planet.name_lookup()), salt)
+        # the moons look up the planets, not renamed until they are loaded again
+        self.assertEqual(import_salt(Moon, Moon.name_lookup()), moon_salt)
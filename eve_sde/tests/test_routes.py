@@ -0,0 +1,213 @@
+"""
+Stargate routes
+"""
+
+# Standard Library
+import os
+import random
+import tempfile
+from unittest import mock
+
+# Django
+from django.test import TestCase
+
+from .. import app_settings, routes
+from ..models import EveSDE, EveSDESection
+from ..routes import (
+    INSECURE,
+    SECURE,
+    SHORTEST,
+    JumpMatrix,
+    StargateGraph,
+    get_jump_distances,
+    get_jump_matrix,
+    get_jumps,
+    get_route,
+    get_stargate_graph,
+    matrix_path,
+    region_scope,
+    save_jump_matrix,
+)
+from .utils import load_sections
+
+
+def stargate_graph() -> StargateGraph:
+    """
+    1 high sec, through 2 low sec or 3 and 4 high sec to 5 low sec, and a
+    one way gate from 5 to 6.
+    """
+    systems = [(1, 1.0), (2, 0.2), (3, 0.9), (4, 0.8), (5, 0.1), (6, -0.4), (7, None)]
+    pairs = [(1, 2), (2, 5), (1, 3), (3, 4), (4, 5)]
+    gates = pairs + [(_b, _a) for _a, _b in pairs] + [(5, 6)]
+    return StargateGraph(systems, gates)
+
+
+class TestStargateGraph(TestCase):
+    def setUp(self):
+        self.graph = stargate_graph()
+
+    def test_shortest(self):
+        self.assertEqual(self.graph.route(1, 5), [1, 2, 5])
+        self.assertEqual(self.graph.route(1, 4, SHORTEST), [1, 3, 4])
+        self.assertEqual(self.graph.jumps(1, 6), 3)
+        self.assertEqual(self.graph.route(3, 3), [3])
+
+    def test_secure(self):
+        self.assertEqual(self.graph.route(1, 5, SECURE), [1, 3, 4, 5])
+
+    def test_insecure(self):
+        self.assertEqual(self.graph.route(1, 4, INSECURE), [1, 2, 5, 4])
+
+    def test_no_route(self):
+        # one way gate
+        self.assertIsNone(self.graph.route(6, 5))
+        self.assertIsNone(self.graph.route(1, 7, SECURE))
+        self.assertIsNone(self.graph.jumps(1, 99))
+
+    def test_unknown_flag(self):
+        with self.assertRaises(ValueError):
+            self.graph.route(1, 5, "fastest")
+
+    def test_distances(self):
+        self.assertEqual(
+            self.graph.distances([1, 6, 99], [5, 6, 7, 99]),
+            {
+                1: {5: 2, 6: 3, 7: None, 99: None},
+                6: {5: None, 6: 0, 7: None, 99: None},
+                99: {5: None, 6: None, 7: None, 99: None},
+            }
+        )
+        self.assertEqual(len(self.graph.distances([1])[1]), 7)
+
+    def test_shortest_matches_breadth_first(self):
+        # both ends searched against one pass from the start
+        rng = random.Random(42)
+        systems = [(pk, 0.5) for pk in range(200)]
+        gates = [(rng.randrange(200), rng.randrange(200)) for _g in range(400)]
+        graph = StargateGraph(systems, gates)
+        for origin in range(0, 200, 7):
+            distances = graph.distances([origin])[origin]
+            for destination, jumps in distances.items():
+                route = graph.route(origin, destination)
+                self.assertEqual(jumps, None if route is None else len(route) - 1)
+                if route:
+                    for _a, _b in zip(route, route[1:]):
+                        self.assertIn(_b, graph.neighbours(_a))
+
+
+class TestImportedRoutes(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_sections()
+
+    def test_route(self):
+        self.assertEqual(len(get_stargate_graph()), 4)
+        # Jita to Tama
+        self.assertEqual(get_route(30000142, 30002813), [30000142, 30000144, 30002659, 30002813])
+        self.assertEqual(get_jumps(30002813, 30000142, SECURE), 3)
+
+
+class TestJumpMatrix(TestCase):
+    def setUp(self):
+        self.graph = stargate_graph()
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "jumps.bin")
+
+    def test_from_graph(self):
+        matrix = JumpMatrix.from_graph(self.graph)
+        # no gates out of 6 and 7
+        self.assertEqual(len(matrix), 5)
+        self.assertEqual(matrix.data.itemsize, 1)
+        self.assertEqual(matrix.jumps(1, 5), 2)
+        self.assertEqual(matrix.jumps(4, 2), 2)
+        self.assertIsNone(matrix.jumps(1, 6))
+        self.assertTrue(matrix.covers([1, 2, 5]))
+        self.assertFalse(matrix.covers([1, 6]))
+
+        matrix = JumpMatrix.from_graph(self.graph, system_ids=[1, 5, 6])
+        self.assertEqual(matrix.jumps(1, 6), 3)
+        self.assertIsNone(matrix.jumps(6, 1))
+
+    def test_save_load(self):
+        matrix = JumpMatrix.from_graph(self.graph, system_ids=range(1, 8), build=1)
+        matrix.save(self.path)
+        loaded = JumpMatrix.load(self.path, build=1)
+        self.assertEqual(list(loaded.system_ids), list(matrix.system_ids))
+        self.assertEqual(loaded.distances([1, 6, 99]), matrix.distances([1, 6, 99]))
+        self.assertEqual(loaded.distances([1, 6, 99]), self.graph.distances([1, 6, 99], matrix.system_ids))
+        self.assertFalse([_n for _n in os.listdir(os.path.dirname(self.path)) if _n.endswith(".part")])
+
+    def test_long_routes(self):
+        # a route of 300 jumps takes two bytes
+        systems = [(pk, 0.5) for pk in range(301)]
+        gates = [(pk, pk + 1) for pk in range(300)]
+        JumpMatrix.from_graph(StargateGraph(systems, gates), system_ids=[0, 300]).save(self.path)
+        matrix = JumpMatrix.load(self.path)
+        self.assertEqual(matrix.data.itemsize, 2)
+        self.assertEqual(matrix.jumps(0, 300), 300)
+        self.assertIsNone(matrix.jumps(300, 0))
+
+    def test_not_a_matrix(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a jump matrix")
+        with self.assertRaises(ValueError):
+            JumpMatrix.load(self.path)
+
+
+class TestSavedJumpMatrix(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_sections()
+        EveSDE.objects.update_or_create(pk=1, defaults={"build_number": 3000000})
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        for patch in (
+            mock.patch.object(app_settings, "ESDE_SDE_CACHE_DIR", folder.name),
+            mock.patch.object(app_settings, "ESDE_ROUTE_CHECK_SECONDS", 0),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_saved_and_loaded(self):
+        self.assertIsNone(get_jump_matrix())
+        with open(matrix_path(2000000), "wb") as f:
+            f.write(b"an old build")
+
+        save_jump_matrix()
+        self.assertEqual(os.listdir(app_settings.ESDE_SDE_CACHE_DIR), ["jumps-3000000-kspace.bin"])
+        matrix = get_jump_matrix()
+        self.assertEqual(matrix.build, 3000000)
+        self.assertEqual(len(matrix), 4)
+        self.assertEqual(matrix.jumps(30000142, 30002813), 3)
+
+        distances = get_jump_distances([30000142], [30002813, 30000144])
+        self.assertEqual(distances, {30000142: {30002813: 3, 30000144: 1}})
+        # a system the matrix hasn't, from the graph
+        distances = get_jump_distances([30000142], [30002813, 1])
+        self.assertEqual(distances, {30000142: {30002813: 3, 1: None}})
+
+    def test_region(self):
+        save_jump_matrix(region_scope(10000033))
+        matrix = get_jump_matrix(region_scope(10000033))
+        self.assertEqual(list(matrix.system_ids), [30002659, 30002813])
+        with self.assertRaises(ValueError):
+            save_jump_matrix("everywhere")
+
+    def test_evicted(self):
+        scopes = [routes.KSPACE, region_scope(10000002), region_scope(10000033)]
+        for scope in scopes:
+            save_jump_matrix(scope)
+        with mock.patch.object(routes, "MATRIX_CACHE_SIZE", 2):
+            for scope in scopes:
+                get_jump_matrix(scope)
+            self.assertEqual(list(routes._matrices.get()), scopes[1:])
+
+        # the map imported again
+        cached = routes._matrices.get()
+        EveSDESection.objects.filter(sde_section="Stargate").update(build_number=3000001)
+        self.assertEqual(get_jump_matrix(routes.KSPACE).jumps(30000142, 30002813), 3)
+        self.assertIsNot(cached, routes._matrices.get())
+        self.assertEqual(list(routes._matrices.get()), [routes.KSPACE])
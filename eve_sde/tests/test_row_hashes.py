@@ -0,0 +1,116 @@
+"""
+Unchanged SDE lines skipped with row hashes
+"""
+
+# Standard Library
+import json
+import os
+import unittest
+from unittest import mock
+
+# Django
+from django.db.models import Q
+from django.test import TestCase, TransactionTestCase
+
+from .. import app_settings, schemas
+from ..mappers import get_row_mapper
+from ..models import (
+    BlueprintActivity,
+    EveSDERowHash,
+    EveSDESection,
+    ItemType,
+    SolarSystem,
+    Stargate,
+)
+from ..models.importer import hashed_line, line_hash
+from .utils import SDE_FOLDER, load_sections
+
+
+def counts(section: str) -> tuple:
+    return EveSDESection.objects.filter(sde_section=section).values_list(
+        "new_rows", "changed_rows", "unchanged_rows", "removed_rows"
+    ).get()
+
+
+@mock.patch.object(app_settings, "ESDE_ROW_HASHES", True)
+class TestRowHashes(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with mock.patch.object(app_settings, "ESDE_ROW_HASHES", True):
+            load_sections()
+
+    def test_unchanged_skipped(self):
+        self.assertEqual(counts("ItemType"), (5, 0, 0, 0))
+        with mock.patch.object(ItemType, "save_batch") as save_batch:
+            load_sections("ItemType", "SolarSystem", "BlueprintActivity")
+
+        self.assertEqual(counts("ItemType"), (0, 0, 5, 0))
+        self.assertEqual(counts("SolarSystem"), (0, 0, 4, 0))
+        self.assertEqual(counts("BlueprintActivity"), (0, 0, 1, 0))
+        save_batch.assert_called_once_with([], [], mock.ANY, sizes=mock.ANY)
+
+    def test_changed_reloaded(self):
+        EveSDERowHash.objects.filter(sde_section="SolarSystem", row_id="30000142").update(row_hash=0)
+        SolarSystem.objects.filter(id=30000142).update(name="Not Jita")
+        load_sections("SolarSystem")
+
+        self.assertEqual(counts("SolarSystem"), (0, 1, 3, 0))
+        self.assertEqual(SolarSystem.objects.get(id=30000142).name, "Jita")
+
+    def test_emptied_table(self):
+        SolarSystem.objects.all()._raw_delete("default")
+        load_sections("SolarSystem")
+
+        self.assertEqual(counts("SolarSystem"), (4, 0, 0, 0))
+        self.assertEqual(SolarSystem.objects.count(), 4)
+
+
+@mock.patch.object(app_settings, "ESDE_ROW_HASHES", True)
+class TestDeletedRows(TransactionTestCase):
+    # committed, postgres won't drop the keys of the reloaded blueprint
+    # tables with the deletes' checks still pending in the transaction
+    def setUp(self):
+        load_sections()
+
+    def test_deleted_rows_restored(self):
+        # deleted outside the importer, their lines haven't changed
+        Stargate.objects.filter(Q(solar_system_id=30002813) | Q(destination_id=30002813)).delete()
+        SolarSystem.objects.filter(id=30002813).delete()
+        BlueprintActivity.objects.filter(blueprint_item_type_id=28845, activity="copying").delete()
+        load_sections("SolarSystem", "BlueprintActivity")
+
+        self.assertEqual(counts("SolarSystem"), (0, 1, 3, 0))
+        self.assertTrue(SolarSystem.objects.filter(id=30002813).exists())
+        self.assertEqual(counts("BlueprintActivity"), (0, 1, 0, 0))
+        self.assertEqual(BlueprintActivity.objects.count(), 2)
+
+
+class TestLineHash(unittest.TestCase):
+    def lines(self, filename: str) -> list[bytes]:
+        with open(os.path.join(SDE_FOLDER, filename), "rb") as f:
+            return f.readlines()
+
+    @unittest.skipUnless(schemas.msgspec, "msgspec not installed")
+    def test_struct_and_dict(self):
+        mapper = get_row_mapper(SolarSystem)
+        decode = schemas.schema_decoder(schemas.build_schema(SolarSystem))
+        for line in self.lines("mapSolarSystems.jsonl"):
+            _dict = json.loads(line)
+            self.assertEqual(
+                line_hash(hashed_line(mapper, decode(line)), b"salt"),
+                line_hash(hashed_line(mapper, _dict), b"salt"),
+            )
+            # a key the model doesn't read doesn't change it
+            self.assertEqual(
+                line_hash(hashed_line(mapper, _dict | {"regionID": 1}), b"salt"),
+                line_hash(hashed_line(mapper, _dict), b"salt"),
+            )
+
+    def test_key_order(self):
+        mapper = get_row_mapper(BlueprintActivity)
+        for line in self.lines("blueprints.jsonl"):
+            _dict = json.loads(line)
+            self.assertEqual(
+                line_hash(hashed_line(mapper, dict(reversed(_dict.items()))), b"salt"),
+                line_hash(hashed_line(mapper, _dict), b"salt"),
+            )
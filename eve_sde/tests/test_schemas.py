@@ -0,0 +1,81 @@
+"""
+Lines decoded with the generated schemas, against plain dicts
+"""
+
+# Standard Library
+import json
+import os
+import unittest
+from unittest import mock
+
+# Django
+from django.test import TestCase
+
+from .. import schemas
+from ..models import ItemType, SolarSystem
+from ..sde_tasks import SDE_PARTS_TO_UPDATE
+from .utils import SDE_FOLDER, load_sections
+
+
+def row_values(model, line, name_lookup) -> dict:
+    _row = model.map_to_model(line, name_lookup=name_lookup)
+    return {_f.attname: getattr(_row, _f.attname) for _f in model._meta.concrete_fields}
+
+
+@unittest.skipUnless(schemas.msgspec, "msgspec not installed")
+class TestLineSchemas(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_sections()
+
+    def assertSameRows(self, model, lines: list[bytes]):
+        decode = schemas.schema_decoder(schemas.build_schema(model))
+        name_lookup = model.name_lookup()
+        for line in lines:
+            self.assertEqual(
+                row_values(model, decode(line), name_lookup),
+                row_values(model, json.loads(line), name_lookup),
+                f"{model.__name__} {line[:40]}"
+            )
+
+    def test_sde_files(self):
+        files = set()
+        for section in SDE_PARTS_TO_UPDATE:
+            for model in getattr(section, "models", (section,)):
+                if schemas.get_line_schema(model) is None:
+                    continue
+                files.add(model.Import.filename)
+                with self.subTest(model=model.__name__):
+                    with open(os.path.join(SDE_FOLDER, model.Import.filename), "rb") as f:
+                        self.assertSameRows(model, f.readlines())
+
+        # everything built straight from its data_map
+        self.assertEqual(
+            files,
+            {
+                _f for _f in os.listdir(SDE_FOLDER)
+                if _f not in (
+                    "_sde.jsonl", "blueprints.jsonl", "typeDogma.jsonl", "typeMaterials.jsonl", "mapStargates.jsonl"
+                )
+            }
+        )
+
+    def test_nulls(self):
+        # a null parent of a dotted key, or lang field, reads as missing
+        self.assertSameRows(SolarSystem, [
+            b'{"_key": 30000142, "position": null, "position2D": {"x": 1.0, "y": null}, "name": {"en": "Jita"}}',
+            b'{"_key": 30000142, "name": null, "securityStatus": 0.9}',
+        ])
+        line = b'{"_key": 34, "name": null, "description": {"en": "Ore"}}'
+        self.assertSameRows(ItemType, [line])
+        decode = schemas.schema_decoder(schemas.build_schema(ItemType))
+        self.assertEqual(ItemType.map_to_model(decode(line)).description_en, "Ore")
+
+    def test_clashing_key(self):
+        class Import(SolarSystem.Import):
+            data_map = (("name", "value.en"),)
+
+        with mock.patch.object(SolarSystem, "Import", Import):
+            with self.assertRaises(ValueError):
+                schemas.build_schema(SolarSystem)
+            self.assertIsNone(schemas.get_line_schema(SolarSystem))
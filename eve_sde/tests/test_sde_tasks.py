@@ -0,0 +1,155 @@
+"""
+Scheduling the SDE sections by their dependencies
+"""
+
+# Standard Library
+import threading
+import time
+from unittest import mock
+
+# Django
+from django.test import SimpleTestCase
+
+from .. import sde_tasks, tasks
+from ..models import ItemType, Moon, Planet, SolarSystem
+from ..sde_tasks import (
+    SDE_PARTS_TO_UPDATE,
+    get_section_dependencies,
+    get_section_levels,
+    process_level,
+    process_sections,
+)
+from .utils import section_ids
+
+
+class TestSectionLevels(SimpleTestCase):
+    def test_levels(self):
+        levels = get_section_levels()
+        dependencies = get_section_dependencies()
+        self.assertEqual(sorted(id for level in levels for id in level), list(range(len(SDE_PARTS_TO_UPDATE))))
+        done = set()
+        for level in levels:
+            for id in level:
+                self.assertLessEqual(dependencies[id], done, SDE_PARTS_TO_UPDATE[id])
+            done.update(level)
+
+        level_of = {id: i for i, level in enumerate(levels) for id in level}
+        # the map, one after the other
+        (system,), (planet,), (moon,) = section_ids("SolarSystem"), section_ids("Planet"), section_ids("Moon")
+        self.assertLess(level_of[system], level_of[planet])
+        self.assertLess(level_of[planet], level_of[moon])
+        self.assertEqual(SDE_PARTS_TO_UPDATE[moon], Moon)
+        self.assertTrue({ItemType, Planet} <= SDE_PARTS_TO_UPDATE[moon].get_dependencies())
+
+    def test_start_from(self):
+        (system,) = section_ids("SolarSystem")
+        levels = get_section_levels(system)
+        self.assertEqual(levels[0], [system])
+        self.assertEqual(
+            sorted(id for level in levels for id in level),
+            list(range(system, len(SDE_PARTS_TO_UPDATE)))
+        )
+        self.assertEqual(SDE_PARTS_TO_UPDATE[system], SolarSystem)
+
+    def test_circular(self):
+        dependencies = {id: set() for id in range(len(SDE_PARTS_TO_UPDATE))}
+        dependencies[1] = {2}
+        dependencies[2] = {1}
+        with mock.patch("eve_sde.sde_tasks.get_section_dependencies", return_value=dependencies):
+            with self.assertRaisesMessage(ValueError, "Circular dependency"):
+                get_section_levels()
+            # before any section is started
+            with mock.patch("eve_sde.sde_tasks.process_section_of_sde") as process:
+                with self.assertRaises(ValueError):
+                    process_sections(threads=4)
+            process.assert_not_called()
+
+
+class TestProcessSections(SimpleTestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.started = {}
+        self.finished = {}
+        self.running = 0
+        self.most_running = 0
+        patch = mock.patch("eve_sde.sde_tasks.process_section_of_sde", self.process)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def process(self, id):
+        with self.lock:
+            self.started[id] = time.perf_counter()
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+            self.finished[id] = time.perf_counter()
+
+    def assertInOrder(self):
+        dependencies = get_section_dependencies()
+        for id in self.started:
+            # the skipped sections are already loaded
+            for dep in dependencies[id] & self.started.keys():
+                self.assertLessEqual(self.finished[dep], self.started[id], SDE_PARTS_TO_UPDATE[id])
+
+    def test_threads(self):
+        process_sections(threads=4)
+
+        self.assertEqual(sorted(self.started), list(range(len(SDE_PARTS_TO_UPDATE))))
+        self.assertInOrder()
+        self.assertGreater(self.most_running, 1)
+        self.assertLessEqual(self.most_running, 4)
+
+    def test_one_thread(self):
+        process_sections(threads=1)
+
+        self.assertInOrder()
+        self.assertEqual(self.most_running, 1)
+
+    def test_start_from(self):
+        (system,) = section_ids("SolarSystem")
+        process_sections(system, threads=4)
+
+        self.assertEqual(sorted(self.started), list(range(system, len(SDE_PARTS_TO_UPDATE))))
+        self.assertInOrder()
+
+    def test_failed(self):
+        (system,) = section_ids("SolarSystem")
+        (planet,) = section_ids("Planet")
+
+        def process(id):
+            if id == system:
+                raise RuntimeError("failed")
+            self.process(id)
+
+        with mock.patch("eve_sde.sde_tasks.process_section_of_sde", process):
+            with self.assertRaises(RuntimeError):
+                process_sections(threads=4)
+        # nothing that needs it is started
+        self.assertNotIn(planet, self.started)
+
+    def test_level(self):
+        level = get_section_levels()[0]
+        with mock.patch("eve_sde.sde_tasks.get_import_threads", return_value=4):
+            process_level(level)
+
+        self.assertEqual(sorted(self.started), sorted(level))
+        self.assertGreater(self.most_running, 1)
+
+    def test_default_threads(self):
+        with mock.patch.object(sde_tasks.connection, "vendor", "postgresql"):
+            self.assertGreater(sde_tasks.get_import_threads(), 1)
+        with mock.patch.object(sde_tasks.connection, "vendor", "sqlite"):
+            self.assertEqual(sde_tasks.get_import_threads(), 1)
+
+
+class TestUpdateTask(SimpleTestCase):
+    def test_chain(self):
+        with mock.patch("eve_sde.tasks.chain") as chain:
+            tasks.update_models_from_sde()
+
+        queue = chain.call_args.args[0]
+        self.assertEqual(queue[0].task, tasks.fetch_sde.name)
+        self.assertEqual(queue[-1].task, tasks.cleanup_sde.name)
+        self.assertEqual([_t.args[0] for _t in queue[1:-1]], get_section_levels())
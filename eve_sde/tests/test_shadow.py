@@ -0,0 +1,106 @@
+"""
+Shadow tables
+"""
+
+# Standard Library
+import unittest
+from unittest import mock
+
+# Django
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from .. import app_settings
+from ..models import (
+    BlueprintActivityMaterial,
+    ItemType,
+    ItemTypeMaterials,
+    Stargate,
+    TypeDogma,
+    TypeEffect,
+)
+from ..sde_tasks import process_level
+from ..shadow import SHADOW_MARK, ShadowTable, can_shadow
+from .utils import SDE_FOLDER, load_sections, section_ids
+
+
+def table_names() -> list[str]:
+    with connection.cursor() as cursor:
+        return connection.introspection.table_names(cursor)
+
+
+def constraint_names(model) -> set[str]:
+    with connection.cursor() as cursor:
+        return set(connection.introspection.get_constraints(cursor, model._meta.db_table))
+
+
+@mock.patch.object(app_settings, "ESDE_SHADOW_TABLES", True)
+class TestShadowTables(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with mock.patch.object(app_settings, "ESDE_SHADOW_TABLES", True):
+            load_sections()
+
+    def test_shadowed(self):
+        self.assertTrue(can_shadow(TypeDogma))
+        self.assertTrue(can_shadow(Stargate))
+        # not delete and reload
+        self.assertFalse(can_shadow(ItemType))
+
+    def test_reload_swaps_in(self):
+        names = constraint_names(TypeDogma)
+        rows = set(TypeDogma.objects.values_list("item_type_id", "dogma_attribute_id", "value"))
+        TypeDogma.objects.filter(item_type_id=34).delete()
+        load_sections("TypeDogma")
+
+        self.assertEqual(rows, set(TypeDogma.objects.values_list("item_type_id", "dogma_attribute_id", "value")))
+        self.assertEqual(TypeEffect.objects.count(), 1)
+        self.assertFalse([_t for _t in table_names() if SHADOW_MARK in _t])
+        # the indexes and keys keep the names the migrations gave them
+        self.assertEqual(names, constraint_names(TypeDogma))
+
+    def test_live_table_readable_during_load(self):
+        seen = []
+        build = ShadowTable.build
+
+        def _build(shadow):
+            # the rows are in the shadow, the model still reads the live table
+            seen.append((shadow.model._meta.db_table, shadow.model.objects.count(), shadow.count()))
+            build(shadow)
+
+        ItemTypeMaterials.objects.filter(item_type_id=35).delete()
+        with mock.patch.object(ShadowTable, "build", _build):
+            load_sections("ItemTypeMaterials")
+
+        self.assertEqual(seen, [("eve_sde_itemtypematerials", 2, 3)])
+        self.assertEqual(ItemTypeMaterials.objects.count(), 3)
+
+    def test_failed_load_keeps_live_table(self):
+        before = Stargate.objects.count()
+        with mock.patch.object(ShadowTable, "build", side_effect=RuntimeError("failed")):
+            with self.assertRaises(RuntimeError):
+                load_sections("Stargate")
+
+        self.assertEqual(Stargate.objects.count(), before)
+        self.assertFalse([_t for _t in table_names() if SHADOW_MARK in _t])
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "PostgreSQL only")
+@mock.patch.object(app_settings, "ESDE_SHADOW_TABLES", True)
+@mock.patch.object(app_settings, "ESDE_REBUILD_INDEXES", True)
+class TestParallelShadowTables(TransactionTestCase):
+    def test_sections_in_parallel(self):
+        load_sections()
+        ids = section_ids("TypeDogma", "ItemTypeMaterials", "Stargate", "BlueprintActivity")
+        # sections adding foreign keys to the same tables at the same time
+        with (
+            mock.patch("eve_sde.sde_tasks.get_sde_path", return_value=SDE_FOLDER),
+            mock.patch.object(ItemType, "load_extra", return_value=False),
+        ):
+            for _ in range(3):
+                process_level(ids, threads=len(ids))
+
+        self.assertEqual(TypeDogma.objects.count(), 3)
+        self.assertEqual(ItemTypeMaterials.objects.count(), 3)
+        self.assertEqual(Stargate.objects.count(), 6)
+        self.assertEqual(BlueprintActivityMaterial.objects.count(), 2)
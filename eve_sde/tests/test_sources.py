@@ -0,0 +1,86 @@
+"""
+Loading the SDE straight out of the zip
+"""
+
+# Standard Library
+import os
+import tempfile
+import zipfile
+
+# Django
+from django.test import SimpleTestCase, TransactionTestCase
+
+from ..models import EveSDERowHash, EveSDESection
+from ..sde_tasks import SDE_PARTS_TO_UPDATE, get_section_levels
+from ..sources import SDEArchive, SDEFolder, get_sde_source
+from .utils import SDE_FOLDER, load_sections, table_rows
+
+MODELS = [
+    mdl for level in get_section_levels() for id in level
+    for mdl in getattr(SDE_PARTS_TO_UPDATE[id], "models", (SDE_PARTS_TO_UPDATE[id],))
+]
+
+
+def sde_zip(path: str):
+    """
+    Zip the test SDE the way CCP do, compressed and in a folder.
+    """
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name in os.listdir(SDE_FOLDER):
+            zf.write(os.path.join(SDE_FOLDER, name), f"sde/{name}")
+
+
+class TestSDESources(SimpleTestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.zip = os.path.join(folder.name, "sde.zip")
+        sde_zip(self.zip)
+
+    def test_archive(self):
+        archive = get_sde_source(self.zip)
+        folder = get_sde_source(SDE_FOLDER)
+        self.assertIsInstance(archive, SDEArchive)
+        self.assertIsInstance(folder, SDEFolder)
+        self.assertIs(get_sde_source(archive), archive)
+
+        self.assertEqual(archive.filenames(), folder.filenames())
+        self.assertEqual(archive.build_info(), folder.build_info())
+        self.assertEqual(archive.size("types.jsonl"), folder.size("types.jsonl"))
+        with archive.open("types.jsonl") as a, folder.open("types.jsonl") as f:
+            self.assertEqual(a.read(), f.read())
+        with self.assertRaises(FileNotFoundError):
+            archive.open("missing.jsonl").__enter__()
+
+    def test_missing(self):
+        with self.assertRaisesMessage(FileNotFoundError, "No SDE folder or archive"):
+            get_sde_source(os.path.join(self.folder, "missing.zip"))
+
+        not_a_zip = os.path.join(self.folder, "sde.jsonl")
+        with open(not_a_zip, "w") as f:
+            f.write("{}")
+        with self.assertRaises(FileNotFoundError):
+            get_sde_source(not_a_zip)
+
+
+class TestLoadFromArchive(TransactionTestCase):
+    # committed, postgres won't drop the keys of the reloaded tables with the
+    # deletes' checks still pending in the transaction
+    def test_same_as_folder(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "sde.zip")
+            sde_zip(path)
+            load_sections(folder=path)
+        loaded = {mdl: table_rows(mdl) for mdl in MODELS}
+        self.assertTrue(all(loaded.values()))
+
+        # start again from the folder
+        for mdl in reversed(MODELS):
+            mdl.objects.all().delete()
+        EveSDERowHash.objects.all().delete()
+        EveSDESection.objects.all().delete()
+        load_sections()
+
+        for mdl in MODELS:
+            self.assertEqual(loaded[mdl], table_rows(mdl), mdl.__name__)
@@ -0,0 +1,125 @@
+"""
+Spatial index of the solar systems
+"""
+
+# Standard Library
+import math
+import random
+
+# Django
+from django.test import TestCase
+
+from ..spatial import LIGHT_YEAR, NO_JUMP_REGIONS, SpatialIndex, get_spatial_index
+from .utils import load_sections
+
+REGION = 10000002
+
+
+def system(pk: int, x: float, y: float = 0.0, z: float = 0.0, security: float = -0.5, region: int = REGION):
+    return pk, x * LIGHT_YEAR, y * LIGHT_YEAR, z * LIGHT_YEAR, security, region
+
+
+def spatial_index() -> SpatialIndex:
+    return SpatialIndex([
+        system(30000001, 0, security=0.9),
+        system(30000002, 3, security=0.4),
+        system(30000003, 0, 7),
+        system(30000004, 20, security=0.1),
+        # Pochven
+        system(30000005, 2, 2, region=NO_JUMP_REGIONS[0]),
+        # a wormhole
+        system(31000001, 1, 1, security=-1.0),
+        system(30000006, 4, security=None),
+        (30000007, None, None, None, 0.5, REGION),
+    ], cell_ly=2.0)
+
+
+class TestSpatialIndex(TestCase):
+    def setUp(self):
+        self.spatial = spatial_index()
+
+    def test_positions(self):
+        # no position, no place in the index
+        self.assertEqual(len(self.spatial), 7)
+        self.assertNotIn(30000007, self.spatial)
+        self.assertEqual(self.spatial.position(30000002), (3.0, 0.0, 0.0))
+        self.assertEqual(self.spatial.distance(30000001, 30000003), 7.0)
+        self.assertEqual(self.spatial.distance(30000001, (0, 0, LIGHT_YEAR)), 1.0)
+        self.assertIsNone(self.spatial.distance(30000001, 30000007))
+
+    def test_within(self):
+        self.assertEqual(
+            [pk for pk, _ly in self.spatial.within(30000001, 3.0)],
+            [30000001, 31000001, 30000005, 30000002],
+        )
+        self.assertEqual(self.spatial.within((0, 7 * LIGHT_YEAR, 0), 0.5), [(30000003, 0.0)])
+        self.assertEqual(self.spatial.within(30000007, 100.0), [])
+
+    def test_security_filter(self):
+        self.assertEqual(
+            [pk for pk, _ly in self.spatial.within(30000001, 5.0, min_security=0.0)],
+            [30000001, 30000002],
+        )
+        # no security status, left out when filtering on it
+        self.assertEqual(
+            [pk for pk, _ly in self.spatial.within(30000001, 5.0, max_security=0.0)],
+            [31000001, 30000005],
+        )
+
+    def test_nearest(self):
+        self.assertEqual(self.spatial.nearest(30000001), [(31000001, math.sqrt(2))])
+        self.assertEqual([pk for pk, _ly in self.spatial.nearest(30000001, 3)], [31000001, 30000005, 30000002])
+        # further than the first cells searched
+        self.assertEqual(self.spatial.nearest(30000001, min_security=0.0, max_security=0.2), [(30000004, 20.0)])
+        self.assertEqual(len(self.spatial.nearest(30000001, 100)), 6)
+        self.assertEqual(self.spatial.nearest(30000001, 0), [])
+
+    def test_can_jump_to(self):
+        can_jump_to = {pk: self.spatial.can_jump_to(i) for pk, i in self.spatial.index.items()}
+        self.assertEqual(
+            can_jump_to,
+            {
+                30000001: False,
+                30000002: True,
+                30000003: True,
+                30000004: True,
+                30000005: False,
+                30000006: False,
+                31000001: False,
+            }
+        )
+
+    def test_jump_range(self):
+        self.assertEqual(self.spatial.jump_range(30000001, 7.0), [(30000002, 3.0), (30000003, 7.0)])
+        self.assertEqual(self.spatial.jump_range(30000001, 7.0, max_security=0.0), [(30000003, 7.0)])
+        self.assertEqual(self.spatial.jump_range(30000002, 1.0), [])
+
+    def test_matches_brute_force(self):
+        rng = random.Random(42)
+        systems = [
+            system(30000000 + pk, rng.uniform(-50, 50), rng.uniform(-50, 50), rng.uniform(-5, 5))
+            for pk in range(500)
+        ]
+        spatial = SpatialIndex(systems)
+        for origin in spatial.system_ids[::25]:
+            for radius in (1.0, 6.0, 15.0):
+                expected = sorted(
+                    (spatial.distance(origin, pk), pk) for pk in spatial.system_ids
+                    if spatial.distance(origin, pk) <= radius
+                )
+                self.assertEqual([pk for pk, _ly in spatial.within(origin, radius)], [pk for _ly, pk in expected])
+            self.assertEqual([pk for pk, _ly in spatial.nearest(origin, 5)], [pk for _ly, pk in expected[1:6]])
+
+
+class TestImportedSpatialIndex(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        load_sections()
+
+    def test_from_db(self):
+        spatial = get_spatial_index()
+        self.assertEqual(len(spatial), 4)
+        # Jita, Perimeter, Dodixie and Tama a light year apart
+        self.assertEqual([pk for pk, _ly in spatial.within(30000142, 1.5)], [30000142, 30000144])
+        self.assertAlmostEqual(spatial.distance(30000142, 30002813), 3.0)
+        self.assertEqual([pk for pk, _ly in spatial.jump_range(30000142, 5.0)], [30002813])
@@ -0,0 +1,44 @@
+"""
+Helpers for the tests that load the small SDE in `tests/sde`
+"""
+
+# Standard Library
+import os
+from unittest import mock
+
+from ..models import ItemType
+from ..sde_tasks import SDE_PARTS_TO_UPDATE, get_section_levels
+
+SDE_FOLDER = os.path.join(os.path.dirname(__file__), "sde")
+
+
+def section_ids(*names: str) -> list[int]:
+    """
+    Ids in `SDE_PARTS_TO_UPDATE` of the sections loading these models.
+    """
+    return [
+        id for id, section in enumerate(SDE_PARTS_TO_UPDATE)
+        if any(mdl.__name__ in names for mdl in getattr(section, "models", (section,)))
+    ]
+
+
+def table_rows(model) -> list[tuple]:
+    """
+    Every row of a model's table, sorted, to compare two loads.
+    """
+    # without the auto pks, they count up with every reload
+    fields = [f.attname for f in model._meta.concrete_fields if not (f.primary_key and f.auto_created)]
+    return sorted(model.objects.values_list(*fields), key=repr)
+
+
+def load_sections(*names: str, folder: str = SDE_FOLDER):
+    """
+    Load the test SDE, every section or those of the models named, in
+    dependency order. The extra ItemType data isn't downloaded.
+    """
+    wanted = set(section_ids(*names)) if names else None
+    with mock.patch.object(ItemType, "load_extra", return_value=False):
+        for level in get_section_levels():
+            for id in level:
+                if wanted is None or id in wanted:
+                    SDE_PARTS_TO_UPDATE[id].load_from_sde(folder)